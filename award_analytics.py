@@ -0,0 +1,350 @@
+import argparse
+import json
+import math
+import sqlite3
+import statistics
+import time
+import tracemalloc
+from collections import Counter, defaultdict
+
+import numpy as np
+
+from connections import DB_NAME, read_connection
+
+CHUNK_ROWS = 100_000
+PERCENTILES = (10, 25, 50, 75, 90, 99)
+HISTOGRAM_BINS = 10
+STATUS_CODES = {'Submitted': 0, 'Awarded': 1, 'Not Awarded': 2}
+MISSING = -1
+# Amounts in cents are packed below the group number in one sort key; 2**40 cents is about 11 billion
+GROUP_SHIFT = 40
+
+# One row per chunk of proposal ids: every column comes back as a single comma-separated string of
+# integers (amounts in cents, the status as a code, the award date as days since 1970), which NumPy
+# parses in C, so no Python object is created per proposal. MISSING stands in for NULL.
+PROPOSAL_COLUMNS_QUERY = f"""
+    SELECT COUNT(*),
+           group_concat(CAST(ROUND(requested_amount * 100) AS INTEGER)),
+           group_concat(IFNULL(CAST(ROUND(awarded_amount * 100) AS INTEGER), {MISSING})),
+           group_concat(CASE proposal_status {' '.join(f"WHEN '{status}' THEN {code}" for status, code in STATUS_CODES.items())} END),
+           group_concat(IFNULL(CAST(julianday(awarded_date) - 2440587.5 AS INTEGER), {MISSING})),
+           group_concat(IFNULL(competition_id, {MISSING}))
+    FROM Proposal
+    WHERE proposal_id BETWEEN :first AND :last
+"""
+
+# The row-at-a-time equivalent, used as the baseline by --compare
+PROPOSAL_ROWS_QUERY = """
+    SELECT c.competition_area, p.requested_amount, p.awarded_amount, p.proposal_status, p.awarded_date
+    FROM Proposal p
+    JOIN Competition c ON p.competition_id = c.competition_id
+    WHERE c.competition_area IS NOT NULL
+"""
+
+
+def parse_integers(text, n):
+    if text is None:
+        return np.empty(0, dtype=np.int64)
+    values = np.fromstring(text, dtype=np.int64, sep=',')
+    if len(values) != n:
+        raise ValueError(f"expected {n} values in a chunk, parsed {len(values)}")
+    return values
+
+
+def load_award_columns(chunk_rows=CHUNK_ROWS, conn=None):
+    """
+    Loads the amounts, status, award date and competition area of every proposal into NumPy arrays,
+    chunk_rows proposal ids at a time.
+
+    Returns:
+        dict: 'areas' (list of area names) and one array per column: 'requested_cents' and
+        'awarded_cents' (int64, MISSING if not awarded), 'status' (int8, see STATUS_CODES),
+        'awarded_date' (datetime64[D], NaT if not awarded) and 'area' (int16 index into 'areas',
+        -1 if none).
+    """
+    with read_connection(conn) as conn:
+        # All chunks are read from one snapshot of the database
+        own_transaction = not conn.in_transaction
+        if own_transaction:
+            conn.execute("BEGIN")
+        try:
+            competitions = conn.execute("SELECT competition_id, competition_area FROM Competition").fetchall()
+            areas = sorted({area for _, area in competitions if area is not None})
+            area_codes = {area: code for code, area in enumerate(areas)}
+            # competition_id -> area code
+            competition_area = np.full(max((c for c, _ in competitions), default=0) + 1, -1, dtype=np.int16)
+            for competition_id, area in competitions:
+                competition_area[competition_id] = area_codes.get(area, -1)
+
+            n, max_id = conn.execute("SELECT COUNT(*), IFNULL(MAX(proposal_id), 0) FROM Proposal").fetchone()
+            columns = {
+                'requested_cents': np.empty(n, dtype=np.int64),
+                'awarded_cents': np.empty(n, dtype=np.int64),
+                'status': np.empty(n, dtype=np.int8),
+                'awarded_date': np.empty(n, dtype='datetime64[D]'),
+                'area': np.empty(n, dtype=np.int16),
+            }
+            loaded = 0
+            for first in range(1, max_id + 1, chunk_rows):
+                count, *packed = conn.execute(PROPOSAL_COLUMNS_QUERY,
+                                              {'first': first, 'last': first + chunk_rows - 1}).fetchone()
+                if not count:
+                    continue
+                requested, awarded, status, days, competition_ids = (parse_integers(text, count) for text in packed)
+                end = loaded + count
+                columns['requested_cents'][loaded:end] = requested
+                columns['awarded_cents'][loaded:end] = awarded
+                columns['status'][loaded:end] = status
+                columns['awarded_date'][loaded:end] = np.where(days == MISSING, np.datetime64('NaT'),
+                                                               days.astype('datetime64[D]'))
+                known = (competition_ids >= 0) & (competition_ids < len(competition_area))
+                columns['area'][loaded:end] = np.where(known, competition_area[np.where(known, competition_ids, 0)], -1)
+                loaded = end
+        finally:
+            if own_transaction:
+                conn.rollback()
+
+    columns['areas'] = areas
+    return columns
+
+
+def grouped_percentiles(cents, groups, n_groups, percentiles):
+    """
+    Computes percentiles of non-negative amounts in cents within every group at once, interpolating
+    linearly as np.percentile does.
+
+    Group and amount are packed into one int64 sort key, so a single in-place sort orders the amounts
+    within every group without an argsort or gathering through an index array.
+
+    Returns:
+        numpy.ndarray: A (n_groups, len(percentiles)) array of amounts, NaN for empty groups.
+    """
+    counts = np.bincount(groups, minlength=n_groups)
+    positions = np.asarray(percentiles) / 100 * np.maximum(counts - 1, 0)[:, None]
+    if not len(cents):
+        return np.full(positions.shape, np.nan)
+    keys = groups.astype(np.int64)
+    keys <<= GROUP_SHIFT
+    keys |= cents
+    keys.sort()
+    keys &= (1 << GROUP_SHIFT) - 1
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    lower = np.floor(positions).astype(np.int64)
+    upper = np.minimum(lower + 1, np.maximum(counts - 1, 0)[:, None])
+    fraction = positions - lower
+    last = len(keys) - 1
+    result = (keys[np.minimum(starts[:, None] + lower, last)] * (1 - fraction)
+              + keys[np.minimum(starts[:, None] + upper, last)] * fraction) / 100
+    result[counts == 0] = np.nan
+    return result
+
+
+def grouped_histogram(cents, groups, n_groups, edges):
+    """
+    Counts amounts per group in the equal-width bins given by edges (in currency units; the last bin
+    includes its upper edge).
+
+    Returns:
+        numpy.ndarray: A (n_groups, len(edges) - 1) array of counts.
+    """
+    n_bins = len(edges) - 1
+    low, high = round(edges[0] * 100), round(edges[-1] * 100)
+    bins = cents - low
+    bins *= n_bins
+    bins //= max(high - low, 1)
+    np.clip(bins, 0, n_bins - 1, out=bins)
+    bins += groups.astype(np.int64) * n_bins
+    return np.bincount(bins, minlength=n_groups * n_bins).reshape(n_groups, n_bins)
+
+
+def histogram_edges(cents, bins):
+    if not len(cents):
+        return np.linspace(0, 1, bins + 1)
+    return np.linspace(cents.min() / 100, cents.max() / 100, bins + 1)
+
+
+def award_statistics(columns, percentiles=PERCENTILES, bins=HISTOGRAM_BINS):
+    """
+    Computes award statistics for every area from the arrays returned by load_award_columns().
+
+    Returns:
+        dict: 'areas' maps each area to its proposal and award counts, award rate (awarded out of
+        decided proposals), requested and awarded amount percentiles, mean and percentiles of the
+        requested/awarded discrepancy (as in average_discrepancy()), requested amount and discrepancy
+        histograms and awards per year. 'requested_bins' and 'discrepancy_bins' are the histogram edges.
+        The awarded percentiles and the discrepancy mean and percentiles are NaN for areas without awards.
+    """
+    areas = columns['areas']
+    n_areas = len(areas)
+    area = columns['area']
+    requested = columns['requested_cents']
+    awarded = columns['awarded_cents']
+    status = columns['status']
+    dates = columns['awarded_date']
+    in_area = area >= 0
+    if not in_area.all():
+        area, requested, awarded, status, dates = (column[in_area] for column in (area, requested, awarded, status, dates))
+
+    proposals = np.bincount(area, minlength=n_areas)
+    by_status = {name: np.bincount(area[status == code], minlength=n_areas) for name, code in STATUS_CODES.items()}
+    decided = by_status['Awarded'] + by_status['Not Awarded']
+
+    awarded_mask = awarded != MISSING
+    awarded_area = area[awarded_mask]
+    awarded = awarded[awarded_mask]
+    discrepancy = requested[awarded_mask]
+    discrepancy -= awarded
+    np.abs(discrepancy, out=discrepancy)
+    award_count = np.bincount(awarded_area, minlength=n_areas)
+    awarded_total = np.bincount(awarded_area, weights=awarded, minlength=n_areas) / 100
+    discrepancy_sum = np.bincount(awarded_area, weights=discrepancy, minlength=n_areas) / 100
+
+    requested_percentiles = grouped_percentiles(requested, area, n_areas, percentiles)
+    awarded_percentiles = grouped_percentiles(awarded, awarded_area, n_areas, percentiles)
+    discrepancy_percentiles = grouped_percentiles(discrepancy, awarded_area, n_areas, percentiles)
+    requested_bins = histogram_edges(requested, bins)
+    discrepancy_bins = histogram_edges(discrepancy, bins)
+    requested_histogram = grouped_histogram(requested, area, n_areas, requested_bins)
+    discrepancy_histogram = grouped_histogram(discrepancy, awarded_area, n_areas, discrepancy_bins)
+
+    dated = ~np.isnat(dates)
+    years = dates[dated].astype('datetime64[Y]').astype(np.int64) + 1970
+    first_year = int(years.min()) if len(years) else 0
+    n_years = int(years.max()) - first_year + 1 if len(years) else 0
+    awards_by_year = np.bincount(area[dated] * n_years + (years - first_year),
+                                 minlength=n_areas * n_years).reshape(n_areas, n_years)
+
+    def by_percentile(row):
+        return {p: round(float(value), 2) for p, value in zip(percentiles, row)}
+
+    report = {}
+    for i, name in enumerate(areas):
+        if not proposals[i]:
+            continue
+        report[name] = {
+            'proposals': int(proposals[i]),
+            'submitted': int(by_status['Submitted'][i]),
+            'awarded': int(by_status['Awarded'][i]),
+            'not_awarded': int(by_status['Not Awarded'][i]),
+            'award_rate': float(by_status['Awarded'][i] / decided[i]) if decided[i] else None,
+            'awarded_total': round(float(awarded_total[i]), 2),
+            'requested_percentiles': by_percentile(requested_percentiles[i]),
+            'awarded_percentiles': by_percentile(awarded_percentiles[i]),
+            'discrepancy_mean': float(discrepancy_sum[i] / award_count[i]) if award_count[i] else math.nan,
+            'discrepancy_percentiles': by_percentile(discrepancy_percentiles[i]),
+            'requested_histogram': requested_histogram[i].tolist(),
+            'discrepancy_histogram': discrepancy_histogram[i].tolist(),
+            'awards_by_year': {first_year + y: int(count) for y, count in enumerate(awards_by_year[i]) if count},
+        }
+    return {'areas': report, 'requested_bins': requested_bins.round(2).tolist(),
+            'discrepancy_bins': discrepancy_bins.round(2).tolist()}
+
+
+def award_report(percentiles=PERCENTILES, bins=HISTOGRAM_BINS, conn=None):
+    """
+    Loads the proposal columns and returns award_statistics() for them.
+    """
+    return award_statistics(load_award_columns(conn=conn), percentiles, bins)
+
+
+def award_report_from_rows(percentiles=PERCENTILES, conn=None):
+    """
+    The same per-area counts, award rates, percentiles and discrepancy mean as award_report(),
+    computed from row tuples with the statistics module. Kept as the baseline the columnar path is
+    measured against; percentiles must be whole numbers from 1 to 99.
+    """
+    requested = defaultdict(list)
+    awarded = defaultdict(list)
+    discrepancies = defaultdict(list)
+    statuses = defaultdict(Counter)
+    with read_connection(conn) as conn:
+        for area, requested_amount, awarded_amount, status, awarded_date in conn.execute(PROPOSAL_ROWS_QUERY).fetchall():
+            requested[area].append(requested_amount)
+            statuses[area][status] += 1
+            if awarded_amount is not None:
+                awarded[area].append(awarded_amount)
+                discrepancies[area].append(abs(requested_amount - awarded_amount))
+
+    def by_percentile(values):
+        if len(values) < 2:
+            return {p: round(values[0], 2) if values else math.nan for p in percentiles}
+        cut_points = statistics.quantiles(values, n=100, method='inclusive')
+        return {p: round(cut_points[p - 1], 2) for p in percentiles}
+
+    report = {}
+    for area in sorted(requested):
+        decided = statuses[area]['Awarded'] + statuses[area]['Not Awarded']
+        report[area] = {
+            'proposals': len(requested[area]),
+            'award_rate': statuses[area]['Awarded'] / decided if decided else None,
+            'requested_percentiles': by_percentile(requested[area]),
+            'awarded_percentiles': by_percentile(awarded[area]),
+            'discrepancy_mean': statistics.fmean(discrepancies[area]) if discrepancies[area] else math.nan,
+            'discrepancy_percentiles': by_percentile(discrepancies[area]),
+        }
+    return report
+
+
+def measure(function, *args, **kwargs):
+    """
+    Runs a function twice, once timed and once under tracemalloc (which slows down every allocation).
+
+    Returns:
+        tuple: The result, elapsed seconds and peak traced memory in bytes.
+    """
+    started = time.perf_counter()
+    result = function(*args, **kwargs)
+    elapsed = time.perf_counter() - started
+    tracemalloc.start()
+    function(*args, **kwargs)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def format_amount(value):
+    # NaN, for an area without awards, is shown as '-' rather than as an amount of 0.00
+    return '-' if math.isnan(value) else f"{value:.2f}"
+
+
+def print_report(report):
+    print(f"{'Area':<28} {'Proposals':>10} {'Award rate':>10} {'Req p50':>10} {'Req p90':>10} "
+          f"{'Disc mean':>10} {'Disc p50':>10} {'Disc p90':>10}")
+    for area, entry in report['areas'].items():
+        rate = f"{entry['award_rate']:.1%}" if entry['award_rate'] is not None else '-'
+        print(f"{area:<28} {entry['proposals']:>10} {rate:>10} "
+              f"{format_amount(entry['requested_percentiles'].get(50, math.nan)):>10} "
+              f"{format_amount(entry['requested_percentiles'].get(90, math.nan)):>10} "
+              f"{format_amount(entry['discrepancy_mean']):>10} "
+              f"{format_amount(entry['discrepancy_percentiles'].get(50, math.nan)):>10} "
+              f"{format_amount(entry['discrepancy_percentiles'].get(90, math.nan)):>10}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-area award distributions computed on NumPy arrays.")
+    parser.add_argument('--db', default=DB_NAME)
+    parser.add_argument('--bins', type=int, default=HISTOGRAM_BINS, help="Histogram bins")
+    parser.add_argument('--output', help="Write the full report, including histograms, as JSON to this file")
+    parser.add_argument('--compare', action='store_true',
+                        help="Also compute the statistics from row tuples and compare time and peak memory")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(f"file:{args.db}?mode=ro", uri=True)
+    report, elapsed, peak = measure(award_report, bins=args.bins, conn=conn)
+    print_report(report)
+    print(f"\nColumnar: {elapsed:.2f}s, peak {peak / 2 ** 20:.1f} MiB")
+    if args.compare:
+        rows_report, rows_elapsed, rows_peak = measure(award_report_from_rows, conn=conn)
+        print(f"Row tuples: {rows_elapsed:.2f}s, peak {rows_peak / 2 ** 20:.1f} MiB")
+        # The two interpolations can round the last cent differently
+        mismatched = [area for area, entry in rows_report.items()
+                      if entry['proposals'] != report['areas'][area]['proposals']
+                      or any(not math.isclose(value, report['areas'][area]['requested_percentiles'][p], abs_tol=0.011)
+                             for p, value in entry['requested_percentiles'].items())]
+        if mismatched:
+            print(f"Results differ for {', '.join(mismatched)}")
+    conn.close()
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
@@ -0,0 +1,158 @@
+import argparse
+import heapq
+import sqlite3
+import time
+from collections import defaultdict
+
+from connections import begin_immediate
+
+MAX_REVIEWERS_PER_PROPOSAL = 3
+MAX_ASSIGNMENTS_PER_REVIEWER = 3
+
+
+def load_assignment_state(cursor, competition_id=None):
+    """
+    Loads everything the batch assignment needs in a handful of set-based queries.
+
+    Parameters:
+        cursor (sqlite3.Cursor): A cursor on the council database.
+        competition_id (int): Only consider proposals of this competition, if given.
+
+    Returns:
+        tuple: (proposals, participants, assigned, reviewer_load, conflicts) where proposals is a list of
+        (proposal_id, competition_id), participants and assigned map proposal IDs to sets of researcher and
+        reviewer IDs, reviewer_load maps reviewer IDs to their current number of assignments and conflicts
+        maps researcher IDs to the set of reviewers in conflict with them.
+    """
+    competition_filter = "AND p.competition_id = ?" if competition_id is not None else ""
+    params = (competition_id,) if competition_id is not None else ()
+
+    proposals = []
+    participants = {}
+    for proposal_id, proposal_competition_id, investigator_id in cursor.execute(f"""
+        SELECT p.proposal_id, p.competition_id, p.principle_investigator_id
+        FROM Proposal p
+        WHERE p.proposal_status = 'Submitted' {competition_filter}
+        ORDER BY p.proposal_id
+    """, params):
+        proposals.append((proposal_id, proposal_competition_id))
+        participants[proposal_id] = {investigator_id}
+
+    for proposal_id, collaborator_id in cursor.execute(f"""
+        SELECT pc.proposal_id, pc.collaborator_id
+        FROM ProposalCollaborator pc
+        JOIN Proposal p ON p.proposal_id = pc.proposal_id
+        WHERE p.proposal_status = 'Submitted' {competition_filter}
+    """, params):
+        participants[proposal_id].add(collaborator_id)
+
+    assigned = defaultdict(set)
+    reviewer_load = {reviewer_id: 0 for (reviewer_id,) in cursor.execute("SELECT reviewer_id FROM Reviewer")}
+    for proposal_id, reviewer_id in cursor.execute("SELECT proposal_id, reviewer_id FROM ReviewAssignment"):
+        assigned[proposal_id].add(reviewer_id)
+        if reviewer_id in reviewer_load:
+            reviewer_load[reviewer_id] += 1
+
+    conflicts = defaultdict(set)
+    for reviewer_id, researcher_id in cursor.execute("SELECT reviewer_id, conflicted_researcher_id FROM ConflictOfInterest"):
+        conflicts[researcher_id].add(reviewer_id)
+
+    return proposals, participants, assigned, reviewer_load, conflicts
+
+
+def compute_assignments(proposals, participants, assigned, reviewer_load, conflicts):
+    """
+    Assigns reviewers to every proposal that still needs them, always picking the least loaded eligible reviewers.
+
+    A reviewer is eligible for a proposal if they are not already assigned to it and have no conflict of
+    interest with its principal investigator or any collaborator. No proposal gets more than
+    MAX_REVIEWERS_PER_PROPOSAL reviewers and no reviewer more than MAX_ASSIGNMENTS_PER_REVIEWER assignments.
+
+    Returns:
+        tuple: (assignments, unfilled) where assignments is a list of (proposal_id, competition_id, reviewer_id)
+        and unfilled maps proposal IDs to the number of reviewer slots that could not be filled.
+    """
+    # Min-heap of (current load, reviewer_id) over reviewers with spare capacity
+    heap = [(load, reviewer_id) for reviewer_id, load in reviewer_load.items() if load < MAX_ASSIGNMENTS_PER_REVIEWER]
+    heapq.heapify(heap)
+
+    assignments = []
+    unfilled = {}
+    for proposal_id, competition_id in proposals:
+        needed = MAX_REVIEWERS_PER_PROPOSAL - len(assigned.get(proposal_id, ()))
+        if needed <= 0:
+            continue
+        excluded = set(assigned.get(proposal_id, ()))
+        for researcher_id in participants.get(proposal_id, ()):
+            excluded |= conflicts.get(researcher_id, set())
+
+        chosen, skipped = [], []
+        while heap and len(chosen) < needed:
+            load, reviewer_id = heapq.heappop(heap)
+            if reviewer_id in excluded:
+                skipped.append((load, reviewer_id))
+            else:
+                chosen.append((load, reviewer_id))
+        for entry in skipped:
+            heapq.heappush(heap, entry)
+        for load, reviewer_id in chosen:
+            assignments.append((proposal_id, competition_id, reviewer_id))
+            if load + 1 < MAX_ASSIGNMENTS_PER_REVIEWER:
+                heapq.heappush(heap, (load + 1, reviewer_id))
+
+        if len(chosen) < needed:
+            unfilled[proposal_id] = needed - len(chosen)
+    return assignments, unfilled
+
+
+def assign_all_reviewers(conn, competition_id=None, review_deadline=None, dry_run=False):
+    """
+    Computes reviewer assignments for every submitted proposal that needs reviewers and writes them in one transaction.
+
+    Unless it is a dry run, the transaction is started with BEGIN IMMEDIATE before the current assignments
+    are loaded, so no other writer can change them between the computation and the write.
+
+    Parameters:
+        conn (sqlite3.Connection): A connection to the council database, with no open transaction.
+        competition_id (int): Only assign proposals of this competition, if given.
+        review_deadline (str): Review deadline in YYYY-MM-DD format stored with each new assignment.
+        dry_run (bool): Compute the assignments without writing them.
+
+    Returns:
+        tuple: (assignments, unfilled) as returned by compute_assignments().
+    """
+    cursor = conn.cursor()
+    if not dry_run:
+        begin_immediate(conn)
+    try:
+        state = load_assignment_state(cursor, competition_id)
+        assignments, unfilled = compute_assignments(*state)
+        if not dry_run:
+            cursor.executemany(
+                "INSERT INTO ReviewAssignment (competition_id, reviewer_id, proposal_id, review_deadline, review_submitted) VALUES (?, ?, ?, ?, ?)",
+                ((competition_id, reviewer_id, proposal_id, review_deadline, False)
+                 for proposal_id, competition_id, reviewer_id in assignments)
+            )
+            conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+    return assignments, unfilled
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Assign reviewers to every submitted proposal that needs them.")
+    parser.add_argument('--db', default='council.db')
+    parser.add_argument('--competition', type=int, help="Only assign proposals of this competition")
+    parser.add_argument('--deadline', help="Review deadline (YYYY-MM-DD) for the new assignments")
+    parser.add_argument('--dry-run', action='store_true', help="Compute the assignments without writing them")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    start = time.perf_counter()
+    assignments, unfilled = assign_all_reviewers(conn, args.competition, args.deadline, args.dry_run)
+    conn.close()
+    print(f"{len(assignments)} assignments {'computed' if args.dry_run else 'written'} in {time.perf_counter() - start:.2f}s.")
+    if unfilled:
+        print(f"{len(unfilled)} proposals could not get {MAX_REVIEWERS_PER_PROPOSAL} reviewers "
+              f"({sum(unfilled.values())} open slots).")
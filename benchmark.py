@@ -0,0 +1,168 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import time
+from datetime import date, datetime
+
+import db_app
+from create_database import create_database
+from fill_database import bulk_fill_database, default_counts, random_date
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000, 10_000_000]
+
+
+def misspell(rng, name):
+    """
+    Drops or swaps one character after the first, like a typo in a typed name.
+    """
+    i = rng.randrange(1, len(name) - 1)
+    if rng.random() < 0.5:
+        return name[:i] + name[i + 1:]
+    return name[:i] + name[i + 1] + name[i] + name[i + 2:]
+
+
+def sample_arguments(cursor, rng, n_samples):
+    """
+    Picks representative arguments for each benchmarked query from the database.
+    """
+    n_proposals = cursor.execute("SELECT MAX(proposal_id) FROM Proposal").fetchone()[0]
+    areas = [row[0] for row in cursor.execute("SELECT DISTINCT competition_area FROM Competition")]
+    names = [row[0] for row in cursor.execute("""
+        SELECT res.first_name || ' ' || res.last_name
+        FROM Reviewer r
+        JOIN Researcher res ON r.reviewer_id = res.researcher_id
+        LIMIT 1000
+    """)]
+    return {
+        'find_open_competitions': [(f"{rng.randint(1, 12):02d}",) for _ in range(n_samples)],
+        'find_largest_amount_proposal': [(rng.choice(areas),) for _ in range(n_samples)],
+        'find_largest_awarded_proposals': [(random_date(rng, date(2023, 1, 1), 730),) for _ in range(n_samples)],
+        'average_discrepancy': [(rng.choice(areas),) for _ in range(n_samples)],
+        'fetch_eligible_reviewers': [(rng.randint(1, n_proposals),) for _ in range(n_samples)],
+        'find_proposals_to_review': [(rng.choice(names),) for _ in range(n_samples)],
+        'find_reviewers_by_prefix': [(rng.choice(names)[:3],) for _ in range(n_samples)],
+        'search_reviewers': [(misspell(rng, rng.choice(names)),) for _ in range(n_samples)],
+        'area_report': [() for _ in range(n_samples)],
+        'monthly_open_competitions': [() for _ in range(n_samples)],
+        'due_reviews': [(rng.choice(['reviewer', 'competition']), random_date(rng, date(2024, 1, 1), 365))
+                        for _ in range(n_samples)],
+    }
+
+
+def percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def time_query(function, arguments, conn):
+    """
+    Times one query function over a list of argument tuples on the given connection.
+
+    Returns:
+        dict: Latency percentiles in milliseconds, rows returned and throughput.
+    """
+    latencies = []
+    rows = 0
+    with contextlib.redirect_stdout(io.StringIO()):
+        for args in arguments:
+            start = time.perf_counter()
+            result = function(*args, conn=conn)
+            latencies.append(time.perf_counter() - start)
+            rows += len(result) if isinstance(result, list) else 1
+    latencies.sort()
+    total = sum(latencies)
+    return {
+        'calls': len(latencies),
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p95_ms': percentile(latencies, 0.95) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'mean_ms': statistics.fmean(latencies) * 1000,
+        'rows': rows,
+        'rows_per_sec': rows / total if total else 0.0,
+        'queries_per_sec': len(latencies) / total if total else 0.0,
+    }
+
+
+def run_benchmark(sizes, repeat, seed, data_dir, rebuild=False, workers=None):
+    """
+    Builds (or reuses) a database per size and times every menu query against it.
+
+    Parameters:
+        sizes (list): Proposal counts to benchmark.
+        repeat (int): Number of calls per query and size.
+        seed (int): Seed for data generation and argument sampling.
+        data_dir (str): Directory holding the generated databases.
+        rebuild (bool): Regenerate databases even if they already exist.
+        workers (int): Generator processes used when building databases.
+
+    Returns:
+        list: One result dict per (size, query).
+    """
+    os.makedirs(data_dir, exist_ok=True)
+    results = []
+    for size in sizes:
+        db_name = os.path.join(data_dir, f"bench_{size}_{seed}.db")
+        if rebuild and os.path.exists(db_name):
+            os.remove(db_name)
+        if not os.path.exists(db_name):
+            print(f"Building {db_name}...")
+            start = time.perf_counter()
+            bulk_fill_database(db_name, default_counts(size), seed, workers)
+            print(f"Built in {time.perf_counter() - start:.1f}s")
+        else:
+            # Bring a database generated by an older revision up to the current schema and indexes
+            create_database(db_name)
+
+        conn = sqlite3.connect(db_name)
+        arguments = sample_arguments(conn.cursor(), random.Random(seed), repeat)
+        for name, args in arguments.items():
+            stats = time_query(getattr(db_app, name), args, conn)
+            stats.update({'proposals': size, 'query': name})
+            results.append(stats)
+            print(f"{size:>10} {name:<32} p50 {stats['p50_ms']:9.3f}ms  p95 {stats['p95_ms']:9.3f}ms  "
+                  f"p99 {stats['p99_ms']:9.3f}ms  {stats['rows_per_sec']:12.0f} rows/s")
+        conn.close()
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the db_app.py menu queries at increasing database sizes.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help="Proposal counts to benchmark")
+    parser.add_argument('--repeat', type=int, default=100, help="Calls per query and size")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--data-dir', default='bench_data', help="Where generated databases are kept between runs")
+    parser.add_argument('--rebuild', action='store_true', help="Regenerate databases that already exist")
+    parser.add_argument('--workers', type=int, help="Generator processes used when building databases")
+    parser.add_argument('--output', default='benchmark_results.json', help="Machine-readable results file")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.sizes, args.repeat, args.seed, args.data_dir, args.rebuild, args.workers)
+    with open(args.output, 'w') as f:
+        json.dump({
+            'revision': git_revision(),
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'sqlite_version': sqlite3.sqlite_version,
+            'python_version': platform.python_version(),
+            'seed': args.seed,
+            'repeat': args.repeat,
+            'results': results,
+        }, f, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
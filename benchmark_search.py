@@ -0,0 +1,125 @@
+import argparse
+import json
+import os
+import platform
+import random
+import re
+import sqlite3
+from datetime import datetime
+
+import db_app
+from benchmark import git_revision, time_query
+from fill_database import bulk_fill_database, default_counts
+
+# The LIKE queries full-text search replaces: a substring test on every text column, unranked, stopping
+# after one page of matches
+LIKE_QUERIES = {
+    'competitions': """
+        SELECT competition_id, competition_title, competition_area
+        FROM Competition
+        WHERE competition_title LIKE :pattern OR competition_description LIKE :pattern OR competition_area LIKE :pattern
+        LIMIT :limit
+    """,
+    'organizations': """
+        SELECT organization_id, organization_name
+        FROM Organization
+        WHERE organization_name LIKE :pattern OR organization_address LIKE :pattern
+        LIMIT :limit
+    """,
+}
+
+SEARCH_FUNCTIONS = {
+    'competitions': db_app.search_competitions,
+    'organizations': db_app.search_organizations,
+}
+
+
+def like_search(kind):
+    """
+    Returns a LIKE based search over the same table as SEARCH_FUNCTIONS[kind], for comparison.
+    """
+    def search(text, conn=None):
+        return conn.execute(LIKE_QUERIES[kind], {'pattern': f"%{text}%", 'limit': db_app.PAGE_SIZE}).fetchall()
+    search.__name__ = f"like_{kind}"
+    return search
+
+
+def sample_search_words(cursor, rng, n_samples):
+    """
+    Picks search words from the text of random competitions and organizations.
+
+    Returns:
+        dict: (table, case) -> argument tuples. The 'common' case searches for words taken from the table;
+        the 'absent' case searches for words that occur nowhere, which LIKE can only establish by reading
+        every row.
+    """
+    words = {}
+    for kind, table_name, column in [('competitions', 'Competition', 'competition_title'),
+                                     ('organizations', 'Organization', 'organization_name')]:
+        n_rows = cursor.execute(f"SELECT MAX(rowid) FROM {table_name}").fetchone()[0]
+        common = []
+        while len(common) < n_samples:
+            text = cursor.execute(f"SELECT {column} FROM {table_name} WHERE rowid = ?", (rng.randint(1, n_rows),)).fetchone()
+            candidates = [word for word in re.findall(r'\w+', text[0] if text else '') if len(word) > 3]
+            if candidates:
+                common.append((rng.choice(candidates).lower(),))
+        words[kind, 'common'] = common
+        words[kind, 'absent'] = [(f"{word}q{rng.randint(100, 999)}",) for word, in common]
+    return words
+
+
+def run_search_benchmark(rows, repeat, seed, data_dir, rebuild=False, workers=None):
+    """
+    Builds (or reuses) a database with the given number of competitions and organizations and times
+    full-text search against the LIKE baseline on it.
+
+    Returns:
+        list: One result dict per (table, kind of search word, method).
+    """
+    os.makedirs(data_dir, exist_ok=True)
+    db_name = os.path.join(data_dir, f"search_{rows}_{seed}.db")
+    if rebuild and os.path.exists(db_name):
+        os.remove(db_name)
+    if not os.path.exists(db_name):
+        print(f"Building {db_name}...")
+        counts = default_counts(10_000)
+        counts.update({'competitions': rows, 'organizations': rows})
+        bulk_fill_database(db_name, counts, seed, workers)
+
+    conn = sqlite3.connect(db_name)
+    words = sample_search_words(conn.cursor(), random.Random(seed), repeat)
+    results = []
+    for (kind, case), arguments in words.items():
+        for method, function in [('fts5', SEARCH_FUNCTIONS[kind]), ('like', like_search(kind))]:
+            stats = time_query(function, arguments, conn)
+            stats.update({'table_rows': rows, 'table': kind, 'words': case, 'method': method})
+            results.append(stats)
+            print(f"{rows:>10} {kind:<14} {case:<7} {method:<5} p50 {stats['p50_ms']:9.3f}ms  p95 {stats['p95_ms']:9.3f}ms  "
+                  f"p99 {stats['p99_ms']:9.3f}ms")
+    conn.close()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark FTS5 search against LIKE over competitions and organizations.")
+    parser.add_argument('--rows', type=int, default=1_000_000, help="Competitions and organizations to generate")
+    parser.add_argument('--repeat', type=int, default=50, help="Searches per table and method")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--data-dir', default='bench_data', help="Where generated databases are kept between runs")
+    parser.add_argument('--rebuild', action='store_true', help="Regenerate the database if it already exists")
+    parser.add_argument('--workers', type=int, help="Generator processes used when building the database")
+    parser.add_argument('--output', default='benchmark_results_search.json', help="Machine-readable results file")
+    args = parser.parse_args()
+
+    results = run_search_benchmark(args.rows, args.repeat, args.seed, args.data_dir, args.rebuild, args.workers)
+    with open(args.output, 'w') as f:
+        json.dump({
+            'revision': git_revision(),
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'sqlite_version': sqlite3.sqlite_version,
+            'python_version': platform.python_version(),
+            'seed': args.seed,
+            'repeat': args.repeat,
+            'results': results,
+        }, f, indent=2)
+    print(f"Results written to {args.output}")
@@ -0,0 +1,401 @@
+import argparse
+import json
+import os
+import random
+import sqlite3
+import time
+
+import connections
+from connections import read_connection, write_connection
+from create_database import TABLES, create_change_log_triggers, key_columns
+from snapshot import take_snapshot
+
+CHANGE_BATCH_SIZE = 1000
+COMPACT_BATCH_SIZE = 10_000
+
+LAST_SEQUENCE_QUERY = "SELECT seq FROM sqlite_sequence WHERE name = 'ChangeLog'"
+FIRST_SEQUENCE_QUERY = "SELECT MIN(sequence) FROM ChangeLog"
+CHANGES_QUERY = """
+    SELECT sequence, table_name, operation, row_key
+    FROM ChangeLog
+    WHERE sequence > ? AND sequence <= ? {table_filter}
+    ORDER BY sequence
+    LIMIT ?
+"""
+CONSUMERS_QUERY = """
+    SELECT c.consumer, c.sequence, c.updated_at,
+           (SELECT COUNT(*) FROM ChangeLog WHERE sequence > c.sequence) AS pending
+    FROM ChangeLogConsumer c
+    ORDER BY c.consumer
+"""
+REGISTER_CONSUMER_STATEMENT = "INSERT INTO ChangeLogConsumer (consumer, sequence) VALUES (?, ?)"
+CHECKPOINT_STATEMENT = """
+    UPDATE ChangeLogConsumer
+    SET sequence = MAX(sequence, ?), updated_at = datetime('now')
+    WHERE consumer = ?
+"""
+COMPACT_STATEMENT = "DELETE FROM ChangeLog WHERE sequence <= ?"
+
+
+def last_sequence(conn=None):
+    """
+    Returns the sequence number of the latest change record, or 0 if nothing was ever logged.
+    """
+    with read_connection(conn) as conn:
+        row = conn.execute(LAST_SEQUENCE_QUERY).fetchone()
+    return row[0] if row else 0
+
+
+def check_checkpoint(since, conn=None):
+    """
+    Checks that no change after the checkpoint has been compacted away.
+
+    Raises:
+        ValueError: If changes after since are no longer in the log, so the consumer has to start over
+            from a full export.
+    """
+    with read_connection(conn) as conn:
+        first = conn.execute(FIRST_SEQUENCE_QUERY).fetchone()[0]
+        last = last_sequence(conn)
+    if since < last and (first is None or first > since + 1):
+        raise ValueError(f"Changes after sequence {since} have been compacted; take a full export and "
+                         f"continue from sequence {last}")
+
+
+def row_query(conn, table_name):
+    condition = ' AND '.join(f"{column} = ?" for column in key_columns(conn.cursor(), table_name))
+    return f"SELECT * FROM {table_name} WHERE {condition}"
+
+
+def fetch_row(conn, query, key):
+    """
+    Returns the row a row_query() finds for the given primary key as a dict, or None if there is no such row.
+    """
+    cursor = conn.execute(query, key)
+    row = cursor.fetchone()
+    return None if row is None else dict(zip([column[0] for column in cursor.description], row))
+
+
+def stream_changes(since, batch_size=CHANGE_BATCH_SIZE, tables=None, conn=None):
+    """
+    Yields the changes made after a checkpoint, in sequence order, up to the last change committed when
+    the stream started.
+
+    The whole stream is read in one read transaction, so it never sees half of a write and writers are
+    not blocked while it runs. Changes to the same row within a batch are collapsed into one, and the
+    row is read as it is at the end of the stream rather than as it was when the change was logged, so
+    applying a change is always an upsert of the current row or a delete. A row changed again in a
+    later batch is therefore sent twice with the same content, which is harmless for consumers that
+    apply changes by key.
+
+    Parameters:
+        since (int): The checkpoint, i.e. the sequence number of the last change already applied.
+        batch_size (int): Change records read per query.
+        tables (list): Only stream changes to these tables, if given.
+
+    Yields:
+        dict: sequence, table, operation ('upsert', 'delete' or 'reload'), key (the primary key values)
+        and row (the current row as a dict, or None). A reload means the table was bulk loaded without
+        the change log triggers and has to be read in full.
+
+    Raises:
+        ValueError: If changes after since have been compacted, see check_checkpoint().
+    """
+    with read_connection(conn) as conn:
+        own_transaction = not conn.in_transaction
+        if own_transaction:
+            conn.execute("BEGIN")
+        try:
+            check_checkpoint(since, conn)
+            until = last_sequence(conn)
+            queries = {}
+            table_filter = f"AND table_name IN ({', '.join('?' * len(tables))})" if tables else ''
+            changes_query = CHANGES_QUERY.format(table_filter=table_filter)
+            while since < until:
+                records = conn.execute(changes_query, (since, until, *(tables or ()), batch_size)).fetchall()
+                if not records:
+                    break
+                latest = {}
+                for sequence, table_name, operation, row_key in records:
+                    latest.pop((table_name, row_key), None)
+                    latest[(table_name, row_key)] = (sequence, operation)
+                for (table_name, row_key), (sequence, operation) in latest.items():
+                    key = json.loads(row_key)
+                    if operation == 'R':
+                        yield {'sequence': sequence, 'table': table_name, 'operation': 'reload', 'key': None, 'row': None}
+                        continue
+                    if table_name not in queries:
+                        queries[table_name] = row_query(conn, table_name)
+                    row = fetch_row(conn, queries[table_name], key)
+                    yield {'sequence': sequence, 'table': table_name, 'operation': 'delete' if row is None else 'upsert',
+                           'key': key, 'row': row}
+                since = records[-1][0]
+        finally:
+            if own_transaction:
+                conn.execute("COMMIT")
+
+
+def consumers(conn=None):
+    """
+    Returns every registered consumer with its checkpoint, when it last moved and how many changes it has
+    not consumed yet.
+    """
+    with read_connection(conn) as conn:
+        return [dict(zip(('consumer', 'sequence', 'updated_at', 'pending'), row))
+                for row in conn.execute(CONSUMERS_QUERY)]
+
+
+def register_consumer(consumer, sequence, conn=None):
+    """
+    Registers a consumer with its starting checkpoint, normally the last_sequence() read in the same read
+    transaction as the full export the consumer started from.
+
+    Raises:
+        ValueError: If the consumer is already registered.
+    """
+    try:
+        with write_connection(conn) as conn:
+            conn.execute(REGISTER_CONSUMER_STATEMENT, (consumer, sequence))
+    except sqlite3.IntegrityError:
+        raise ValueError(f"Consumer {consumer} is already registered")
+
+
+def commit_checkpoint(consumer, sequence, conn=None):
+    """
+    Records that a consumer has applied every change up to sequence. A checkpoint never moves backwards.
+
+    Raises:
+        ValueError: If the consumer is not registered.
+    """
+    with write_connection(conn) as conn:
+        if conn.execute(CHECKPOINT_STATEMENT, (sequence, consumer)).rowcount == 0:
+            raise ValueError(f"Unknown consumer: {consumer}")
+
+
+def unregister_consumer(consumer, conn=None):
+    """
+    Removes a consumer, so compaction no longer waits for it.
+    """
+    with write_connection(conn) as conn:
+        conn.execute("DELETE FROM ChangeLogConsumer WHERE consumer = ?", (consumer,))
+
+
+def compact(batch_size=COMPACT_BATCH_SIZE, conn=None):
+    """
+    Deletes the change records every registered consumer has consumed, or all of them if there are no
+    consumers (a consumer registered later starts from a full export). The records are deleted
+    batch_size at a time, each batch in its own short write transaction.
+
+    Returns:
+        int: The number of records deleted.
+    """
+    with read_connection(conn) as reader:
+        target = reader.execute("SELECT MIN(sequence) FROM ChangeLogConsumer").fetchone()[0]
+        if target is None:
+            target = last_sequence(reader)
+        first = reader.execute(FIRST_SEQUENCE_QUERY).fetchone()[0]
+    deleted = 0
+    while first is not None and first <= target:
+        upto = min(first + batch_size - 1, target)
+        with write_connection(conn) as writer:
+            deleted += writer.execute(COMPACT_STATEMENT, (upto,)).rowcount
+        first = upto + 1
+    return deleted
+
+
+def write_table(conn, table_name, path):
+    """
+    Writes a whole table to a JSONL file, one row object per line.
+
+    Returns:
+        int: The number of rows written.
+    """
+    cursor = conn.execute(f"SELECT * FROM {table_name}")
+    columns = [column[0] for column in cursor.description]
+    count = 0
+    with open(path, 'w') as f:
+        while True:
+            rows = cursor.fetchmany(CHANGE_BATCH_SIZE)
+            if not rows:
+                break
+            f.writelines(json.dumps(dict(zip(columns, row))) + '\n' for row in rows)
+            count += len(rows)
+    return count
+
+
+def export_changes(consumer, output_dir, batch_size=CHANGE_BATCH_SIZE, conn=None):
+    """
+    Runs one sync for a consumer: writes the changes since its checkpoint to a JSONL file in output_dir
+    and moves the checkpoint past them.
+
+    A consumer's first sync is a full export: every table is written to <table>_<sequence>.jsonl and the
+    consumer is registered at that sequence. After that, each sync writes changes_<from>_<to>.jsonl with
+    one stream_changes() record per line, so it costs time in proportion to the number of changes. A
+    reload record also gets the whole table written next to it, named in its 'file' field. Files are
+    written under a temporary name and renamed once complete, and the checkpoint only moves after that;
+    a sync interrupted in between is repeated in full by the next one.
+
+    Parameters:
+        consumer (str): The consumer name, e.g. 'warehouse'.
+        output_dir (str): Directory the files are written to.
+        batch_size (int): Change records read per query.
+
+    Returns:
+        dict: mode ('full' or 'incremental'), from and to sequence numbers, changes (or rows) written and
+        the files written.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    with read_connection(conn) as reader:
+        checkpoint = reader.execute("SELECT sequence FROM ChangeLogConsumer WHERE consumer = ?", (consumer,)).fetchone()
+        own_transaction = not reader.in_transaction
+        if own_transaction:
+            reader.execute("BEGIN")
+        try:
+            until = last_sequence(reader)
+            files = []
+            if checkpoint is None:
+                written = 0
+                for table_name in TABLES:
+                    path = os.path.join(output_dir, f"{table_name}_{until}.jsonl")
+                    written += write_table(reader, table_name, path + '.tmp')
+                    os.replace(path + '.tmp', path)
+                    files.append(path)
+                result = {'mode': 'full', 'from': None, 'to': until, 'changes': written, 'files': files}
+            else:
+                since = checkpoint[0]
+                written = 0
+                if until > since:
+                    path = os.path.join(output_dir, f"changes_{since}_{until}.jsonl")
+                    with open(path + '.tmp', 'w') as f:
+                        for change in stream_changes(since, batch_size, conn=reader):
+                            if change['operation'] == 'reload':
+                                change['file'] = f"{change['table']}_{change['sequence']}.jsonl"
+                                table_path = os.path.join(output_dir, change['file'])
+                                write_table(reader, change['table'], table_path + '.tmp')
+                                os.replace(table_path + '.tmp', table_path)
+                                files.append(table_path)
+                            f.write(json.dumps(change) + '\n')
+                            written += 1
+                    os.replace(path + '.tmp', path)
+                    files.append(path)
+                result = {'mode': 'incremental', 'from': since, 'to': until, 'changes': written, 'files': files}
+        finally:
+            if own_transaction:
+                reader.execute("COMMIT")
+    if checkpoint is None:
+        register_consumer(consumer, until, conn)
+    else:
+        commit_checkpoint(consumer, until, conn)
+    return result
+
+
+def time_sync(consumer, output_dir, conn):
+    start = time.perf_counter()
+    result = export_changes(consumer, output_dir, conn=conn)
+    result['seconds'] = time.perf_counter() - start
+    for path in result['files']:
+        os.remove(path)
+    return result
+
+
+def run_sync_benchmark(db_name, work_db, change_counts, seed, output_dir):
+    """
+    Times syncs of a copy of the database after each number of changes: a full export, and an incremental
+    export of just the changes. The changes are updates of random proposals, each in its own transaction
+    as the menu would make them, timed with and without the change log triggers.
+
+    Returns:
+        list: One dict per number of changes with the write and sync times.
+    """
+    take_snapshot(db_name, work_db)
+    conn = sqlite3.connect(work_db)
+    conn.execute("PRAGMA journal_mode = WAL")
+    create_change_log_triggers(conn.cursor())
+    conn.commit()
+    rng = random.Random(seed)
+    proposals = [row[0] for row in conn.execute("SELECT proposal_id FROM Proposal")]
+    update = "UPDATE Proposal SET requested_amount = requested_amount + 1 WHERE proposal_id = ?"
+
+    def apply_changes(n):
+        start = time.perf_counter()
+        for proposal_id in rng.choices(proposals, k=n):
+            conn.execute(update, (proposal_id,))
+            conn.commit()
+        return time.perf_counter() - start
+
+    # Register the consumer with a first full export
+    time_sync('benchmark', output_dir, conn)
+    results = []
+    for n in change_counts:
+        cursor = conn.cursor()
+        cursor.execute("DROP TRIGGER trg_change_log_Proposal_update")
+        untracked = apply_changes(n)
+        create_change_log_triggers(cursor)
+        conn.commit()
+        tracked = apply_changes(n)
+        incremental = time_sync('benchmark', output_dir, conn)
+        full_start = time.perf_counter()
+        for table_name in TABLES:
+            path = os.path.join(output_dir, f"{table_name}.jsonl")
+            write_table(conn, table_name, path)
+            os.remove(path)
+        full = time.perf_counter() - full_start
+        compacted = compact(conn=conn)
+        results.append({'changes': n, 'write_us': untracked / n * 1e6, 'logged_write_us': tracked / n * 1e6,
+                        'records_synced': incremental['changes'], 'incremental_s': incremental['seconds'],
+                        'full_s': full, 'compacted': compacted})
+    conn.close()
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(work_db + suffix):
+            os.remove(work_db + suffix)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the changes logged since each consumer's last sync, "
+                                                 "prune consumed changes, or benchmark syncs.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    export = subparsers.add_parser('export', help="Write the changes since the consumer's checkpoint (a full export the first time)")
+    export.add_argument('--db', default=connections.DB_NAME)
+    export.add_argument('--consumer', required=True)
+    export.add_argument('--output-dir', default='changes')
+    export.add_argument('--batch-size', type=int, default=CHANGE_BATCH_SIZE)
+    status = subparsers.add_parser('status', help="List the consumers, their checkpoints and pending changes")
+    status.add_argument('--db', default=connections.DB_NAME)
+    compact_parser = subparsers.add_parser('compact', help="Delete the changes every consumer has consumed")
+    compact_parser.add_argument('--db', default=connections.DB_NAME)
+    compact_parser.add_argument('--batch-size', type=int, default=COMPACT_BATCH_SIZE)
+    drop = subparsers.add_parser('unregister', help="Remove a consumer so compaction no longer waits for it")
+    drop.add_argument('--db', default=connections.DB_NAME)
+    drop.add_argument('--consumer', required=True)
+    bench = subparsers.add_parser('benchmark', help="Compare incremental and full syncs after N changes")
+    bench.add_argument('--db', default=connections.DB_NAME, help="Database to copy for the benchmark")
+    bench.add_argument('--work-db', default='change_log_benchmark.db')
+    bench.add_argument('--changes', type=int, nargs='+', default=[10, 100, 1000, 10000])
+    bench.add_argument('--seed', type=int, default=0)
+    bench.add_argument('--output-dir', default='change_log_benchmark')
+    args = parser.parse_args()
+
+    if args.command == 'benchmark':
+        print(f"{'changes':>8} {'write':>10} {'logged write':>13} {'synced':>7} {'incremental':>12} {'full export':>12}")
+        for result in run_sync_benchmark(args.db, args.work_db, args.changes, args.seed, args.output_dir):
+            print(f"{result['changes']:>8} {result['write_us']:8.1f}us {result['logged_write_us']:11.1f}us "
+                  f"{result['records_synced']:>7} {result['incremental_s'] * 1000:10.1f}ms {result['full_s'] * 1000:10.1f}ms")
+        os.rmdir(args.output_dir)
+    else:
+        connections.configure(args.db)
+        try:
+            if args.command == 'export':
+                result = export_changes(args.consumer, args.output_dir, args.batch_size)
+                print(f"{args.consumer}: {result['mode']} export to sequence {result['to']}, "
+                      f"{result['changes']} {'rows' if result['mode'] == 'full' else 'changes'} in {len(result['files'])} files")
+            elif args.command == 'status':
+                print(f"last sequence {last_sequence()}")
+                for row in consumers():
+                    print(f"{row['consumer']:<20} at {row['sequence']:>10}  {row['pending']:>8} pending  since {row['updated_at']}")
+            elif args.command == 'compact':
+                print(f"Deleted {compact(args.batch_size)} consumed change records")
+            else:
+                unregister_consumer(args.consumer)
+        finally:
+            connections.close_pool()
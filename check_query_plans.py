@@ -0,0 +1,144 @@
+import argparse
+import contextlib
+import io
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+
+import db_app
+from create_database import create_database
+
+# Tables that grow with the number of proposals; a full SCAN of any of these is a regression
+LARGE_TABLES = {'Researcher', 'Competition', 'Proposal', 'ProposalCollaborator', 'ReviewAssignment', 'ConflictOfInterest', 'MeetingParticipation'}
+
+# Each query function in db_app.py with representative arguments
+QUERY_FUNCTIONS = [
+    (db_app.find_open_competitions, ('06',)),
+    (db_app.find_largest_amount_proposal, ('Data Science',)),
+    (db_app.find_largest_awarded_proposals, ('2024-06-01',)),
+    (db_app.average_discrepancy, ('Data Science',)),
+    (db_app.check_reviewer_limit, (1,)),
+    (db_app.fetch_eligible_reviewers, (1,)),
+    (db_app.find_proposals_to_review, ('Daniel Webb',)),
+    (db_app.area_report, ()),
+    (db_app.monthly_open_competitions, ()),
+    (db_app.find_reviewers_by_prefix, ('dan',)),
+    (db_app.search_reviewers, ('danial web',)),
+    (db_app.search_competitions, ('machine learn', 2)),
+    (db_app.search_organizations, ('university',)),
+    (db_app.due_reviews, ('reviewer', '2024-06-01')),
+    (db_app.due_reviews, ('competition', '2024-06-01')),
+]
+
+# Query functions whose statements must be answered from an index alone, without reading its table
+COVERING_INDEXES = {
+    'due_reviews': 'idx_review_assignment_due',
+}
+
+
+def table_aliases(sql):
+    """
+    Maps every table name and alias used in a statement to the underlying table name.
+    """
+    aliases = {}
+    for table_name, alias in re.findall(r'\b(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?', sql, re.IGNORECASE):
+        aliases[table_name] = table_name
+        if alias and alias.upper() not in ('WHERE', 'JOIN', 'ON', 'LEFT', 'INNER', 'GROUP', 'ORDER', 'UNION'):
+            aliases[alias] = table_name
+    return aliases
+
+
+def capture_statements(conn, function, args):
+    """
+    Runs a query function on the given connection and returns the SQL statements it executed, with parameters bound.
+    """
+    statements = []
+    conn.set_trace_callback(statements.append)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            function(*args, conn=conn)
+    finally:
+        conn.set_trace_callback(None)
+    return [sql for sql in statements if sql.lstrip().upper().startswith('SELECT')]
+
+
+def full_scans(conn, sql):
+    """
+    Returns the large tables that the query plan of a statement scans in full.
+
+    Parameters:
+        conn (sqlite3.Connection): A connection to the database.
+        sql (str): The SQL statement to explain.
+
+    Returns:
+        list: A list of (table name, plan detail) tuples.
+    """
+    aliases = table_aliases(sql)
+    scans = []
+    for _, _, _, detail in conn.execute(f"EXPLAIN QUERY PLAN {sql}").fetchall():
+        # A SEARCH that names no index (as reported for MIN/MAX aggregates) is also a full scan
+        match = re.match(r'SCAN (\w+)', detail) or re.fullmatch(r'SEARCH (\w+)', detail)
+        if match and aliases.get(match.group(1), match.group(1)) in LARGE_TABLES:
+            scans.append((aliases.get(match.group(1), match.group(1)), detail))
+    return scans
+
+
+def uses_covering_index(conn, sql, index_name):
+    """
+    Whether the query plan of a statement reads the given index as a covering index.
+    """
+    return any(f"USING COVERING INDEX {index_name} " in f"{detail} "
+               for _, _, _, detail in conn.execute(f"EXPLAIN QUERY PLAN {sql}").fetchall())
+
+
+def check_query_plans(conn):
+    """
+    Explains every query function in db_app.py and reports full scans of large tables, and statements
+    that read a table their index in COVERING_INDEXES should cover.
+
+    Parameters:
+        conn (sqlite3.Connection): A connection to the database.
+
+    Returns:
+        bool: True if no query falls back to a full scan of a large table or misses its covering index.
+    """
+    ok = True
+    for function, args in QUERY_FUNCTIONS:
+        for sql in capture_statements(conn, function, args):
+            scans = full_scans(conn, sql)
+            index_name = COVERING_INDEXES.get(function.__name__)
+            if scans:
+                ok = False
+                for table_name, detail in scans:
+                    print(f"FAIL {function.__name__}: full scan of {table_name} ({detail})")
+            elif index_name is not None and not uses_covering_index(conn, sql, index_name):
+                ok = False
+                print(f"FAIL {function.__name__}: does not use {index_name} as a covering index")
+            else:
+                print(f"OK   {function.__name__}")
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fail if a db_app.py query falls back to a full scan of a large table "
+                                                 "or reads a table its index should cover.")
+    parser.add_argument('--db', help="Database to check (default: a freshly created empty schema)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Without ANALYZE statistics the planner assumes every table is large, which is the case this
+        # check guards; on a small analyzed database, scanning a tiny table can legitimately be cheaper.
+        db_name = args.db
+        if db_name is None:
+            db_name = os.path.join(tmp, 'schema.db')
+            create_database(db_name)
+        conn = sqlite3.connect(db_name)
+        try:
+            passed = check_query_plans(conn)
+        except sqlite3.Error as e:
+            print("Error explaining queries:", e)
+            passed = False
+        conn.close()
+    sys.exit(0 if passed else 1)
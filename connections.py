@@ -0,0 +1,217 @@
+import queue
+import random
+import sqlite3
+import time
+import threading
+from contextlib import contextmanager
+
+DB_NAME = 'council.db'
+READER_POOL_SIZE = 4
+BUSY_TIMEOUT_MS = 5000
+CACHE_SIZE_KIB = 65536
+# BEGIN IMMEDIATE is retried this many times after busy_timeout runs out, waiting up to
+# RETRY_BASE_DELAY * 2 ** attempt seconds (at most RETRY_MAX_DELAY) between attempts
+BEGIN_RETRIES = 8
+RETRY_BASE_DELAY = 0.01
+RETRY_MAX_DELAY = 1.0
+
+
+class ConnectionPool:
+    """
+    Read-only connections for queries plus a single serialized writer connection, all on one WAL database.
+
+    In WAL mode readers never block the writer and the writer never blocks readers, so reports can run
+    while reviewer assignments are being written. Writes go through one connection guarded by a lock, so
+    they never contend with each other for the database lock either.
+    """
+
+    def __init__(self, db_name=DB_NAME, readers=READER_POOL_SIZE, busy_timeout_ms=BUSY_TIMEOUT_MS,
+                 cache_size_kib=CACHE_SIZE_KIB):
+        self.db_name = db_name
+        self.busy_timeout_ms = busy_timeout_ms
+        self.cache_size_kib = cache_size_kib
+
+        # The writer is opened first: it creates the file if needed and switches it to WAL,
+        # which is persistent, before any read-only connection is opened.
+        self.writer_lock = threading.Lock()
+        self.writer = self.connect()
+        self.writer.execute("PRAGMA journal_mode = WAL")
+
+        self.readers = queue.Queue()
+        self.all_readers = []
+        for _ in range(readers):
+            reader = self.connect(read_only=True)
+            self.readers.put(reader)
+            self.all_readers.append(reader)
+
+    def connect(self, read_only=False):
+        if read_only:
+            conn = sqlite3.connect(f"file:{self.db_name}?mode=ro", uri=True, check_same_thread=False)
+        else:
+            conn = sqlite3.connect(self.db_name, check_same_thread=False)
+        conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout_ms)}")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute(f"PRAGMA cache_size = -{int(self.cache_size_kib)}")
+        return conn
+
+    @contextmanager
+    def reader(self):
+        """Borrows a read-only connection, blocking until one is free."""
+        conn = self.readers.get()
+        try:
+            yield conn
+        finally:
+            # Never hand a connection back with an open read transaction
+            if conn.in_transaction:
+                conn.rollback()
+            self.readers.put(conn)
+
+    @contextmanager
+    def write(self):
+        """Holds the writer connection; commits on success and rolls back on error."""
+        with self.writer_lock:
+            try:
+                yield self.writer
+                self.writer.commit()
+            except BaseException:
+                self.writer.rollback()
+                raise
+
+    def close(self):
+        with self.writer_lock:
+            self.writer.close()
+        for reader in self.all_readers:
+            reader.close()
+
+
+pool = None
+pool_lock = threading.Lock()
+
+
+def configure(db_name=DB_NAME, readers=READER_POOL_SIZE, busy_timeout_ms=BUSY_TIMEOUT_MS, cache_size_kib=CACHE_SIZE_KIB):
+    """
+    Replaces the shared pool used by the db_app.py query functions with one on the given database.
+
+    Parameters:
+        db_name (str): Path of the database file.
+        readers (int): Number of read-only connections.
+        busy_timeout_ms (int): How long a connection waits on a lock before failing.
+        cache_size_kib (int): Page cache size per connection.
+
+    Returns:
+        ConnectionPool: The new pool.
+    """
+    global pool
+    with pool_lock:
+        if pool is not None:
+            pool.close()
+        pool = ConnectionPool(db_name, readers, busy_timeout_ms, cache_size_kib)
+        return pool
+
+
+def get_pool():
+    """Returns the shared pool, creating it on council.db on first use."""
+    global pool
+    with pool_lock:
+        if pool is None:
+            pool = ConnectionPool()
+        return pool
+
+
+def close_pool():
+    global pool
+    with pool_lock:
+        if pool is not None:
+            pool.close()
+            pool = None
+
+
+@contextmanager
+def read_connection(conn=None):
+    """
+    Yields the given connection, or borrows a read-only one from the shared pool if it is None.
+    """
+    if conn is not None:
+        yield conn
+    else:
+        with get_pool().reader() as pooled:
+            yield pooled
+
+
+@contextmanager
+def write_connection(conn=None):
+    """
+    Yields the given connection, or the shared serialized writer if it is None, and commits on success.
+    """
+    if conn is None:
+        with get_pool().write() as writer:
+            yield writer
+        return
+    try:
+        yield conn
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+
+
+def is_busy(error):
+    """Whether a sqlite3 error means another connection holds the lock, so retrying may succeed."""
+    return isinstance(error, sqlite3.OperationalError) and (
+        getattr(error, 'sqlite_errorcode', None) in (sqlite3.SQLITE_BUSY, sqlite3.SQLITE_LOCKED)
+        or 'locked' in str(error) or 'busy' in str(error))
+
+
+def begin_immediate(conn, retries=BEGIN_RETRIES, base_delay=RETRY_BASE_DELAY):
+    """
+    Starts a write transaction that holds the database write lock from its first statement.
+
+    Checks made in the transaction therefore see the state its writes apply to: no other connection,
+    in this process or another, can commit in between. Each attempt waits up to the connection's
+    busy_timeout for the lock; after that it is retried with exponential backoff and random jitter,
+    so waiting writers do not all retry at the same moment.
+
+    Parameters:
+        conn (sqlite3.Connection): A read-write connection with no open transaction.
+        retries (int): How many times to retry once busy_timeout has run out.
+        base_delay (float): The longest wait in seconds before the first retry; it doubles with every retry.
+
+    Returns:
+        int: The number of retries it took.
+
+    Raises:
+        sqlite3.OperationalError: If the lock could not be taken after the last retry.
+    """
+    for attempt in range(retries + 1):
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            return attempt
+        except sqlite3.OperationalError as e:
+            if not is_busy(e) or attempt == retries:
+                raise
+        time.sleep(random.uniform(0, min(RETRY_MAX_DELAY, base_delay * 2 ** attempt)))
+
+
+def run_immediate(function, conn=None, retries=BEGIN_RETRIES, base_delay=RETRY_BASE_DELAY):
+    """
+    Calls function(conn) in a transaction started with begin_immediate(), committing on success and
+    rolling back on error.
+
+    Parameters:
+        function: Called with the connection; its return value is returned.
+        conn (sqlite3.Connection): The connection to use, or None for the shared serialized writer.
+        retries (int): See begin_immediate().
+        base_delay (float): See begin_immediate().
+    """
+    if conn is None:
+        pool = get_pool()
+        with pool.writer_lock:
+            return run_immediate(function, pool.writer, retries, base_delay)
+    begin_immediate(conn, retries, base_delay)
+    try:
+        result = function(conn)
+        conn.commit()
+        return result
+    except BaseException:
+        conn.rollback()
+        raise
@@ -1,18 +1,687 @@
 import sqlite3
 
+from batch_assignment import MAX_ASSIGNMENTS_PER_REVIEWER, MAX_REVIEWERS_PER_PROPOSAL
 
-def create_database():
-    conn = sqlite3.connect('council.db')
+# Every table created by create_database()
+TABLES = ['Researcher', 'Organization', 'Competition', 'Proposal', 'ProposalCollaborator', 'Reviewer',
+          'ReviewAssignment', 'ConflictOfInterest', 'Meeting', 'MeetingParticipation']
+
+# Bookkeeping tables maintained by triggers and consumers, not data users view or export
+INTERNAL_TABLES = ['TableVersion', 'AreaSummary', 'AreaMaxProposal', 'ChangeLog', 'ChangeLogConsumer']
+
+# Triggers that maintain derived data rather than enforce constraints. Bulk loads drop them and
+# call rebuild_derived_state() afterwards instead of firing them once per row.
+DERIVED_TRIGGER_PREFIXES = ('trg_collaborator_count_', 'trg_version_', 'trg_area_summary_', 'trg_name_search_',
+                            'trg_text_search_', 'trg_change_log_')
+
+# Triggers that enforce the reviewer assignment limits. They count a proposal's and a reviewer's
+# assignments for every row written, so bulk loads drop them too and check the loaded rows with
+# assignment_limit_violations() before recreating them.
+ASSIGNMENT_LIMIT_TRIGGER_PREFIX = 'trg_assignment_limit_'
+
+# (index name, table, indexed columns) for every secondary index in the schema
+INDEXES = [
+    ('idx_researcher_organization', 'Researcher', 'organization_id'),
+    ('idx_researcher_full_name', 'Researcher', 'full_name'),
+    ('idx_competition_area', 'Competition', 'competition_area'),
+    ('idx_competition_status_month', 'Competition', 'competition_status, deadline_month'),
+    ('idx_proposal_competition', 'Proposal', 'competition_id'),
+    ('idx_proposal_investigator', 'Proposal', 'principle_investigator_id'),
+    ('idx_proposal_awarded', 'Proposal', 'awarded_date, awarded_amount'),
+    ('idx_collaborator', 'ProposalCollaborator', 'collaborator_id'),
+    ('idx_review_assignment_reviewer', 'ReviewAssignment', 'reviewer_id'),
+    ('idx_review_assignment_competition', 'ReviewAssignment', 'competition_id'),
+    ('idx_conflict_reviewer', 'ConflictOfInterest', 'reviewer_id'),
+    ('idx_conflict_researcher', 'ConflictOfInterest', 'conflicted_researcher_id'),
+    ('idx_meeting_participation_competition', 'MeetingParticipation', 'competition_id'),
+    ('idx_meeting_participation_reviewer', 'MeetingParticipation', 'reviewer_id'),
+]
+
+# (index name, table, indexed columns) for unique indexes. A reviewer can only be assigned to a proposal once.
+UNIQUE_INDEXES = [
+    ('idx_review_assignment_pair', 'ReviewAssignment', 'proposal_id, reviewer_id'),
+]
+
+# (index name, table, indexed columns, WHERE clause) for partial indexes. Queries must repeat
+# the WHERE clause verbatim for SQLite to use them.
+LARGE_PROPOSAL_CONDITION = 'requested_amount > 20000 OR collaborator_count > 10'
+PENDING_REVIEW_CONDITION = 'review_submitted = 0'
+PARTIAL_INDEXES = [
+    ('idx_proposal_large', 'Proposal', 'competition_id', LARGE_PROPOSAL_CONDITION),
+    # Only unsubmitted reviews, by deadline. It covers the due review queries: SQLite does not take the
+    # WHERE clause's columns from it, so review_submitted is also indexed for them to never read the table
+    ('idx_review_assignment_due', 'ReviewAssignment',
+     'review_deadline, reviewer_id, competition_id, proposal_id, review_submitted', PENDING_REVIEW_CONDITION),
+]
+
+# (FTS5 table, content table, key column, indexed columns) for full-text search. The FTS5 tables use
+# external content, so they hold only the index and read the text itself from the content table.
+TEXT_SEARCH_INDEXES = [
+    ('CompetitionSearch', 'Competition', 'competition_id',
+     ['competition_title', 'competition_description', 'competition_area']),
+    ('OrganizationSearch', 'Organization', 'organization_id', ['organization_name', 'organization_address']),
+]
+TEXT_SEARCH_TOKENIZER = 'porter unicode61 remove_diacritics 2'
+
+# Indexes from earlier revisions that a current index makes redundant
+SUPERSEDED_INDEXES = ['idx_proposal_awarded_date', 'idx_review_assignment_proposal', 'idx_review_assignment_pending']
+
+# Competition.deadline_month is generated from the deadline so the month filter can use an index.
+# ALTER TABLE can only add VIRTUAL generated columns; indexing one stores its values in the index.
+# Researcher.full_name is the normalized name reviewers are looked up by; its NOCASE collation makes
+# exact and prefix lookups case-insensitive index seeks.
+FULL_NAME_COLUMN = "full_name TEXT COLLATE NOCASE GENERATED ALWAYS AS (trim(first_name) || ' ' || trim(last_name)) VIRTUAL"
+DEADLINE_MONTH_COLUMN = "deadline_month TEXT GENERATED ALWAYS AS (strftime('%m', competition_deadline)) VIRTUAL"
+
+
+def create_indexes(cursor):
+    """
+    Creates the secondary indexes used by the queries in db_app.py.
+
+    Every statement is idempotent, so this can also be run against an existing database. Before a
+    unique index is first created, rows repeating the key of an earlier row are deleted.
+
+    Parameters:
+        cursor (sqlite3.Cursor): A cursor on the database to index.
+    """
+    for index_name, table_name, columns in INDEXES:
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON {table_name} ({columns})")
+    for index_name, table_name, columns in UNIQUE_INDEXES:
+        if not cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = ?", (index_name,)).fetchone():
+            cursor.execute(f"DELETE FROM {table_name} WHERE rowid NOT IN (SELECT MIN(rowid) FROM {table_name} GROUP BY {columns})")
+            if cursor.rowcount > 0:
+                print(f"Deleted {cursor.rowcount} {table_name} rows repeating an earlier ({columns})")
+        cursor.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS {index_name} ON {table_name} ({columns})")
+    for index_name, table_name, columns, condition in PARTIAL_INDEXES:
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON {table_name} ({columns}) WHERE {condition}")
+    for index_name in SUPERSEDED_INDEXES:
+        cursor.execute(f"DROP INDEX IF EXISTS {index_name}")
+
+
+def create_collaborator_count_triggers(cursor):
+    """
+    Creates the triggers that keep Proposal.collaborator_count in step with ProposalCollaborator.
+
+    Parameters:
+        cursor (sqlite3.Cursor): A cursor on the database.
+    """
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_collaborator_count_insert
+        AFTER INSERT ON ProposalCollaborator
+        FOR EACH ROW
+        BEGIN
+            UPDATE Proposal SET collaborator_count = collaborator_count + 1 WHERE proposal_id = NEW.proposal_id;
+        END;
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_collaborator_count_delete
+        AFTER DELETE ON ProposalCollaborator
+        FOR EACH ROW
+        BEGIN
+            UPDATE Proposal SET collaborator_count = collaborator_count - 1 WHERE proposal_id = OLD.proposal_id;
+        END;
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_collaborator_count_update
+        AFTER UPDATE OF proposal_id ON ProposalCollaborator
+        FOR EACH ROW
+        WHEN NEW.proposal_id IS NOT OLD.proposal_id
+        BEGIN
+            UPDATE Proposal SET collaborator_count = collaborator_count - 1 WHERE proposal_id = OLD.proposal_id;
+            UPDATE Proposal SET collaborator_count = collaborator_count + 1 WHERE proposal_id = NEW.proposal_id;
+        END;
+    ''')
+
+
+def backfill_collaborator_counts(cursor):
+    """
+    Recomputes Proposal.collaborator_count for every proposal from ProposalCollaborator.
+
+    Parameters:
+        cursor (sqlite3.Cursor): A cursor on the database.
+    """
+    cursor.execute('''
+        UPDATE Proposal
+        SET collaborator_count = (SELECT COUNT(*) FROM ProposalCollaborator pc WHERE pc.proposal_id = Proposal.proposal_id)
+    ''')
+
+
+def add_collaborator_count(cursor):
+    """
+    Adds Proposal.collaborator_count to a database created before the column existed and backfills it.
+
+    Parameters:
+        cursor (sqlite3.Cursor): A cursor on the database.
+    """
+    columns = [row[1] for row in cursor.execute("PRAGMA table_info(Proposal)")]
+    if 'collaborator_count' not in columns:
+        cursor.execute("ALTER TABLE Proposal ADD COLUMN collaborator_count INTEGER NOT NULL DEFAULT 0")
+        backfill_collaborator_counts(cursor)
+
+
+def add_full_name(cursor):
+    """
+    Adds the generated Researcher.full_name column to a database created before it existed.
+
+    Parameters:
+        cursor (sqlite3.Cursor): A cursor on the database.
+    """
+    columns = [row[1] for row in cursor.execute("PRAGMA table_xinfo(Researcher)")]
+    if 'full_name' not in columns:
+        cursor.execute(f"ALTER TABLE Researcher ADD COLUMN {FULL_NAME_COLUMN}")
+
+
+def add_deadline_month(cursor):
+    """
+    Adds the generated Competition.deadline_month column to a database created before it existed.
+
+    Parameters:
+        cursor (sqlite3.Cursor): A cursor on the database.
+    """
+    columns = [row[1] for row in cursor.execute("PRAGMA table_xinfo(Competition)")]
+    if 'deadline_month' not in columns:
+        cursor.execute(f"ALTER TABLE Competition ADD COLUMN {DEADLINE_MONTH_COLUMN}")
+
+
+def create_table_version_triggers(cursor):
+    """
+    Creates the TableVersion table and the triggers that bump a table's version on every change to it.
+
+    Caches compare these versions to tell whether a result computed earlier is still current.
+
+    Parameters:
+        cursor (sqlite3.Cursor): A cursor on the database.
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS TableVersion (
+            table_name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    for table_name in TABLES:
+        cursor.execute("INSERT OR IGNORE INTO TableVersion (table_name, version) VALUES (?, 0)", (table_name,))
+        for event in ('INSERT', 'UPDATE', 'DELETE'):
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS trg_version_{table_name}_{event.lower()}
+                AFTER {event} ON {table_name}
+                FOR EACH ROW
+                BEGIN
+                    UPDATE TableVersion SET version = version + 1 WHERE table_name = '{table_name}';
+                END;
+            ''')
+
+
+def key_columns(cursor, table_name):
+    """
+    Returns the primary key columns of a table in key order.
+    """
+    columns = [(row[5], row[1]) for row in cursor.execute(f"PRAGMA table_info({table_name})") if row[5] > 0]
+    return [name for _, name in sorted(columns)]
+
+
+def create_change_log_triggers(cursor):
+    """
+    Creates the ChangeLog and ChangeLogConsumer tables and the triggers that append a change record to
+    ChangeLog for every row inserted, updated or deleted in the base tables.
+
+    A record holds only the table, the operation ('I', 'U' or 'D') and the primary key of the row as a
+    JSON array; consumers read the current row when they apply the change (see change_log.py). An update
+    that changes the primary key is logged as a delete of the old key and an update of the new one.
+    ChangeLog.sequence is an AUTOINCREMENT key, so it only grows and is never reused after compaction.
+
+    Parameters:
+        cursor (sqlite3.Cursor): A cursor on the database.
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS ChangeLog (
+            sequence INTEGER PRIMARY KEY AUTOINCREMENT,
+            table_name TEXT NOT NULL,
+            operation TEXT NOT NULL CHECK (operation IN ('I', 'U', 'D', 'R')),
+            row_key TEXT NOT NULL
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS ChangeLogConsumer (
+            consumer TEXT PRIMARY KEY,
+            sequence INTEGER NOT NULL,
+            updated_at TEXT NOT NULL DEFAULT (datetime('now'))
+        )
+    ''')
+    for table_name in TABLES:
+        columns = key_columns(cursor, table_name)
+        new_key = f"json_array({', '.join(f'NEW.{column}' for column in columns)})"
+        old_key = f"json_array({', '.join(f'OLD.{column}' for column in columns)})"
+        key_changed = ' OR '.join(f"OLD.{column} IS NOT NEW.{column}" for column in columns)
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_change_log_{table_name}_insert
+            AFTER INSERT ON {table_name}
+            FOR EACH ROW
+            BEGIN
+                INSERT INTO ChangeLog (table_name, operation, row_key) VALUES ('{table_name}', 'I', {new_key});
+            END;
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_change_log_{table_name}_update
+            AFTER UPDATE ON {table_name}
+            FOR EACH ROW
+            BEGIN
+                INSERT INTO ChangeLog (table_name, operation, row_key)
+                SELECT '{table_name}', 'D', {old_key} WHERE {key_changed};
+                INSERT INTO ChangeLog (table_name, operation, row_key) VALUES ('{table_name}', 'U', {new_key});
+            END;
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_change_log_{table_name}_delete
+            AFTER DELETE ON {table_name}
+            FOR EACH ROW
+            BEGIN
+                INSERT INTO ChangeLog (table_name, operation, row_key) VALUES ('{table_name}', 'D', {old_key});
+            END;
+        ''')
+
+
+def log_table_reloads(cursor):
+    """
+    Appends a reload record ('R') for every table to ChangeLog, e.g. after a bulk load that ran without
+    the change log triggers. Consumers re-read the whole table when they reach one.
+    """
+    cursor.executemany("INSERT INTO ChangeLog (table_name, operation, row_key) VALUES (?, 'R', '[]')",
+                       [(table_name,) for table_name in TABLES])
+
+
+def area_of(competition_id):
+    return f"(SELECT competition_area FROM Competition WHERE competition_id = {competition_id})"
+
+
+def recompute_area_sql(area):
+    """
+    Returns the statements that recompute the AreaSummary and AreaMaxProposal rows of one area from scratch.
+    """
+    return f'''
+        DELETE FROM AreaMaxProposal WHERE competition_area = {area};
+        INSERT OR REPLACE INTO AreaSummary
+            (competition_area, proposal_count, max_requested_amount, discrepancy_sum, awarded_count, awarded_total)
+        SELECT {area}, COUNT(*), MAX(p.requested_amount), TOTAL(ABS(p.requested_amount - p.awarded_amount)),
+               COUNT(p.awarded_amount), TOTAL(p.awarded_amount)
+        FROM Proposal p
+        JOIN Competition c ON p.competition_id = c.competition_id
+        WHERE c.competition_area = {area}
+        HAVING {area} IS NOT NULL;
+        INSERT INTO AreaMaxProposal (competition_area, proposal_id)
+        SELECT {area}, p.proposal_id
+        FROM Proposal p
+        JOIN Competition c ON p.competition_id = c.competition_id
+        WHERE c.competition_area = {area}
+        AND p.requested_amount = (SELECT max_requested_amount FROM AreaSummary WHERE competition_area = {area});
+    '''
+
+
+def add_proposal_sql(row):
+    """
+    Returns the statements that add one proposal (NEW or OLD in a trigger) to its area summary.
+    """
+    area = area_of(f"{row}.competition_id")
+    return f'''
+        INSERT OR IGNORE INTO AreaSummary (competition_area) VALUES ({area});
+        DELETE FROM AreaMaxProposal
+        WHERE competition_area = {area}
+        AND {row}.requested_amount > (SELECT max_requested_amount FROM AreaSummary WHERE competition_area = {area});
+        INSERT OR IGNORE INTO AreaMaxProposal (competition_area, proposal_id)
+        SELECT {area}, {row}.proposal_id
+        WHERE {row}.requested_amount >= IFNULL(
+            (SELECT max_requested_amount FROM AreaSummary WHERE competition_area = {area}), {row}.requested_amount);
+        UPDATE AreaSummary
+        SET proposal_count = proposal_count + 1,
+            max_requested_amount = MAX(IFNULL(max_requested_amount, {row}.requested_amount), {row}.requested_amount),
+            discrepancy_sum = discrepancy_sum + IFNULL(ABS({row}.requested_amount - {row}.awarded_amount), 0),
+            awarded_count = awarded_count + ({row}.awarded_amount IS NOT NULL),
+            awarded_total = awarded_total + IFNULL({row}.awarded_amount, 0)
+        WHERE competition_area = {area};
+    '''
+
+
+def remove_proposal_sql(row):
+    """
+    Returns the statements that remove one proposal from its area summary. The maximum is only
+    recomputed when the last proposal holding it goes away.
+    """
+    area = area_of(f"{row}.competition_id")
+    return f'''
+        UPDATE AreaSummary
+        SET proposal_count = proposal_count - 1,
+            discrepancy_sum = discrepancy_sum - IFNULL(ABS({row}.requested_amount - {row}.awarded_amount), 0),
+            awarded_count = awarded_count - ({row}.awarded_amount IS NOT NULL),
+            awarded_total = awarded_total - IFNULL({row}.awarded_amount, 0)
+        WHERE competition_area = {area};
+        DELETE FROM AreaMaxProposal WHERE competition_area = {area} AND proposal_id = {row}.proposal_id;
+        UPDATE AreaSummary
+        SET max_requested_amount = (
+            SELECT MAX(p.requested_amount)
+            FROM Proposal p
+            JOIN Competition c ON p.competition_id = c.competition_id
+            WHERE c.competition_area = {area}
+        )
+        WHERE competition_area = {area}
+        AND NOT EXISTS (SELECT 1 FROM AreaMaxProposal WHERE competition_area = {area});
+        INSERT OR IGNORE INTO AreaMaxProposal (competition_area, proposal_id)
+        SELECT {area}, p.proposal_id
+        FROM Proposal p
+        JOIN Competition c ON p.competition_id = c.competition_id
+        WHERE c.competition_area = {area}
+        AND p.requested_amount = (SELECT max_requested_amount FROM AreaSummary WHERE competition_area = {area})
+        AND NOT EXISTS (SELECT 1 FROM AreaMaxProposal WHERE competition_area = {area});
+    '''
+
+
+def create_name_search_triggers(cursor):
+    """
+    Creates the full-text index over researcher names and the triggers that keep it in step with Researcher.
+
+    ResearcherNameSearch is an external content FTS5 table, so it stores only the index, not a second
+    copy of the names. ResearcherNameTerms lists the distinct words in that index, which fuzzy search
+    matches misspelled input against.
+
+    Parameters:
+        cursor (sqlite3.Cursor): A cursor on the database.
+    """
+    cursor.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS ResearcherNameSearch USING fts5(
+            full_name, content='Researcher', content_rowid='researcher_id', tokenize='unicode61 remove_diacritics 2'
+        )
+    ''')
+    cursor.execute("CREATE VIRTUAL TABLE IF NOT EXISTS ResearcherNameTerms USING fts5vocab(ResearcherNameSearch, row)")
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_name_search_insert
+        AFTER INSERT ON Researcher
+        FOR EACH ROW
+        BEGIN
+            INSERT INTO ResearcherNameSearch (rowid, full_name) VALUES (NEW.researcher_id, NEW.full_name);
+        END;
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_name_search_delete
+        AFTER DELETE ON Researcher
+        FOR EACH ROW
+        BEGIN
+            INSERT INTO ResearcherNameSearch (ResearcherNameSearch, rowid, full_name)
+            VALUES ('delete', OLD.researcher_id, OLD.full_name);
+        END;
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_name_search_update
+        AFTER UPDATE ON Researcher
+        FOR EACH ROW
+        WHEN NEW.researcher_id IS NOT OLD.researcher_id OR NEW.full_name IS NOT OLD.full_name
+        BEGIN
+            INSERT INTO ResearcherNameSearch (ResearcherNameSearch, rowid, full_name)
+            VALUES ('delete', OLD.researcher_id, OLD.full_name);
+            INSERT INTO ResearcherNameSearch (rowid, full_name) VALUES (NEW.researcher_id, NEW.full_name);
+        END;
+    ''')
+
+
+def rebuild_name_search(cursor):
+    """
+    Rebuilds the full-text index over researcher names from Researcher.
+    """
+    cursor.execute("INSERT INTO ResearcherNameSearch (ResearcherNameSearch) VALUES ('rebuild')")
+
+
+def create_text_search_triggers(cursor):
+    """
+    Creates the FTS5 tables listed in TEXT_SEARCH_INDEXES and the triggers that keep them in step with their tables.
+
+    Parameters:
+        cursor (sqlite3.Cursor): A cursor on the database.
+    """
+    for search_table, table_name, key, columns in TEXT_SEARCH_INDEXES:
+        cursor.execute(f'''
+            CREATE VIRTUAL TABLE IF NOT EXISTS {search_table} USING fts5(
+                {', '.join(columns)}, content='{table_name}', content_rowid='{key}', tokenize='{TEXT_SEARCH_TOKENIZER}'
+            )
+        ''')
+        column_list = ', '.join(columns)
+        new_values = ', '.join(f"NEW.{column}" for column in columns)
+        old_values = ', '.join(f"OLD.{column}" for column in columns)
+        insert_new = f"INSERT INTO {search_table} (rowid, {column_list}) VALUES (NEW.{key}, {new_values});"
+        delete_old = (f"INSERT INTO {search_table} ({search_table}, rowid, {column_list}) "
+                      f"VALUES ('delete', OLD.{key}, {old_values});")
+        triggers = {
+            'insert': f"AFTER INSERT ON {table_name} FOR EACH ROW BEGIN {insert_new} END",
+            'delete': f"AFTER DELETE ON {table_name} FOR EACH ROW BEGIN {delete_old} END",
+            'update': f"AFTER UPDATE OF {key}, {column_list} ON {table_name} FOR EACH ROW BEGIN {delete_old} {insert_new} END",
+        }
+        for event, body in triggers.items():
+            cursor.execute(f"CREATE TRIGGER IF NOT EXISTS trg_text_search_{table_name.lower()}_{event} {body}")
+
+
+def rebuild_text_search(cursor):
+    """
+    Rebuilds every full-text search index from its content table.
+    """
+    for search_table, *_ in TEXT_SEARCH_INDEXES:
+        cursor.execute(f"INSERT INTO {search_table} ({search_table}) VALUES ('rebuild')")
+
+
+def create_area_summary_triggers(cursor):
+    """
+    Creates the AreaSummary and AreaMaxProposal tables and the triggers on Proposal and Competition that keep them current.
+
+    AreaSummary holds, per competition area, the largest requested amount, the sum and count behind the
+    average requested/awarded discrepancy and the award totals; AreaMaxProposal holds every proposal
+    requesting that largest amount. Proposal changes adjust the sums incrementally; competition changes,
+    which can move many proposals between areas, recompute the affected areas.
+
+    Parameters:
+        cursor (sqlite3.Cursor): A cursor on the database.
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS AreaSummary (
+            competition_area TEXT PRIMARY KEY NOT NULL,
+            proposal_count INTEGER NOT NULL DEFAULT 0,
+            max_requested_amount DECIMAL(15, 2),
+            discrepancy_sum REAL NOT NULL DEFAULT 0,
+            awarded_count INTEGER NOT NULL DEFAULT 0,
+            awarded_total REAL NOT NULL DEFAULT 0
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS AreaMaxProposal (
+            competition_area TEXT NOT NULL,
+            proposal_id INTEGER NOT NULL,
+            PRIMARY KEY (competition_area, proposal_id)
+        )
+    ''')
+
+    new_area, old_area = area_of('NEW.competition_id'), area_of('OLD.competition_id')
+    triggers = {
+        'trg_area_summary_proposal_insert': f'''
+            AFTER INSERT ON Proposal FOR EACH ROW WHEN {new_area} IS NOT NULL
+            BEGIN {add_proposal_sql('NEW')} END''',
+        'trg_area_summary_proposal_delete': f'''
+            AFTER DELETE ON Proposal FOR EACH ROW WHEN {old_area} IS NOT NULL
+            BEGIN {remove_proposal_sql('OLD')} END''',
+        # Either area may be NULL here; the NOT NULL area columns turn those statements into no-ops
+        'trg_area_summary_proposal_update': f'''
+            AFTER UPDATE OF requested_amount, awarded_amount, competition_id ON Proposal FOR EACH ROW
+            BEGIN
+                {remove_proposal_sql('OLD')}
+                {add_proposal_sql('NEW')}
+            END''',
+        'trg_area_summary_competition_insert': f'''
+            AFTER INSERT ON Competition FOR EACH ROW WHEN NEW.competition_area IS NOT NULL
+            BEGIN {recompute_area_sql('NEW.competition_area')} END''',
+        'trg_area_summary_competition_delete': f'''
+            AFTER DELETE ON Competition FOR EACH ROW WHEN OLD.competition_area IS NOT NULL
+            BEGIN {recompute_area_sql('OLD.competition_area')} END''',
+        'trg_area_summary_competition_update': f'''
+            AFTER UPDATE OF competition_area ON Competition FOR EACH ROW
+            BEGIN
+                {recompute_area_sql('OLD.competition_area')}
+                {recompute_area_sql('NEW.competition_area')}
+            END''',
+    }
+    for trigger_name, body in triggers.items():
+        cursor.execute(f"CREATE TRIGGER IF NOT EXISTS {trigger_name} {body}")
+
+
+def rebuild_area_summary(cursor):
+    """
+    Recomputes AreaSummary and AreaMaxProposal for every area from Proposal and Competition.
+
+    Parameters:
+        cursor (sqlite3.Cursor): A cursor on the database.
+    """
+    cursor.execute("DELETE FROM AreaMaxProposal")
+    cursor.execute("DELETE FROM AreaSummary")
+    cursor.execute('''
+        INSERT INTO AreaSummary
+            (competition_area, proposal_count, max_requested_amount, discrepancy_sum, awarded_count, awarded_total)
+        SELECT c.competition_area, COUNT(*), MAX(p.requested_amount), TOTAL(ABS(p.requested_amount - p.awarded_amount)),
+               COUNT(p.awarded_amount), TOTAL(p.awarded_amount)
+        FROM Proposal p
+        JOIN Competition c ON p.competition_id = c.competition_id
+        WHERE c.competition_area IS NOT NULL
+        GROUP BY c.competition_area
+    ''')
+    cursor.execute('''
+        INSERT INTO AreaMaxProposal (competition_area, proposal_id)
+        SELECT c.competition_area, p.proposal_id
+        FROM Proposal p
+        JOIN Competition c ON p.competition_id = c.competition_id
+        JOIN AreaSummary s ON s.competition_area = c.competition_area
+        WHERE p.requested_amount = s.max_requested_amount
+    ''')
+
+
+def bump_table_versions(cursor):
+    """
+    Marks every table as changed, e.g. after a bulk load that ran without the version triggers.
+    """
+    cursor.execute("UPDATE TableVersion SET version = version + 1")
+
+
+def create_derived_triggers(cursor):
+    """
+    Creates every trigger that maintains derived data.
+    """
+    create_collaborator_count_triggers(cursor)
+    create_table_version_triggers(cursor)
+    create_change_log_triggers(cursor)
+    create_area_summary_triggers(cursor)
+    create_name_search_triggers(cursor)
+    create_text_search_triggers(cursor)
+
+
+def drop_triggers(cursor, prefixes):
+    triggers = [row[0] for row in cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'").fetchall()]
+    for trigger_name in triggers:
+        if trigger_name.startswith(prefixes):
+            cursor.execute(f"DROP TRIGGER {trigger_name}")
+
+
+def drop_derived_triggers(cursor):
+    """
+    Drops every trigger that maintains derived data, ahead of a bulk load.
+    """
+    drop_triggers(cursor, DERIVED_TRIGGER_PREFIXES)
+
+
+def create_assignment_limit_triggers(cursor):
+    """
+    Creates the triggers that reject a review assignment giving a proposal more than MAX_REVIEWERS_PER_PROPOSAL
+    reviewers or a reviewer more than MAX_ASSIGNMENTS_PER_REVIEWER assignments.
+
+    A trigger runs inside the statement writing the row, while its connection holds the write lock, so the
+    limits hold however many processes assign reviewers at the same time.
+
+    Parameters:
+        cursor (sqlite3.Cursor): A cursor on the database.
+    """
+    limits = {
+        'proposal': ('proposal_id', MAX_REVIEWERS_PER_PROPOSAL, 'Proposal already has the maximum number of reviewers'),
+        'reviewer': ('reviewer_id', MAX_ASSIGNMENTS_PER_REVIEWER, 'Reviewer already has the maximum number of assignments'),
+    }
+    for name, (column, limit, message) in limits.items():
+        at_limit = f"(SELECT COUNT(*) FROM ReviewAssignment WHERE {column} = NEW.{column}) >= {limit}"
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {ASSIGNMENT_LIMIT_TRIGGER_PREFIX}{name}_insert
+            BEFORE INSERT ON ReviewAssignment
+            WHEN {at_limit}
+            BEGIN
+                SELECT RAISE(ABORT, '{message}');
+            END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {ASSIGNMENT_LIMIT_TRIGGER_PREFIX}{name}_update
+            BEFORE UPDATE OF {column} ON ReviewAssignment
+            WHEN NEW.{column} IS NOT OLD.{column} AND {at_limit}
+            BEGIN
+                SELECT RAISE(ABORT, '{message}');
+            END
+        ''')
+
+
+def drop_assignment_limit_triggers(cursor):
+    """
+    Drops the assignment limit triggers ahead of a bulk load.
+    """
+    drop_triggers(cursor, (ASSIGNMENT_LIMIT_TRIGGER_PREFIX,))
+
+
+def assignment_limit_violations(cursor):
+    """
+    Counts the review assignments breaking the rules the unique index and the assignment limit triggers
+    enforce, e.g. after a bulk load that ran without them.
+
+    Returns:
+        dict: The number of repeated (proposal, reviewer) pairs, of proposals with more than
+        MAX_REVIEWERS_PER_PROPOSAL reviewers and of reviewers with more than MAX_ASSIGNMENTS_PER_REVIEWER assignments.
+    """
+    return {
+        'duplicate_pairs': cursor.execute(
+            "SELECT COUNT(*) FROM (SELECT 1 FROM ReviewAssignment GROUP BY proposal_id, reviewer_id HAVING COUNT(*) > 1)"
+        ).fetchone()[0],
+        'proposals_over_limit': cursor.execute(
+            "SELECT COUNT(*) FROM (SELECT 1 FROM ReviewAssignment GROUP BY proposal_id HAVING COUNT(*) > ?)",
+            (MAX_REVIEWERS_PER_PROPOSAL,)
+        ).fetchone()[0],
+        'reviewers_over_limit': cursor.execute(
+            "SELECT COUNT(*) FROM (SELECT 1 FROM ReviewAssignment GROUP BY reviewer_id HAVING COUNT(*) > ?)",
+            (MAX_ASSIGNMENTS_PER_REVIEWER,)
+        ).fetchone()[0],
+    }
+
+
+def rebuild_derived_state(cursor):
+    """
+    Recomputes all derived data from the base tables and recreates the triggers that maintain it.
+
+    Parameters:
+        cursor (sqlite3.Cursor): A cursor on the database.
+    """
+    backfill_collaborator_counts(cursor)
+    create_derived_triggers(cursor)
+    rebuild_area_summary(cursor)
+    rebuild_name_search(cursor)
+    rebuild_text_search(cursor)
+    bump_table_versions(cursor)
+    log_table_reloads(cursor)
+
+
+def create_database(db_name='council.db'):
+    conn = sqlite3.connect(db_name)
     cursor = conn.cursor()
 
     # Create tables with constraints
-    cursor.execute('''
+    cursor.execute(f'''
         CREATE TABLE IF NOT EXISTS Researcher (
             researcher_id INTEGER PRIMARY KEY,
             first_name TEXT NOT NULL,
             last_name TEXT NOT NULL,
             email TEXT UNIQUE NOT NULL,
             organization_id INTEGER,
+            {FULL_NAME_COLUMN},
             FOREIGN KEY (organization_id) REFERENCES Organization(organization_id)
         )
     ''')
@@ -25,7 +694,7 @@ def create_database():
         )
     ''')
 
-    cursor.execute('''
+    cursor.execute(f'''
         CREATE TABLE IF NOT EXISTS Competition (
             competition_id INTEGER PRIMARY KEY,
             competition_number INTEGER UNIQUE NOT NULL,
@@ -33,8 +702,9 @@ def create_database():
             competition_description TEXT,
             competition_area TEXT,
             competition_status TEXT CHECK(competition_status IN ('Open', 'Closed')) NOT NULL,
-            competition_deadline DATE
+            competition_deadline DATE,
             -- Removed the CHECK constraint that was causing the issue
+            {DEADLINE_MONTH_COLUMN}
         )
     ''')
 
@@ -47,6 +717,7 @@ def create_database():
             proposal_status TEXT CHECK(proposal_status IN ('Submitted', 'Awarded', 'Not Awarded')) NOT NULL,
             awarded_amount DECIMAL(15, 2),
             awarded_date DATE,
+            collaborator_count INTEGER NOT NULL DEFAULT 0,
             FOREIGN KEY (competition_id) REFERENCES Competition(competition_id) ON DELETE CASCADE,
             FOREIGN KEY (principle_investigator_id) REFERENCES Researcher(researcher_id),
             CHECK (requested_amount > 0)
@@ -124,6 +795,23 @@ def create_database():
             SELECT RAISE(FAIL, 'Only awarded proposals can have awarded_amount and awarded_date.');
         END;
     ''')
+    create_assignment_limit_triggers(cursor)
+
+    add_collaborator_count(cursor)
+    add_deadline_month(cursor)
+    add_full_name(cursor)
+    summary_exists = cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'AreaSummary'").fetchone()
+    name_search_exists = cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'ResearcherNameSearch'").fetchone()
+    text_search_exists = cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'CompetitionSearch'").fetchone()
+    create_derived_triggers(cursor)
+    # Databases created before the area summary or the search indexes existed need them filled once
+    if not summary_exists:
+        rebuild_area_summary(cursor)
+    if not name_search_exists:
+        rebuild_name_search(cursor)
+    if not text_search_exists:
+        rebuild_text_search(cursor)
+    create_indexes(cursor)
 
     conn.commit()
     conn.close()
@@ -1,27 +1,417 @@
 import argparse
+import csv
+import difflib
+import json
+import re
 import sqlite3
-from datetime import datetime
+import sys
+from datetime import datetime, timedelta
 
-conn = sqlite3.connect('council.db')
-cursor = conn.cursor()
+import connections
+from batch_assignment import MAX_ASSIGNMENTS_PER_REVIEWER, MAX_REVIEWERS_PER_PROPOSAL, assign_all_reviewers
+from connections import begin_immediate, close_pool, read_connection, run_immediate, write_connection
+from create_database import INTERNAL_TABLES
+from meeting_scheduler import schedule_meetings
+from query_cache import QUERY_TABLES, QueryCache, cached
 
-def view_table_contents(table_name):
+# The SQL behind each menu query, with named parameters, so it can also be streamed or explained
+OPEN_COMPETITIONS_QUERY = """
+    SELECT c.competition_id, c.competition_title
+    FROM Competition c
+    WHERE c.competition_status = 'Open'
+    AND c.deadline_month = :month
+    AND EXISTS (
+        SELECT 1 FROM Proposal p
+        WHERE p.competition_id = c.competition_id
+        AND (p.requested_amount > 20000 OR p.collaborator_count > 10)
+    )
+"""
+
+# Served from the per-area summary that triggers keep current (see create_area_summary_triggers)
+LARGEST_AMOUNT_PROPOSAL_QUERY = """
+    SELECT m.proposal_id, s.max_requested_amount
+    FROM AreaSummary s
+    JOIN AreaMaxProposal m ON m.competition_area = s.competition_area
+    WHERE s.competition_area = :area
+    ORDER BY m.proposal_id
+"""
+
+LARGEST_AWARDED_PROPOSALS_QUERY = """
+    SELECT p.proposal_id, MAX(p.awarded_amount) AS max_awarded_amount
+    FROM Proposal p
+    WHERE p.awarded_date < :date
+"""
+
+AVERAGE_DISCREPANCY_QUERY = """
+    SELECT discrepancy_sum / NULLIF(awarded_count, 0) AS avg_discrepancy
+    FROM AreaSummary
+    WHERE competition_area = :area
+"""
+
+# The assignment limits, bound into the queries that check them (:max_assignments, :max_reviewers)
+LIMIT_PARAMS = {'max_assignments': MAX_ASSIGNMENTS_PER_REVIEWER, 'max_reviewers': MAX_REVIEWERS_PER_PROPOSAL}
+
+ELIGIBLE_REVIEWERS_QUERY = """
+    SELECT r.reviewer_id, res.first_name || ' ' || res.last_name AS name
+    FROM Reviewer r
+    JOIN Researcher res ON r.reviewer_id = res.researcher_id
+    WHERE r.reviewer_id NOT IN (
+        SELECT reviewer_id FROM ReviewAssignment WHERE proposal_id = :proposal_id
+    )
+    AND r.reviewer_id NOT IN (
+        SELECT coi.reviewer_id
+        FROM ConflictOfInterest coi
+        WHERE coi.conflicted_researcher_id IN (
+            SELECT principle_investigator_id FROM Proposal WHERE proposal_id = :proposal_id
+            UNION
+            SELECT collaborator_id FROM ProposalCollaborator WHERE proposal_id = :proposal_id
+        )
+    )
+    AND (
+        SELECT COUNT(*)
+        FROM ReviewAssignment ra
+        WHERE ra.reviewer_id = r.reviewer_id
+    ) < :max_assignments
+"""
+
+# Whether one reviewer may be assigned to a proposal: the same rules as ELIGIBLE_REVIEWERS_QUERY
+REVIEWER_ELIGIBLE_QUERY = """
+    SELECT 1
+    FROM Reviewer r
+    WHERE r.reviewer_id = :reviewer_id
+    AND NOT EXISTS (
+        SELECT 1 FROM ReviewAssignment WHERE proposal_id = :proposal_id AND reviewer_id = :reviewer_id
+    )
+    AND NOT EXISTS (
+        SELECT 1
+        FROM ConflictOfInterest coi
+        WHERE coi.reviewer_id = :reviewer_id
+        AND coi.conflicted_researcher_id IN (
+            SELECT principle_investigator_id FROM Proposal WHERE proposal_id = :proposal_id
+            UNION
+            SELECT collaborator_id FROM ProposalCollaborator WHERE proposal_id = :proposal_id
+        )
+    )
+    AND (SELECT COUNT(*) FROM ReviewAssignment WHERE reviewer_id = :reviewer_id) < :max_assignments
+"""
+
+# The names of the reviewers in a JSON array of IDs, for the IDs an EligibilityIndex returns
+REVIEWER_NAMES_QUERY = """
+    SELECT r.reviewer_id, res.first_name || ' ' || res.last_name AS name
+    FROM Reviewer r
+    JOIN Researcher res ON r.reviewer_id = res.researcher_id
+    WHERE r.reviewer_id IN (SELECT value FROM json_each(:reviewer_ids))
+    ORDER BY r.reviewer_id
+"""
+
+ASSIGN_REVIEWER_STATEMENT = """
+    INSERT INTO ReviewAssignment (competition_id, reviewer_id, proposal_id, review_deadline, review_submitted)
+    SELECT competition_id, :reviewer_id, proposal_id, :review_deadline, 0
+    FROM Proposal
+    WHERE proposal_id = :proposal_id
+"""
+
+PROPOSALS_TO_REVIEW_QUERY = """
+    SELECT p.proposal_id, c.competition_title
+    FROM ReviewAssignment ra
+    JOIN Proposal p ON p.proposal_id = ra.proposal_id
+    JOIN Competition c ON p.competition_id = c.competition_id
+    WHERE ra.reviewer_id IN (
+        SELECT r.reviewer_id
+        FROM Researcher res
+        JOIN Reviewer r ON r.reviewer_id = res.researcher_id
+        WHERE res.full_name = :name
+    )
+"""
+
+# Researcher.full_name compares case-insensitively, so this range is a case-insensitive prefix match
+REVIEWERS_BY_PREFIX_QUERY = """
+    SELECT r.reviewer_id, res.full_name
+    FROM Researcher res
+    JOIN Reviewer r ON r.reviewer_id = res.researcher_id
+    WHERE res.full_name >= :prefix AND res.full_name < :prefix || char(1114111)
+    ORDER BY res.full_name, res.researcher_id
+    LIMIT :limit
+"""
+
+# Words in the name index starting with a given letter; fuzzy search corrects each input word against these
+NAME_TERMS_QUERY = """
+    SELECT term FROM ResearcherNameTerms WHERE term >= :start AND term < :stop
+"""
+
+REVIEWER_NAME_MATCH_QUERY = """
+    SELECT r.reviewer_id, res.full_name
+    FROM ResearcherNameSearch s
+    JOIN Reviewer r ON r.reviewer_id = s.rowid
+    JOIN Researcher res ON res.researcher_id = s.rowid
+    WHERE ResearcherNameSearch MATCH :match
+    LIMIT :limit
+"""
+
+# Full-text search, ranked by BM25 with title matches weighted above area and description matches. The
+# columns are read through the FTS5 table (from its content table) rather than a join, which SQLite
+# would evaluate for every match before sorting.
+COMPETITION_SEARCH_QUERY = """
+    SELECT rowid AS competition_id, competition_title, competition_area,
+           snippet(CompetitionSearch, -1, '[', ']', '...', 12) AS snippet
+    FROM CompetitionSearch
+    WHERE CompetitionSearch MATCH :match
+    ORDER BY bm25(CompetitionSearch, 10.0, 1.0, 5.0)
+    LIMIT :limit OFFSET :offset
+"""
+
+ORGANIZATION_SEARCH_QUERY = """
+    SELECT rowid AS organization_id, organization_name,
+           snippet(OrganizationSearch, -1, '[', ']', '...', 12) AS snippet
+    FROM OrganizationSearch
+    WHERE OrganizationSearch MATCH :match
+    ORDER BY bm25(OrganizationSearch, 10.0, 1.0)
+    LIMIT :limit OFFSET :offset
+"""
+
+# How similar (0 to 1) a name word must be to an input word to be tried in its place
+FUZZY_TERM_SIMILARITY = 0.75
+# Upper bound on the reviewers scored per fuzzy search
+FUZZY_CANDIDATES = 2000
+
+# Batch variants for dashboards: every area, or every month, in one statement instead of one call each
+AREA_REPORT_QUERY = """
+    SELECT s.competition_area, s.max_requested_amount, m.proposal_id,
+           s.discrepancy_sum / NULLIF(s.awarded_count, 0) AS avg_discrepancy
+    FROM AreaSummary s
+    LEFT JOIN AreaMaxProposal m ON m.competition_area = s.competition_area
+    WHERE s.proposal_count > 0
+    ORDER BY s.competition_area, m.proposal_id
+"""
+
+MONTHLY_OPEN_COMPETITIONS_QUERY = """
+    SELECT c.deadline_month AS month, c.competition_id, c.competition_title
+    FROM Competition c
+    WHERE c.competition_status = 'Open'
+    AND EXISTS (
+        SELECT 1 FROM Proposal p
+        WHERE p.competition_id = c.competition_id
+        AND (p.requested_amount > 20000 OR p.collaborator_count > 10)
+    )
+    ORDER BY c.deadline_month, c.competition_id
+"""
+
+# Unsubmitted reviews that are overdue (deadline before :as_of) or due by :until, counted per reviewer or
+# per competition. The review_submitted = 0 term matches idx_review_assignment_due, which covers the
+# inner query, so only pending reviews up to :until are read and never the table itself. The unary + in
+# GROUP BY stops SQLite from walking the whole reviewer (or competition) index instead to save the sort.
+DUE_REVIEWS_BY_REVIEWER_QUERY = """
+    SELECT d.reviewer_id, res.full_name, d.overdue, d.upcoming, d.earliest_deadline
+    FROM (
+        SELECT ra.reviewer_id,
+               SUM(ra.review_deadline < :as_of) AS overdue,
+               SUM(ra.review_deadline >= :as_of) AS upcoming,
+               MIN(ra.review_deadline) AS earliest_deadline
+        FROM ReviewAssignment ra
+        WHERE ra.review_submitted = 0 AND ra.review_deadline <= :until
+        GROUP BY +ra.reviewer_id
+    ) d
+    LEFT JOIN Researcher res ON res.researcher_id = d.reviewer_id
+    ORDER BY d.earliest_deadline, d.reviewer_id
+"""
+
+DUE_REVIEWS_BY_COMPETITION_QUERY = """
+    SELECT d.competition_id, c.competition_title, d.overdue, d.upcoming, d.earliest_deadline
+    FROM (
+        SELECT ra.competition_id,
+               SUM(ra.review_deadline < :as_of) AS overdue,
+               SUM(ra.review_deadline >= :as_of) AS upcoming,
+               MIN(ra.review_deadline) AS earliest_deadline
+        FROM ReviewAssignment ra
+        WHERE ra.review_submitted = 0 AND ra.review_deadline <= :until
+        GROUP BY +ra.competition_id
+    ) d
+    LEFT JOIN Competition c ON c.competition_id = d.competition_id
+    ORDER BY d.earliest_deadline, d.competition_id
+"""
+
+DUE_REVIEWS_QUERIES = {
+    'reviewer': DUE_REVIEWS_BY_REVIEWER_QUERY,
+    'competition': DUE_REVIEWS_BY_COMPETITION_QUERY,
+}
+# Reviews due within this many days count as upcoming
+DUE_SOON_DAYS = 7
+# The longest upcoming window due_reviews() accepts
+MAX_DUE_DAYS = 3660
+
+# Menu queries whose results can be exported: name -> (SQL, parameter names)
+EXPORTABLE_QUERIES = {
+    'open_competitions': (OPEN_COMPETITIONS_QUERY, ['month']),
+    'largest_amount_proposal': (LARGEST_AMOUNT_PROPOSAL_QUERY, ['area']),
+    'largest_awarded_proposals': (LARGEST_AWARDED_PROPOSALS_QUERY, ['date']),
+    'average_discrepancy': (AVERAGE_DISCREPANCY_QUERY, ['area']),
+    'eligible_reviewers': (ELIGIBLE_REVIEWERS_QUERY, ['proposal_id']),
+    'proposals_to_review': (PROPOSALS_TO_REVIEW_QUERY, ['name']),
+    'area_report': (AREA_REPORT_QUERY, []),
+    'monthly_open_competitions': (MONTHLY_OPEN_COMPETITIONS_QUERY, []),
+    'due_reviews_by_reviewer': (DUE_REVIEWS_BY_REVIEWER_QUERY, ['as_of', 'until']),
+    'due_reviews_by_competition': (DUE_REVIEWS_BY_COMPETITION_QUERY, ['as_of', 'until']),
+}
+
+PAGE_SIZE = 50
+EXPORT_BATCH_SIZE = 10_000
+# Batch mode commits grouped writes at least this often
+WRITE_GROUP_SIZE = 1000
+BATCH_READ_BYTES = 1 << 16
+
+def table_names(conn=None):
+    """
+    Returns the names of the tables defined in the database schema, leaving out full-text search tables,
+    SQLite's own tables and the bookkeeping tables in create_database.INTERNAL_TABLES.
+    """
+    with read_connection(conn) as conn:
+        # table_list reports FTS5 and vocabulary tables as 'virtual' and the FTS5 internal tables as 'shadow'
+        return [row[0] for row in conn.execute(
+            "SELECT name FROM pragma_table_list WHERE schema = 'main' AND type = 'table' AND name NOT LIKE 'sqlite_%' "
+            "AND name NOT IN (SELECT value FROM json_each(?)) ORDER BY name", (json.dumps(INTERNAL_TABLES),))]
+
+def primary_key_columns(table_name, conn=None):
     """
-    Fetches and displays all contents from the specified table.
+    Returns the primary key columns of a table in key order, or ['rowid'] if it has none.
+    """
+    with read_connection(conn) as conn:
+        columns = [(row[5], row[1]) for row in conn.execute(f"PRAGMA table_info({table_name})") if row[5] > 0]
+    return [name for _, name in sorted(columns)] or ['rowid']
+
+def validate_table_name(table_name, conn=None):
+    """
+    Checks a user supplied table name against the schema before it is used in any SQL.
+
+    Raises:
+        ValueError: If the table does not exist.
+    """
+    if table_name not in table_names(conn):
+        raise ValueError(f"Unknown table: {table_name}")
+
+def fetch_table_page(table_name, after_key=None, page_size=PAGE_SIZE, conn=None):
+    """
+    Fetches one page of a table in primary key order, starting after the given key (keyset pagination).
+
+    Parameters:
+        table_name (str): The name of the table, which must exist in the schema.
+        after_key (tuple): The primary key of the last row of the previous page, or None for the first page.
+        page_size (int): The maximum number of rows to return.
+
+    Returns:
+        tuple: (rows, last_key) where last_key is passed as after_key to fetch the next page.
+    """
+    with read_connection(conn) as conn:
+        validate_table_name(table_name, conn)
+        key_columns = primary_key_columns(table_name, conn)
+        key = ', '.join(key_columns)
+        where = f"WHERE ({key}) > ({', '.join('?' * len(key_columns))})" if after_key is not None else ""
+        rows = conn.execute(f"SELECT {key}, * FROM {table_name} {where} ORDER BY {key} LIMIT ?",
+                            (*(after_key or ()), page_size)).fetchall()
+    if not rows:
+        return [], after_key
+    return [row[len(key_columns):] for row in rows], rows[-1][:len(key_columns)]
+
+def view_table_contents(table_name, page_size=PAGE_SIZE):
+    """
+    Displays the contents of the specified table one page at a time.
 
     Parameters:
         table_name (str): The name of the table to view.
+        page_size (int): The number of rows per page.
     """
-    query = f"SELECT * FROM {table_name}"
+    after_key = None
     try:
-        cursor.execute(query)
-        rows = cursor.fetchall()
-        for row in rows:
-            print(row)
+        while True:
+            rows, after_key = fetch_table_page(table_name, after_key, page_size)
+            for row in rows:
+                print(row)
+            if len(rows) < page_size:
+                break
+            if input("Press Enter for the next page or 'q' to stop: ").lower() == 'q':
+                break
+    except ValueError as e:
+        print(e)
     except sqlite3.Error as e:
         print(f"Error fetching data from {table_name}:", e)
 
-def find_open_competitions(month):
+def write_rows(rows_cursor, path, file_format):
+    """
+    Streams the rows of an executed cursor to a CSV or JSONL file using fetchmany, so memory stays bounded.
+
+    Parameters:
+        rows_cursor (sqlite3.Cursor): A cursor on which a SELECT has been executed.
+        path (str): The file to write.
+        file_format (str): 'csv' or 'jsonl'.
+
+    Returns:
+        int: The number of rows written.
+    """
+    columns = [column[0] for column in rows_cursor.description]
+    count = 0
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f) if file_format == 'csv' else None
+        if writer:
+            writer.writerow(columns)
+        while True:
+            rows = rows_cursor.fetchmany(EXPORT_BATCH_SIZE)
+            if not rows:
+                break
+            if writer:
+                writer.writerows(rows)
+            else:
+                f.writelines(json.dumps(dict(zip(columns, row))) + '\n' for row in rows)
+            count += len(rows)
+    return count
+
+def export_table(table_name, path, file_format='csv', conn=None):
+    """
+    Exports a whole table to CSV or JSONL with bounded memory.
+
+    Parameters:
+        table_name (str): The name of the table, which must exist in the schema.
+        path (str): The file to write.
+        file_format (str): 'csv' or 'jsonl'.
+
+    Returns:
+        int: The number of rows written.
+    """
+    with read_connection(conn) as conn:
+        validate_table_name(table_name, conn)
+        return write_rows(conn.execute(f"SELECT * FROM {table_name}"), path, file_format)
+
+def export_query(query_name, params, path, file_format='csv', conn=None):
+    """
+    Exports the result of one of the menu queries to CSV or JSONL with bounded memory.
+
+    Parameters:
+        query_name (str): A key of EXPORTABLE_QUERIES.
+        params (dict): The query parameters, keyed by name.
+        path (str): The file to write.
+        file_format (str): 'csv' or 'jsonl'.
+
+    Returns:
+        int: The number of rows written.
+    """
+    sql, _ = EXPORTABLE_QUERIES[query_name]
+    with read_connection(conn) as conn:
+        # Named parameters a query does not use are ignored
+        return write_rows(conn.execute(sql, {**LIMIT_PARAMS, **params}), path, file_format)
+
+def export(source, path, file_format='csv', params=None, conn=None):
+    """
+    Exports a table, or one of EXPORTABLE_QUERIES with the given parameters, as option 9 of the menu does.
+
+    Returns:
+        int: The number of rows written.
+    """
+    if source in EXPORTABLE_QUERIES:
+        missing = [name for name in EXPORTABLE_QUERIES[source][1] if name not in (params or {})]
+        if missing:
+            raise ValueError(f"Missing query parameters: {', '.join(missing)}")
+        return export_query(source, params or {}, path, file_format, conn)
+    return export_table(source, path, file_format, conn)
+
+def find_open_competitions(month, conn=None):
     """
     Find all competitions open at a user-specified month, which already have at least one submitted large proposal.
     
@@ -31,22 +421,10 @@ def find_open_competitions(month):
     Returns:
         list: A list of tuples containing competition IDs and titles.
     """
-    cursor.execute("""
-        SELECT c.competition_id, c.competition_title
-        FROM Competition c
-        WHERE strftime('%m', c.competition_deadline) = ? 
-        AND c.competition_status = 'Open' 
-        AND EXISTS (
-            SELECT 1 FROM Proposal p 
-            WHERE p.competition_id = c.competition_id 
-            AND (p.requested_amount > 20000 OR 
-                 (SELECT COUNT(*) FROM ProposalCollaborator pc 
-                  WHERE pc.proposal_id = p.proposal_id) > 10)
-        )
-    """, (month,))
-    return cursor.fetchall()
+    with read_connection(conn) as conn:
+        return conn.execute(OPEN_COMPETITIONS_QUERY, {'month': month}).fetchall()
 
-def find_largest_amount_proposal(area):
+def find_largest_amount_proposal(area, conn=None):
     """
     Find proposal(s) requesting the largest amount of money in a user-specified area.
 
@@ -54,15 +432,10 @@ def find_largest_amount_proposal(area):
         area (str): The research area.
 
     Returns:
-        list: A list of tuples containing proposal IDs and the largest requested amount.
+        list: A list of tuples containing proposal IDs and the largest requested amount, one per tied proposal.
     """
-    cursor.execute("""
-        SELECT p.proposal_id, MAX(p.requested_amount) AS max_requested_amount
-        FROM Proposal p
-        JOIN Competition c ON p.competition_id = c.competition_id
-        WHERE c.competition_area = ?
-    """, (area,))
-    return cursor.fetchall()
+    with read_connection(conn) as conn:
+        return conn.execute(LARGEST_AMOUNT_PROPOSAL_QUERY, {'area': area}).fetchall()
 
 def validate_date(date_text):
     try:
@@ -71,7 +444,7 @@ def validate_date(date_text):
     except ValueError:
         return False
     
-def find_largest_awarded_proposals(date):
+def find_largest_awarded_proposals(date, conn=None):
     """
     Find proposals submitted before a user-specified date that are awarded the largest amount of money.
 
@@ -81,14 +454,10 @@ def find_largest_awarded_proposals(date):
     Returns:
         list: A list of tuples containing proposal IDs and the largest awarded amount.
     """
-    cursor.execute("""
-        SELECT p.proposal_id, MAX(p.awarded_amount) AS max_awarded_amount
-        FROM Proposal p
-        WHERE p.awarded_date < ?
-    """, (date,))
-    return cursor.fetchall()
+    with read_connection(conn) as conn:
+        return conn.execute(LARGEST_AWARDED_PROPOSALS_QUERY, {'date': date}).fetchall()
 
-def average_discrepancy(area):
+def average_discrepancy(area, conn=None):
     """
     Output the average requested/awarded discrepancy for a user-specified area.
 
@@ -98,25 +467,100 @@ def average_discrepancy(area):
     Returns:
         float: The average discrepancy.
     """
-    cursor.execute("""
-        SELECT AVG(ABS(p.requested_amount - p.awarded_amount)) AS avg_discrepancy
-        FROM Proposal p
-        JOIN Competition c ON p.competition_id = c.competition_id
-        WHERE c.competition_area = ?
-    """, (area,))
-    return cursor.fetchone()[0]
+    with read_connection(conn) as conn:
+        row = conn.execute(AVERAGE_DISCREPANCY_QUERY, {'area': area}).fetchone()
+    return row[0] if row else None
+
+def area_report(conn=None):
+    """
+    Reports the largest requested amount, the proposal(s) requesting it and the average discrepancy for every area at once.
+
+    Returns:
+        dict: Maps each area to a dict with 'max_requested_amount', 'largest_request_proposals' (all ties,
+        by proposal ID) and 'average_discrepancy'.
+    """
+    report = {}
+    with read_connection(conn) as conn:
+        for area, max_requested_amount, proposal_id, avg_discrepancy in conn.execute(AREA_REPORT_QUERY):
+            entry = report.setdefault(area, {'max_requested_amount': max_requested_amount,
+                                             'largest_request_proposals': [],
+                                             'average_discrepancy': avg_discrepancy})
+            if proposal_id is not None:
+                entry['largest_request_proposals'].append(proposal_id)
+    return report
+
+def monthly_open_competitions(conn=None):
+    """
+    Finds the open competitions with at least one large proposal for all twelve months in one pass.
+
+    Returns:
+        dict: Maps each month in MM format ('01' to '12') to a list of tuples containing competition IDs and titles.
+    """
+    report = {f"{month:02d}": [] for month in range(1, 13)}
+    with read_connection(conn) as conn:
+        for month, competition_id, competition_title in conn.execute(MONTHLY_OPEN_COMPETITIONS_QUERY):
+            if month in report:
+                report[month].append((competition_id, competition_title))
+    return report
 
-def check_reviewer_limit(proposal_id):
+def due_reviews(group_by='reviewer', as_of=None, days=DUE_SOON_DAYS, conn=None):
     """
-    Check if adding another reviewer would exceed the limit of 3 reviewers per proposal.
+    Lists the unsubmitted reviews that are overdue or due soon, counted per reviewer or per competition.
+
+    Parameters:
+        group_by (str): 'reviewer' or 'competition'.
+        as_of (str): Reviews with a deadline before this date (YYYY-MM-DD) are overdue. Defaults to today.
+        days (int): Reviews due up to this many days after as_of are upcoming, at most MAX_DUE_DAYS.
+
+    Returns:
+        list: A list of tuples containing the reviewer or competition ID, the reviewer's name or the
+        competition title, the number of overdue and upcoming reviews and the earliest of their deadlines,
+        earliest first.
+
+    Raises:
+        ValueError: If group_by is not 'reviewer' or 'competition', or days is out of range.
     """
-    cursor.execute("SELECT COUNT(*) FROM ReviewAssignment WHERE proposal_id = ?", (proposal_id,))
-    count = cursor.fetchone()[0]
-    return count < 3
+    if group_by not in DUE_REVIEWS_QUERIES:
+        raise ValueError(f"group_by must be one of: {', '.join(DUE_REVIEWS_QUERIES)}")
+    if not 0 <= days <= MAX_DUE_DAYS:
+        raise ValueError(f"days must be between 0 and {MAX_DUE_DAYS}")
+    as_of = as_of or datetime.now().strftime('%Y-%m-%d')
+    until = (datetime.strptime(as_of, '%Y-%m-%d') + timedelta(days=days)).strftime('%Y-%m-%d')
+    with read_connection(conn) as conn:
+        return conn.execute(DUE_REVIEWS_QUERIES[group_by], {'as_of': as_of, 'until': until}).fetchall()
+
 
-def fetch_eligible_reviewers(proposal_id):
+def check_reviewer_limit(proposal_id, conn=None):
     """
-    Fetches reviewers who are not in conflict with the proposal and have reviewed less than three proposals.
+    Check if adding another reviewer would exceed the limit of MAX_REVIEWERS_PER_PROPOSAL reviewers per proposal.
+    """
+    with read_connection(conn) as conn:
+        return bool(conn.execute(
+            "SELECT COUNT(*) < :max_reviewers FROM ReviewAssignment WHERE proposal_id = :proposal_id",
+            {**LIMIT_PARAMS, 'proposal_id': proposal_id}).fetchone()[0])
+
+# The eligibility_index.EligibilityIndex eligible reviewers are looked up in, see use_eligibility_index()
+eligibility_index = None
+
+def use_eligibility_index(index):
+    """
+    Answers fetch_eligible_reviewers() and eligible_reviewers() from an in-memory eligibility index,
+    refreshed from the change log before each lookup, instead of ELIGIBLE_REVIEWERS_QUERY.
+    """
+    global eligibility_index
+    eligibility_index = index
+
+def eligible_reviewer_rows(proposal_id, conn):
+    # Inside a transaction the index could not see its uncommitted writes, so the query answers
+    if eligibility_index is None or conn.in_transaction:
+        return conn.execute(ELIGIBLE_REVIEWERS_QUERY, {**LIMIT_PARAMS, 'proposal_id': proposal_id}).fetchall()
+    eligibility_index.refresh(conn)
+    reviewer_ids = eligibility_index.eligible_reviewers(proposal_id)
+    return conn.execute(REVIEWER_NAMES_QUERY, {'reviewer_ids': json.dumps(reviewer_ids)}).fetchall()
+
+def fetch_eligible_reviewers(proposal_id, conn=None):
+    """
+    Fetches reviewers who are not in conflict with the proposal and have fewer than MAX_ASSIGNMENTS_PER_REVIEWER assignments.
 
     Parameters:
         proposal_id (int): The ID of the proposal to find eligible reviewers for.
@@ -124,36 +568,27 @@ def fetch_eligible_reviewers(proposal_id):
     Returns:
         list: A list of tuples containing eligible reviewer IDs and names.
     """
-    cursor.execute("""
-    SELECT r.reviewer_id, res.first_name || ' ' || res.last_name AS name
-    FROM Reviewer r
-    JOIN Researcher res ON r.reviewer_id = res.researcher_id
-    WHERE r.reviewer_id NOT IN (
-        SELECT reviewer_id FROM ReviewAssignment WHERE proposal_id = ?
-    )
-    AND r.reviewer_id NOT IN (
-        SELECT coi.reviewer_id 
-        FROM ConflictOfInterest coi
-        WHERE coi.conflicted_researcher_id IN (
-            SELECT principle_investigator_id FROM Proposal WHERE proposal_id = ?
-            UNION
-            SELECT collaborator_id FROM ProposalCollaborator WHERE proposal_id = ?
-        )
-    )
-    AND (
-        SELECT COUNT(*) 
-        FROM ReviewAssignment ra 
-        WHERE ra.reviewer_id = r.reviewer_id
-    ) < 3;
-    """, (proposal_id, proposal_id,proposal_id))
-    results = cursor.fetchall()
+    with read_connection(conn) as conn:
+        results = eligible_reviewer_rows(proposal_id, conn)
     for result in results:
         print(f"ID: {result[0]}, Name: {result[1]}")
     return [result[0] for result in results]
 
+def eligible_reviewers(proposal_id, conn=None):
+    """
+    Returns the (reviewer_id, name) of every reviewer eligible for the proposal.
+
+    Unlike fetch_eligible_reviewers(), nothing is printed.
+    """
+    with read_connection(conn) as conn:
+        return eligible_reviewer_rows(proposal_id, conn)
+
 def assign_reviewers(proposal_id):
     """
-    Assign up to 3 reviewers to review a specific grant application, input one by one.
+    Assign up to MAX_REVIEWERS_PER_PROPOSAL reviewers to review a specific grant application, input one by one.
+
+    Each assignment is checked and written by assign_reviewer() in its own transaction, so another
+    coordinator assigning reviewers at the same time cannot push the proposal or a reviewer over the limit.
     """
     print("Fetching eligible reviewers for the proposal...")
     eligible_reviewers = fetch_eligible_reviewers(proposal_id)
@@ -163,31 +598,93 @@ def assign_reviewers(proposal_id):
         return
 
     reviewers_assigned = 0
-    while reviewers_assigned < 3 and check_reviewer_limit(proposal_id):
+    while reviewers_assigned < MAX_REVIEWERS_PER_PROPOSAL and check_reviewer_limit(proposal_id):
         reviewer_id_input = input("Enter reviewer ID to assign (or 'done' to finish): ")
         if reviewer_id_input.lower() == 'done':
             break
         try:
             reviewer_id = int(reviewer_id_input)
-            if reviewer_id not in eligible_reviewers:
-                print("This reviewer is not eligible or already assigned.")
-                continue
-            cursor.execute("INSERT INTO ReviewAssignment (proposal_id, reviewer_id) VALUES (?, ?)", (proposal_id, reviewer_id))
-            conn.commit()
-            reviewers_assigned += 1
-            print(f"Reviewer {reviewer_id} assigned successfully.")
         except ValueError:
             print("Please enter a valid integer ID or 'done'.")
+            continue
+        if reviewer_id not in eligible_reviewers:
+            print("This reviewer is not eligible or already assigned.")
+            continue
+        try:
+            assign_reviewer(proposal_id, reviewer_id)
+            reviewers_assigned += 1
+            print(f"Reviewer {reviewer_id} assigned successfully.")
+        except ValueError as e:
+            # Another coordinator got there first
+            print(f"{e}.")
         except sqlite3.Error as e:
             print("Error assigning reviewer:", e)
-            conn.rollback()
 
-    if reviewers_assigned == 3:
+    if reviewers_assigned == MAX_REVIEWERS_PER_PROPOSAL:
         print("Maximum number of reviewers assigned.")
     elif not check_reviewer_limit(proposal_id):
         print("This proposal has reached the maximum number of reviewers.")
 
-def find_proposals_to_review(name):
+def assign_reviewer(proposal_id, reviewer_id, review_deadline=None, conn=None):
+    """
+    Assigns one reviewer to a proposal if the reviewer is eligible and the proposal has fewer than
+    MAX_REVIEWERS_PER_PROPOSAL reviewers.
+
+    Parameters:
+        proposal_id (int): The proposal to assign the reviewer to.
+        reviewer_id (int): The reviewer to assign.
+        review_deadline (str): Review deadline in YYYY-MM-DD format, if any.
+        conn (sqlite3.Connection): The connection to write on. The caller commits, so several assignments
+            can share one transaction, which should be started with begin_immediate() for the checks to
+            hold until it commits. If None, the assignment is made in its own BEGIN IMMEDIATE transaction
+            on the shared writer, retried while other processes hold the lock.
+
+    Raises:
+        ValueError: If the proposal does not exist, already has MAX_REVIEWERS_PER_PROPOSAL reviewers, or the
+            reviewer is not eligible.
+    """
+    if conn is None:
+        return run_immediate(lambda conn: assign_reviewer(proposal_id, reviewer_id, review_deadline, conn))
+    if not check_reviewer_limit(proposal_id, conn=conn):
+        raise ValueError(f"Proposal {proposal_id} already has {MAX_REVIEWERS_PER_PROPOSAL} reviewers")
+    params = {**LIMIT_PARAMS, 'proposal_id': proposal_id, 'reviewer_id': reviewer_id, 'review_deadline': review_deadline}
+    if conn.execute(REVIEWER_ELIGIBLE_QUERY, params).fetchone() is None:
+        raise ValueError(f"Reviewer {reviewer_id} is not eligible for proposal {proposal_id}")
+    try:
+        inserted = conn.execute(ASSIGN_REVIEWER_STATEMENT, params).rowcount
+    except sqlite3.IntegrityError as e:
+        # The unique index or an assignment limit trigger, if the checks above ran outside a write transaction
+        raise ValueError(f"Cannot assign reviewer {reviewer_id} to proposal {proposal_id}: {e}") from None
+    if inserted == 0:
+        raise ValueError(f"Unknown proposal: {proposal_id}")
+
+def assign_all(competition_id=None, review_deadline=None, dry_run=False, conn=None):
+    """
+    Runs the batch assignment engine (option 8 of the menu), which commits its own transaction.
+
+    Returns:
+        tuple: (assignments, unfilled) as returned by assign_all_reviewers().
+    """
+    with write_connection(conn) as conn:
+        return assign_all_reviewers(conn, competition_id, review_deadline, dry_run)
+
+def schedule_review_meetings(dates, competition_status=None, max_competitions=None, dry_run=False, conn=None):
+    """
+    Runs the meeting scheduler (option 13 of the menu), which commits its own transaction.
+
+    Parameters:
+        dates (list): The available meeting dates in YYYY-MM-DD format.
+        competition_status (str): Only schedule competitions with this status, if given.
+        max_competitions (int): The most competitions one meeting can hold, or None for no limit.
+        dry_run (bool): Compute the schedule without writing it.
+
+    Returns:
+        tuple: (meetings, stats) as returned by schedule_meetings().
+    """
+    with write_connection(conn) as conn:
+        return schedule_meetings(conn, dates, competition_status, max_competitions, dry_run)
+
+def find_proposals_to_review(name, conn=None):
     """
     Find the proposal(s) a user needs to review.
 
@@ -197,16 +694,420 @@ def find_proposals_to_review(name):
     Returns:
         list: A list of tuples containing proposal IDs and competition titles to be reviewed by the user.
     """
-    cursor.execute("""
-        SELECT p.proposal_id, c.competition_title
-        FROM Proposal p
-        JOIN ReviewAssignment ra ON p.proposal_id = ra.proposal_id
-        JOIN Reviewer r ON ra.reviewer_id = r.reviewer_id
-        JOIN Researcher res ON r.reviewer_id = res.researcher_id
-        JOIN Competition c ON p.competition_id = c.competition_id
-        WHERE res.first_name || ' ' || res.last_name = ?
-    """, (name,))
-    return cursor.fetchall()
+    with read_connection(conn) as conn:
+        return conn.execute(PROPOSALS_TO_REVIEW_QUERY, {'name': normalize_name(name)}).fetchall()
+
+def normalize_name(name):
+    """
+    Collapses runs of whitespace in a typed name, matching how Researcher.full_name is formed.
+    """
+    return ' '.join(name.split())
+
+def find_reviewers_by_prefix(prefix, limit=20, conn=None):
+    """
+    Finds reviewers whose full name starts with the given text, ignoring case.
+
+    Parameters:
+        prefix (str): The start of the reviewer's name, e.g. 'dan' or 'Daniel W'.
+        limit (int): The maximum number of reviewers to return.
+
+    Returns:
+        list: A list of tuples containing reviewer IDs and names, in name order.
+    """
+    with read_connection(conn) as conn:
+        return conn.execute(REVIEWERS_BY_PREFIX_QUERY, {'prefix': normalize_name(prefix), 'limit': limit}).fetchall()
+
+def quote_term(term):
+    return '"' + term.replace('"', '""') + '"'
+
+def similar_terms(word, conn):
+    """
+    Returns the words in the name index that the given input word could be a prefix or misspelling of.
+    """
+    terms = [row[0] for row in conn.execute(NAME_TERMS_QUERY, {'start': word[0], 'stop': chr(ord(word[0]) + 1)})]
+    return [term for term in terms
+            if term.startswith(word) or difflib.SequenceMatcher(None, word, term).ratio() >= FUZZY_TERM_SIMILARITY]
+
+def search_reviewers(text, limit=10, conn=None):
+    """
+    Fuzzy search for reviewers by name, tolerating typos, missing letters and partial words.
+
+    Each input word is replaced by the words in the name index it could be a prefix or misspelling of
+    (misspellings of the first letter are not found). The full-text index then returns the reviewers
+    matching one of those words for every input word, which are ranked by similarity to the input.
+
+    Parameters:
+        text (str): The name as typed, e.g. 'jhon reynols'.
+        limit (int): The maximum number of reviewers to return.
+
+    Returns:
+        list: A list of tuples containing reviewer IDs, names and a similarity score between 0 and 1, best match first.
+    """
+    text = normalize_name(text).lower()
+    with read_connection(conn) as conn:
+        groups = [similar_terms(word, conn) for word in text.split()]
+        # Input words that match nothing are left out rather than ruling out every reviewer
+        match = ' AND '.join('(' + ' OR '.join(quote_term(term) for term in terms) + ')' for terms in groups if terms)
+        if not match:
+            return []
+        candidates = conn.execute(REVIEWER_NAME_MATCH_QUERY, {'match': match, 'limit': FUZZY_CANDIDATES}).fetchall()
+    scored = [(reviewer_id, name, difflib.SequenceMatcher(None, text, name.lower()).ratio())
+              for reviewer_id, name in candidates]
+    scored.sort(key=lambda candidate: (-candidate[2], candidate[1], candidate[0]))
+    return scored[:limit]
+
+def text_search_match(text):
+    """
+    Turns free text into an FTS5 query matching every word, with the last word as a prefix.
+
+    Only word characters are kept, so user input can never be an invalid FTS5 query.
+    """
+    words = re.findall(r'\w+', text)
+    if not words:
+        return None
+    return ' '.join(quote_term(word) for word in words) + '*'
+
+def search_competitions(text, page=1, page_size=PAGE_SIZE, conn=None):
+    """
+    Full-text search over competition titles, descriptions and areas, best match first.
+
+    Parameters:
+        text (str): The words to search for, e.g. 'machine learn'.
+        page (int): The page of results to return, starting at 1.
+        page_size (int): The number of results per page.
+
+    Returns:
+        list: A list of tuples containing competition IDs, titles, areas and a snippet with the matches in [brackets].
+    """
+    match = text_search_match(text)
+    if match is None:
+        return []
+    # Ranked results have no stable key to page on, so pages are offsets into the ranking
+    with read_connection(conn) as conn:
+        return conn.execute(COMPETITION_SEARCH_QUERY, {'match': match, 'limit': page_size,
+                                                       'offset': (page - 1) * page_size}).fetchall()
+
+def search_organizations(text, page=1, page_size=PAGE_SIZE, conn=None):
+    """
+    Full-text search over organization names and addresses, best match first.
+
+    Parameters:
+        text (str): The words to search for.
+        page (int): The page of results to return, starting at 1.
+        page_size (int): The number of results per page.
+
+    Returns:
+        list: A list of tuples containing organization IDs, names and a snippet with the matches in [brackets].
+    """
+    match = text_search_match(text)
+    if match is None:
+        return []
+    with read_connection(conn) as conn:
+        return conn.execute(ORGANIZATION_SEARCH_QUERY, {'match': match, 'limit': page_size,
+                                                        'offset': (page - 1) * page_size}).fetchall()
+
+def month_arg(value):
+    if not (value.isdigit() and len(value) == 2 and 1 <= int(value) <= 12):
+        raise ValueError("month must be in MM format, e.g. '03'")
+    return value
+
+def date_arg(value):
+    if not validate_date(value):
+        raise ValueError("date must be in YYYY-MM-DD format")
+    return value
+
+def page_arg(value):
+    if not (value.isdigit() and int(value) >= 1):
+        raise ValueError("page must be a positive integer")
+    return int(value)
+
+def group_by_arg(value):
+    if value not in DUE_REVIEWS_QUERIES:
+        raise ValueError(f"group_by must be one of: {', '.join(DUE_REVIEWS_QUERIES)}")
+    return value
+
+def days_arg(value):
+    if not (value.isdigit() and int(value) <= MAX_DUE_DAYS):
+        raise ValueError(f"days must be a whole number from 0 to {MAX_DUE_DAYS}")
+    return int(value)
+
+def bool_arg(value):
+    return value.lower() in ('1', 'true', 'yes')
+
+def json_arg(value):
+    return json.loads(value) if isinstance(value, str) else value
+
+def key_arg(value):
+    key = json_arg(value)
+    if not isinstance(key, list):
+        raise ValueError("after must be a JSON array of primary key values, e.g. [5]")
+    return key
+
+def rows_as(*fields):
+    """Returns a formatter turning result rows into dicts with the given keys."""
+    return lambda rows: [dict(zip(fields, row)) for row in rows]
+
+# name -> (function, [(parameter, converter[, default])], result formatter, kind). Reads run as they
+# come; writes share a transaction with the writes around them; transactions commit on their own.
+COMMANDS = {
+    'open-competitions': (find_open_competitions, [('month', month_arg)],
+                          rows_as('competition_id', 'competition_title'), 'read'),
+    'largest-request': (find_largest_amount_proposal, [('area', str)],
+                        lambda rows: rows_as('proposal_id', 'requested_amount')(row for row in rows if row[0] is not None), 'read'),
+    'largest-award': (find_largest_awarded_proposals, [('before', date_arg)],
+                      lambda rows: rows_as('proposal_id', 'awarded_amount')(row for row in rows if row[0] is not None), 'read'),
+    'average-discrepancy': (average_discrepancy, [('area', str)], lambda value: {'average_discrepancy': value}, 'read'),
+    'eligible-reviewers': (eligible_reviewers, [('proposal_id', int)], rows_as('reviewer_id', 'name'), 'read'),
+    'assign-reviewer': (assign_reviewer, [('proposal_id', int), ('reviewer_id', int), ('review_deadline', date_arg, None)],
+                        lambda _: 'assigned', 'write'),
+    'proposals-to-review': (find_proposals_to_review, [('name', str)],
+                            rows_as('proposal_id', 'competition_title'), 'read'),
+    'view-table': (fetch_table_page, [('table', str), ('after', key_arg, None), ('page_size', int, PAGE_SIZE)],
+                   lambda page: {'rows': page[0], 'after': page[1]}, 'read'),
+    'assign-all': (assign_all, [('competition_id', int, None), ('review_deadline', date_arg, None), ('dry_run', bool_arg, False)],
+                   lambda result: {'assignments': len(result[0]), 'unfilled_proposals': len(result[1]),
+                                   'unfilled_slots': sum(result[1].values())}, 'transaction'),
+    'schedule-meetings': (schedule_review_meetings, [('dates', json_arg), ('competition_status', str, None),
+                                                     ('max_competitions', int, None), ('dry_run', bool_arg, False)],
+                          lambda result: {'meetings': [{'meeting_id': meeting_id, 'meeting_date': meeting_date,
+                                                        'competitions': competitions}
+                                                       for meeting_id, meeting_date, competitions in result[0]],
+                                          'lower_bound': result[1]['lower_bound']}, 'transaction'),
+    'export': (export, [('source', str), ('path', str), ('format', str, 'csv'), ('params', json_arg, None)],
+               lambda count: {'rows': count}, 'read'),
+    'area-report': (area_report, [], lambda report: report, 'read'),
+    'due-reviews': (due_reviews, [('group_by', group_by_arg, 'reviewer'), ('as_of', date_arg, None), ('days', days_arg, DUE_SOON_DAYS)],
+                    rows_as('id', 'name', 'overdue', 'upcoming', 'earliest_deadline'), 'read'),
+    'monthly-open-competitions': (monthly_open_competitions, [],
+                                  lambda report: {month: rows_as('competition_id', 'competition_title')(rows)
+                                                  for month, rows in report.items()}, 'read'),
+    'reviewers': (find_reviewers_by_prefix, [('prefix', str)], rows_as('reviewer_id', 'name'), 'read'),
+    'reviewer-search': (search_reviewers, [('q', str)],
+                        lambda rows: [{'reviewer_id': r, 'name': n, 'score': round(s, 3)} for r, n, s in rows], 'read'),
+    'search-competitions': (search_competitions, [('q', str), ('page', page_arg, 1)],
+                            rows_as('competition_id', 'competition_title', 'competition_area', 'snippet'), 'read'),
+    'search-organizations': (search_organizations, [('q', str), ('page', page_arg, 1)],
+                             rows_as('organization_id', 'organization_name', 'snippet'), 'read'),
+}
+
+def use_cache(cache):
+    """
+    Routes the cacheable query functions (see query_cache.QUERY_TABLES) through a result cache, both
+    for the menu and for COMMANDS. Call it once, before the first query.
+    """
+    module = globals()
+    for name in QUERY_TABLES:
+        module[name] = cached(cache, module[name])
+    for command, (function, *spec) in COMMANDS.items():
+        if function.__name__ in QUERY_TABLES:
+            COMMANDS[command] = (module[function.__name__], *spec)
+
+# Converters given JSON values as they are; the others get strings
+JSON_CONVERTERS = (json_arg, key_arg)
+
+def convert_args(param_specs, params):
+    """
+    Converts the parameters of one of COMMANDS with their converters, filling in the defaults.
+
+    Parameters:
+        param_specs (list): The command's [(parameter, converter[, default])].
+        params (dict): Parameter values by name, as strings (command line, query string) or JSON values
+            (batch requests, request bodies).
+
+    Returns:
+        list: The positional arguments of the command's function.
+
+    Raises:
+        ValueError: If a parameter is unknown, a parameter without a default is missing or a value is invalid.
+    """
+    # Rejected rather than ignored, so a misspelled option such as "dryrun" never runs a write without it
+    unknown = set(params) - {spec[0] for spec in param_specs}
+    if unknown:
+        raise ValueError(f"Unknown parameters: {', '.join(sorted(unknown))} "
+                         f"(expected {', '.join(spec[0] for spec in param_specs) or 'none'})")
+    args = []
+    for param, converter, *default in param_specs:
+        value = params.get(param)
+        if value is None:
+            if not default:
+                raise ValueError(f"Missing parameter {param}")
+            args.append(default[0])
+        elif converter in JSON_CONVERTERS:
+            args.append(converter(value))
+        else:
+            args.append(converter(str(value).lower() if isinstance(value, bool) else str(value)))
+    return args
+
+def run_command(name, params, conn):
+    """
+    Runs one of COMMANDS on the given connection without committing.
+
+    Parameters:
+        name (str): The command name.
+        params (dict): Parameter values by name, as strings or JSON values.
+        conn (sqlite3.Connection): The connection to run the command on.
+
+    Returns:
+        The formatted, JSON-serializable result.
+
+    Raises:
+        ValueError: If the command is unknown, a parameter is missing, unknown or invalid, or a write is refused.
+    """
+    if name not in COMMANDS:
+        raise ValueError(f"Unknown command: {name}")
+    function, param_specs, formatter, _ = COMMANDS[name]
+    return formatter(function(*convert_args(param_specs, params), conn=conn))
+
+def run_batch(conn, source, out, group_size=WRITE_GROUP_SIZE):
+    """
+    Executes a JSONL stream of requests over one connection and streams the responses back as JSONL.
+
+    Each request is an object with a "command" (a key of COMMANDS), the command's parameters and an
+    optional "request_id" that is copied into its response. A response holds either "result" or "error".
+    The connection caches the prepared statement of every query, so repeated commands skip parsing.
+
+    Writes are grouped: each runs in a savepoint, so a failed write only undoes itself, and the group is
+    committed once group_size writes are pending or all the input that has arrived so far is processed.
+    A group's transaction is started with begin_immediate(), so other processes cannot write between
+    the checks of a write and its commit.
+    Responses are written in request order and only after the writes before them are committed.
+
+    Parameters:
+        conn (sqlite3.Connection): A read-write connection.
+        source: A binary stream of requests, e.g. sys.stdin.buffer.
+        out: A text stream for the responses.
+        group_size (int): The maximum number of writes per transaction.
+
+    Returns:
+        dict: Counts of requests, errors and commits.
+    """
+    counts = {'requests': 0, 'errors': 0, 'commits': 0}
+    pending = []
+    writes = 0
+
+    def commit():
+        nonlocal writes
+        if conn.in_transaction:
+            conn.commit()
+            counts['commits'] += 1
+        writes = 0
+        out.write(''.join(pending))
+        out.flush()
+        pending.clear()
+
+    def respond(request_id, **body):
+        if request_id is not None:
+            body = {'request_id': request_id, **body}
+        pending.append(json.dumps(body, default=str) + '\n')
+
+    remainder = b''
+    while True:
+        # read1 returns whatever input is available, so a batch is whatever the client has sent so far
+        data = source.read1(BATCH_READ_BYTES)
+        lines = (remainder + data).split(b'\n')
+        remainder = lines.pop() if data else b''
+        for line in lines:
+            if not line.strip():
+                continue
+            counts['requests'] += 1
+            request_id = None
+            try:
+                params = json.loads(line)
+                if not isinstance(params, dict):
+                    raise ValueError("request must be a JSON object")
+                request_id = params.pop('request_id', None)
+                name = params.pop('command', None)
+                kind = COMMANDS[name][3] if name in COMMANDS else 'read'
+                if kind == 'read':
+                    respond(request_id, result=run_command(name, params, conn))
+                    continue
+                if kind == 'transaction':
+                    commit()
+                    respond(request_id, result=run_command(name, params, conn))
+                    commit()
+                    continue
+                if not conn.in_transaction:
+                    begin_immediate(conn)
+                conn.execute("SAVEPOINT request")
+                try:
+                    result = run_command(name, params, conn)
+                    conn.execute("RELEASE request")
+                except BaseException:
+                    conn.execute("ROLLBACK TO request")
+                    conn.execute("RELEASE request")
+                    raise
+                respond(request_id, result=result)
+                writes += 1
+                if writes >= group_size:
+                    commit()
+            except Exception as e:
+                # A failed write has already been rolled back to its savepoint, and a failed transaction
+                # command rolls itself back, so any error only fails its own request
+                counts['errors'] += 1
+                respond(request_id, error=str(e))
+        commit()
+        if not data:
+            return counts
+
+def main():
+    parser = argparse.ArgumentParser(description="Research grant council database application. "
+                                                 "Run without a command for the interactive menu.")
+    parser.add_argument('--db', default='council.db')
+    parser.add_argument('--cache-mb', type=int, default=64,
+                        help="Result cache size in MiB for the menu and batch mode, 0 to disable")
+    parser.add_argument('--eligibility-index', action='store_true',
+                        help="Look up eligible reviewers in an in-memory index kept current from the change log")
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.add_parser('menu', help="The interactive menu (the default)")
+    batch = subparsers.add_parser('batch', help="Run JSONL requests from a file or stdin, writing JSONL responses")
+    batch.add_argument('--input', help="Request file (default: stdin)")
+    batch.add_argument('--output', help="Response file (default: stdout)")
+    batch.add_argument('--group-size', type=int, default=WRITE_GROUP_SIZE, help="Maximum writes per transaction")
+    for name, (function, param_specs, _, _) in COMMANDS.items():
+        command = subparsers.add_parser(name, help=(function.__doc__ or '').strip().split('\n')[0])
+        for param, _, *default in param_specs:
+            command.add_argument(f"--{param.replace('_', '-')}", dest=param, required=not default,
+                                 default=default[0] if default else None)
+    args = parser.parse_args()
+
+    connections.configure(args.db)
+    cache = None
+    if args.cache_mb and args.command in (None, 'menu', 'batch'):
+        cache = QueryCache(args.cache_mb * 1024 * 1024)
+        use_cache(cache)
+    if args.eligibility_index:
+        # Imported here because eligibility_index imports db_app
+        from eligibility_index import EligibilityIndex
+        with read_connection() as conn:
+            use_eligibility_index(EligibilityIndex.load_from(conn))
+    if args.command in (None, 'menu'):
+        main_menu()
+    elif args.command == 'batch':
+        with connections.get_pool().write() as conn:
+            source = open(args.input, 'rb') if args.input else sys.stdin.buffer
+            out = open(args.output, 'w') if args.output else sys.stdout
+            try:
+                counts = run_batch(conn, source, out, args.group_size)
+            finally:
+                if args.input:
+                    source.close()
+                if args.output:
+                    out.close()
+        summary = f"{counts['requests']} requests, {counts['errors']} errors, {counts['commits']} commits"
+        if cache is not None:
+            summary += f", {cache.stats()['hits']} cache hits"
+        print(summary, file=sys.stderr)
+    else:
+        params = {param: getattr(args, param) for param, *_ in COMMANDS[args.command][1]}
+        try:
+            with connections.get_pool().write() as conn:
+                result = run_command(args.command, {k: v for k, v in params.items() if v is not None}, conn)
+        except (ValueError, sqlite3.Error, OSError) as e:
+            print(json.dumps({'error': str(e)}), file=sys.stderr)
+            close_pool()
+            sys.exit(1)
+        print(json.dumps(result, default=str))
+    close_pool()
 
 def main_menu():
     while True:
@@ -218,6 +1119,13 @@ def main_menu():
         print("5. Assign reviewers to review a specific grant application")
         print("6. Find the proposal(s) a user needs to review")
         print("7. View Table Contents")
+        print("8. Automatically assign reviewers to all proposals that need them")
+        print("9. Export a table or query result to CSV/JSONL")
+        print("10. Show the dashboard report for all areas and months")
+        print("11. Search competitions and organizations")
+        print("12. Show award distributions for all areas")
+        print("13. Schedule review meetings for all competitions")
+        print("14. Show overdue and upcoming reviews per reviewer and per competition")
         print("0. Exit")
         choice = input("> ")
 
@@ -278,18 +1186,118 @@ def main_menu():
         elif choice == "6":
             name = input("Enter reviewer's name: ")
             proposals_to_review = find_proposals_to_review(name)
-            if (proposals_to_review is not None):
+            if proposals_to_review:
                 print(proposals_to_review)
             else:
                 print("Either no proposals to review or no such reviewer")
+                suggestions = search_reviewers(name, limit=5)
+                if suggestions:
+                    print("Did you mean:", ', '.join(f"{suggestion} (ID {reviewer_id})" for reviewer_id, suggestion, _ in suggestions))
 
         elif choice == "7":
-            table_name = input("Enter the table name to view its contents (Researcher,Organization,Competition,Proposal,ProposalCollaborator,Reviewer,ReviewAssignment,ConflictOfInterest,Meeting,MeetingParticipation): ")
+            table_name = input(f"Enter the table name to view its contents ({','.join(table_names())}): ")
             view_table_contents(table_name)
+
+        elif choice == "8":
+            deadline = input("Enter review deadline (YYYY-MM-DD) or leave empty: ")
+            if deadline and not validate_date(deadline):
+                print("Please enter the date in YYYY-MM-DD format.")
+                continue
+            try:
+                with write_connection() as conn:
+                    assignments, unfilled = assign_all_reviewers(conn, review_deadline=deadline or None)
+                print(f"{len(assignments)} reviewer assignments made.")
+                if unfilled:
+                    print(f"{len(unfilled)} proposals could not be given {MAX_REVIEWERS_PER_PROPOSAL} reviewers.")
+            except sqlite3.Error as e:
+                print("Error assigning reviewers:", e)
+
+        elif choice == "9":
+            source = input(f"Enter a table name or one of {', '.join(EXPORTABLE_QUERIES)}: ")
+            path = input("Enter the output file (.csv or .jsonl): ")
+            file_format = 'jsonl' if path.endswith('.jsonl') else 'csv'
+            try:
+                if source in EXPORTABLE_QUERIES:
+                    params = {name: input(f"Enter {name}: ") for name in EXPORTABLE_QUERIES[source][1]}
+                    count = export_query(source, params, path, file_format)
+                else:
+                    count = export_table(source, path, file_format)
+                print(f"{count} rows written to {path}.")
+            except ValueError as e:
+                print(e)
+            except (sqlite3.Error, OSError) as e:
+                print("Error exporting data:", e)
+
+        elif choice == "10":
+            for area, entry in area_report().items():
+                print(f"{area}: largest request {entry['max_requested_amount']} "
+                      f"(proposals {entry['largest_request_proposals']}), "
+                      f"average discrepancy {entry['average_discrepancy']}")
+            for month, competitions in monthly_open_competitions().items():
+                print(f"{month}: {competitions}")
+
+        elif choice == "11":
+            kind = input("Search (c)ompetitions or (o)rganizations? ").lower()
+            search = search_organizations if kind.startswith('o') else search_competitions
+            text = input("Enter search words: ")
+            page = 1
+            try:
+                while True:
+                    results = search(text, page)
+                    for result in results:
+                        print(result)
+                    if not results and page == 1:
+                        print("No matches found.")
+                    if len(results) < PAGE_SIZE:
+                        break
+                    if input("Press Enter for the next page or 'q' to stop: ").lower() == 'q':
+                        break
+                    page += 1
+            except sqlite3.Error as e:
+                print("Error searching:", e)
+
+        elif choice == "12":
+            # NumPy is only needed for this report
+            try:
+                from award_analytics import award_report, print_report
+            except ImportError:
+                print("The award report needs NumPy: pip install numpy")
+                continue
+            print_report(award_report())
+
+        elif choice == "13":
+            dates = input("Enter the available meeting dates (YYYY-MM-DD, separated by spaces): ").split()
+            try:
+                meetings, stats = schedule_review_meetings(dates)
+                for meeting_id, meeting_date, competitions in meetings:
+                    print(f"{meeting_date}: meeting {meeting_id}, {len(competitions)} competitions")
+                print(f"{len(meetings)} meetings scheduled for {stats['competitions']} competitions "
+                      f"(no schedule can have fewer than {stats['lower_bound']}).")
+            except ValueError as e:
+                print(e)
+            except sqlite3.Error as e:
+                print("Error scheduling meetings:", e)
+
+        elif choice == "14":
+            days = input(f"Count reviews due within how many days as upcoming? [{DUE_SOON_DAYS}] ")
+            try:
+                days = days_arg(days) if days else DUE_SOON_DAYS
+            except ValueError as e:
+                print(e)
+                continue
+            try:
+                for group_by in DUE_REVIEWS_QUERIES:
+                    rows = due_reviews(group_by, days=days)
+                    print(f"\n{len(rows)} {group_by}s with overdue or upcoming reviews (ID, name, overdue, upcoming, earliest deadline):")
+                    for row in rows[:PAGE_SIZE]:
+                        print(row)
+                    if len(rows) > PAGE_SIZE:
+                        print(f"... and {len(rows) - PAGE_SIZE} more; export due_reviews_by_{group_by} with option 9 for all of them.")
+            except sqlite3.Error as e:
+                print("Error reading reviews:", e)
         else:
             print("Invalid choice, please try again.")
 
 
 if __name__ == "__main__":
-    main_menu()
-    conn.close()
+    main()
@@ -0,0 +1,372 @@
+import argparse
+import contextlib
+import io
+import os
+import random
+import sqlite3
+import threading
+import time
+from collections import Counter, defaultdict
+
+import db_app
+from batch_assignment import MAX_ASSIGNMENTS_PER_REVIEWER
+from change_log import last_sequence, stream_changes
+from create_database import key_columns
+from snapshot import take_snapshot
+
+# Table -> (the columns the index keeps from each row, the methods adding and removing them)
+INDEXED_TABLES = {
+    'Reviewer': (['reviewer_id'], 'add_reviewer', 'remove_reviewer'),
+    'ConflictOfInterest': (['reviewer_id', 'conflicted_researcher_id'], 'add_conflict', 'remove_conflict'),
+    'Proposal': (['proposal_id', 'principle_investigator_id'], 'add_participant', 'remove_participant'),
+    'ProposalCollaborator': (['proposal_id', 'collaborator_id'], 'add_participant', 'remove_participant'),
+    'ReviewAssignment': (['proposal_id', 'reviewer_id'], 'add_assignment', 'remove_assignment'),
+}
+
+
+class EligibilityIndex:
+    """
+    In-memory index answering "which reviewers may review this proposal" with bitmap operations.
+
+    Every reviewer is given a bit position. For each researcher the index keeps a bitmap of the reviewers in
+    conflict with them, and for each proposal the researchers taking part in it (principal investigator and
+    collaborators) and a bitmap of its assigned reviewers. Eligibility for a proposal is then
+
+        available & ~(assigned[proposal] | conflicts[participant] for every participant)
+
+    where available holds the reviewers with fewer than MAX_ASSIGNMENTS_PER_REVIEWER assignments, which is
+    the same rule as db_app.fetch_eligible_reviewers().
+
+    refresh() keeps the index current without reloading it. It applies the changes to the indexed tables
+    logged in ChangeLog since the index was loaded, through the add_* and remove_* methods. The index
+    remembers the values it took from each row, by primary key, so a changed or deleted row can be taken
+    out again. db_app.use_eligibility_index() routes the eligible reviewer lookups through an index.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.reset()
+
+    def reset(self):
+        self.sequence = 0
+        # Table -> primary key -> the values added for that row
+        self.rows = {table_name: {} for table_name in INDEXED_TABLES}
+        self.reviewer_ids = []
+        self.reviewer_bit = {}
+        self.available_mask = 0
+        self.load = Counter()
+        self.removed_reviewers = set()
+        # Counters rather than sets because none of these tables forbids duplicate rows
+        self.conflicts = defaultdict(Counter)
+        self.conflict_mask = {}
+        self.participants = defaultdict(Counter)
+        self.assigned = defaultdict(Counter)
+        self.assigned_mask = {}
+
+    @classmethod
+    def load_from(cls, conn):
+        """
+        Builds the index from a council database.
+
+        Parameters:
+            conn (sqlite3.Connection): A connection to the database.
+
+        Returns:
+            EligibilityIndex: The loaded index.
+        """
+        index = cls()
+        index.reload(conn)
+        return index
+
+    def reload(self, conn):
+        """
+        Rebuilds the index from the database in one read transaction, as of the change log position read in it.
+        """
+        own_transaction = not conn.in_transaction
+        if own_transaction:
+            conn.execute("BEGIN")
+        try:
+            with self.lock:
+                self.reset()
+                self.sequence = last_sequence(conn)
+                # Reviewers first and in ID order, so bit positions (and results) are in reviewer ID order
+                for table_name, (columns, add, _) in INDEXED_TABLES.items():
+                    key = ', '.join(key_columns(conn.cursor(), table_name))
+                    n_key = key.count(',') + 1
+                    rows = self.rows[table_name]
+                    for row in conn.execute(f"SELECT {key}, {', '.join(columns)} FROM {table_name} ORDER BY {key}"):
+                        rows[row[:n_key]] = row[n_key:]
+                        getattr(self, add)(*row[n_key:])
+        finally:
+            if own_transaction:
+                conn.execute("COMMIT")
+
+    def apply(self, change):
+        """
+        Applies one change from the change log: takes out what was added for the row, then adds its current values.
+        """
+        columns, add, remove = INDEXED_TABLES[change['table']]
+        rows = self.rows[change['table']]
+        key = tuple(change['key'])
+        old = rows.pop(key, None)
+        if old is not None:
+            getattr(self, remove)(*old)
+        if change['row'] is not None:
+            values = tuple(change['row'][column] for column in columns)
+            rows[key] = values
+            getattr(self, add)(*values)
+
+    def refresh(self, conn):
+        """
+        Applies the changes to the indexed tables committed since the last refresh (or load). Falls back to
+        a full reload after a bulk load, or if those changes have been compacted out of the change log.
+
+        Parameters:
+            conn (sqlite3.Connection): A connection outside any transaction, so the index never takes in
+                uncommitted writes.
+
+        Returns:
+            int: The number of changes applied.
+        """
+        changes = 0
+        with self.lock:
+            conn.execute("BEGIN")
+            try:
+                until = last_sequence(conn)
+                if until == self.sequence:
+                    return 0
+                for change in stream_changes(self.sequence, tables=list(INDEXED_TABLES), conn=conn):
+                    if change['operation'] == 'reload':
+                        break
+                    self.apply(change)
+                    changes += 1
+                else:
+                    self.sequence = until
+                    return changes
+            except ValueError:
+                pass
+            finally:
+                conn.execute("COMMIT")
+            self.reload(conn)
+        return changes
+
+    def bits_to_reviewers(self, mask):
+        # bin() is linear in the number of reviewers, unlike peeling bits off one at a time
+        return [self.reviewer_ids[i] for i, bit in enumerate(reversed(bin(mask)[2:])) if bit == '1']
+
+    def add_reviewer(self, reviewer_id):
+        if reviewer_id in self.reviewer_bit:
+            self.removed_reviewers.discard(reviewer_id)
+            self.update_availability(reviewer_id)
+            return
+        self.reviewer_bit[reviewer_id] = len(self.reviewer_ids)
+        self.reviewer_ids.append(reviewer_id)
+        self.update_availability(reviewer_id)
+        # Conflicts and assignments recorded before the reviewer existed now need its bit
+        for researcher_id, counts in self.conflicts.items():
+            if reviewer_id in counts:
+                self.update_conflict_mask(researcher_id)
+        for proposal_id, counts in self.assigned.items():
+            if reviewer_id in counts:
+                self.update_assigned_mask(proposal_id)
+
+    def remove_reviewer(self, reviewer_id):
+        # The bit position is kept, so the masks of other reviewers stay valid
+        self.removed_reviewers.add(reviewer_id)
+        self.update_availability(reviewer_id)
+
+    def update_availability(self, reviewer_id):
+        bit = self.reviewer_bit.get(reviewer_id)
+        if bit is None:
+            return
+        if reviewer_id not in self.removed_reviewers and self.load[reviewer_id] < MAX_ASSIGNMENTS_PER_REVIEWER:
+            self.available_mask |= 1 << bit
+        else:
+            self.available_mask &= ~(1 << bit)
+
+    def update_conflict_mask(self, researcher_id):
+        mask = 0
+        for reviewer_id in self.conflicts[researcher_id]:
+            if reviewer_id in self.reviewer_bit:
+                mask |= 1 << self.reviewer_bit[reviewer_id]
+        self.conflict_mask[researcher_id] = mask
+
+    def update_assigned_mask(self, proposal_id):
+        mask = 0
+        for reviewer_id in self.assigned[proposal_id]:
+            if reviewer_id in self.reviewer_bit:
+                mask |= 1 << self.reviewer_bit[reviewer_id]
+        self.assigned_mask[proposal_id] = mask
+
+    def add_conflict(self, reviewer_id, researcher_id):
+        self.conflicts[researcher_id][reviewer_id] += 1
+        self.update_conflict_mask(researcher_id)
+
+    def remove_conflict(self, reviewer_id, researcher_id):
+        counts = self.conflicts[researcher_id]
+        counts[reviewer_id] -= 1
+        if counts[reviewer_id] <= 0:
+            del counts[reviewer_id]
+        self.update_conflict_mask(researcher_id)
+
+    def add_participant(self, proposal_id, researcher_id):
+        """Records a principal investigator or collaborator of a proposal."""
+        self.participants[proposal_id][researcher_id] += 1
+
+    def remove_participant(self, proposal_id, researcher_id):
+        counts = self.participants[proposal_id]
+        counts[researcher_id] -= 1
+        if counts[researcher_id] <= 0:
+            del counts[researcher_id]
+
+    def add_assignment(self, proposal_id, reviewer_id):
+        self.assigned[proposal_id][reviewer_id] += 1
+        self.load[reviewer_id] += 1
+        self.update_assigned_mask(proposal_id)
+        self.update_availability(reviewer_id)
+
+    def remove_assignment(self, proposal_id, reviewer_id):
+        counts = self.assigned[proposal_id]
+        counts[reviewer_id] -= 1
+        if counts[reviewer_id] <= 0:
+            del counts[reviewer_id]
+        self.load[reviewer_id] -= 1
+        self.update_assigned_mask(proposal_id)
+        self.update_availability(reviewer_id)
+
+    def excluded_mask(self, proposal_id):
+        mask = self.assigned_mask.get(proposal_id, 0)
+        for researcher_id in self.participants.get(proposal_id, ()):
+            mask |= self.conflict_mask.get(researcher_id, 0)
+        return mask
+
+    def eligible_reviewers(self, proposal_id):
+        """
+        Returns the reviewers eligible to review a proposal.
+
+        Parameters:
+            proposal_id (int): The ID of the proposal.
+
+        Returns:
+            list: Eligible reviewer IDs, in ascending order after load_from().
+        """
+        with self.lock:
+            return self.bits_to_reviewers(self.available_mask & ~self.excluded_mask(proposal_id))
+
+    def eligible_reviewers_batch(self, proposal_ids):
+        """
+        Returns the eligible reviewers for many proposals at once.
+
+        Parameters:
+            proposal_ids (iterable): The IDs of the proposals.
+
+        Returns:
+            dict: Eligible reviewer IDs keyed by proposal ID.
+        """
+        with self.lock:
+            available = self.available_mask
+            return {proposal_id: self.bits_to_reviewers(available & ~self.excluded_mask(proposal_id))
+                    for proposal_id in proposal_ids}
+
+
+def compare_with_sql(conn, index, proposal_ids):
+    """
+    Checks the index against db_app.fetch_eligible_reviewers() for the given proposals.
+
+    Returns:
+        tuple: (mismatching proposal IDs, seconds spent in SQL, seconds spent in the index)
+    """
+    sql_results = {}
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for proposal_id in proposal_ids:
+            sql_results[proposal_id] = sorted(db_app.fetch_eligible_reviewers(proposal_id, conn))
+    sql_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    index_results = index.eligible_reviewers_batch(proposal_ids)
+    index_time = time.perf_counter() - start
+
+    mismatches = [proposal_id for proposal_id in proposal_ids if sql_results[proposal_id] != index_results[proposal_id]]
+    return mismatches, sql_time, index_time
+
+
+def make_random_writes(conn, n, rng):
+    """
+    Makes n random writes to the tables the index covers, each committed on its own: conflicts and
+    collaborators added and removed, assignments removed and principal investigators changed.
+
+    Returns:
+        set: The IDs of the proposals whose eligible reviewers the writes may have changed.
+    """
+    proposal_ids = [row[0] for row in conn.execute("SELECT proposal_id FROM Proposal")]
+    reviewer_ids = [row[0] for row in conn.execute("SELECT reviewer_id FROM Reviewer")]
+    researcher_ids = [row[0] for row in conn.execute("SELECT researcher_id FROM Researcher")]
+    touched = set()
+    for _ in range(n):
+        proposal_id = rng.choice(proposal_ids)
+        write = rng.randrange(6)
+        if write == 0:
+            conn.execute("""
+                INSERT INTO ConflictOfInterest (reviewer_id, conflicted_researcher_id)
+                SELECT ?, principle_investigator_id FROM Proposal WHERE proposal_id = ?
+            """, (rng.choice(reviewer_ids), proposal_id))
+        elif write == 1:
+            conn.execute("DELETE FROM ConflictOfInterest WHERE conflict_id = (SELECT MAX(conflict_id) FROM ConflictOfInterest)")
+        elif write == 2:
+            conn.execute("INSERT OR IGNORE INTO ProposalCollaborator (proposal_id, collaborator_id) VALUES (?, ?)",
+                         (proposal_id, rng.choice(researcher_ids)))
+        elif write == 3:
+            conn.execute("DELETE FROM ProposalCollaborator WHERE rowid = (SELECT MIN(rowid) FROM ProposalCollaborator WHERE proposal_id = ?)",
+                         (proposal_id,))
+        elif write == 4:
+            conn.execute("DELETE FROM ReviewAssignment WHERE review_assignment_id = (SELECT MAX(review_assignment_id) FROM ReviewAssignment)")
+        else:
+            conn.execute("UPDATE Proposal SET principle_investigator_id = ? WHERE proposal_id = ?",
+                         (rng.choice(researcher_ids), proposal_id))
+        conn.commit()
+        touched.add(proposal_id)
+    return touched
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load the eligibility index and check it against the SQL path.")
+    parser.add_argument('--db', default='council.db')
+    parser.add_argument('--samples', type=int, default=200, help="Number of proposals to compare")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--writes', type=int, default=200,
+                        help="Random writes made to a copy of the database before checking the refreshed index, 0 to skip")
+    parser.add_argument('--work-db', default='eligibility_check.db', help="The copy the writes are made to")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    start = time.perf_counter()
+    index = EligibilityIndex.load_from(conn)
+    print(f"Index loaded in {time.perf_counter() - start:.2f}s "
+          f"({len(index.reviewer_ids)} reviewers, {len(index.participants)} proposals).")
+
+    proposal_ids = [row[0] for row in conn.execute("SELECT proposal_id FROM Proposal")]
+    sample = random.Random(args.seed).sample(proposal_ids, min(args.samples, len(proposal_ids)))
+    mismatches, sql_time, index_time = compare_with_sql(conn, index, sample)
+    conn.close()
+    print(f"SQL: {sql_time:.3f}s, index: {index_time:.3f}s for {len(sample)} proposals.")
+    if mismatches:
+        print(f"{len(mismatches)} proposals differ from the SQL path, e.g. {mismatches[:10]}")
+    else:
+        print("Index matches the SQL path.")
+
+    if args.writes:
+        # The index loaded from the original stays valid for the copy: it has the same rows and change log
+        take_snapshot(args.db, args.work_db)
+        conn = sqlite3.connect(args.work_db)
+        touched = make_random_writes(conn, args.writes, random.Random(args.seed))
+        start = time.perf_counter()
+        changes = index.refresh(conn)
+        print(f"Applied {changes} changes from {args.writes} writes in {time.perf_counter() - start:.3f}s.")
+        mismatches, _, _ = compare_with_sql(conn, index, sorted(touched | set(sample)))
+        conn.close()
+        os.remove(args.work_db)
+        if mismatches:
+            print(f"{len(mismatches)} proposals differ from the SQL path after the writes, e.g. {mismatches[:10]}")
+        else:
+            print("Refreshed index matches the SQL path.")
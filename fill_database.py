@@ -1,11 +1,31 @@
+import argparse
+import os
 import random
 import sqlite3
-from datetime import datetime, timedelta
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
 
 from faker import Faker
 
+from create_database import (INDEXES, PARTIAL_INDEXES, UNIQUE_INDEXES, create_assignment_limit_triggers,
+                             create_database, create_indexes, drop_assignment_limit_triggers, drop_derived_triggers,
+                             rebuild_derived_state)
+
 fake = Faker()
 
+# Rows generated per work unit in bulk mode; each chunk is seeded independently so the
+# output only depends on the seed, not on the number of worker processes.
+CHUNK_SIZE = 100_000
+COMMIT_ROWS = 1_000_000
+NAME_POOL_SIZE = 1000
+
+AREAS = ['Renewable Energy', 'Software Engineering', 'Data Science', 'Healthcare Technology',
+         'Educational Technology', 'Urban Sustainability', 'Cloud Computing', 'Artificial Intelligence',
+         'Cybersecurity', 'Blockchain Technology', 'Quantum Computing', 'Marine Biology',
+         'Materials Science', 'Neuroscience', 'Climate Science', 'Robotics']
+
 def insert_organizations(cursor, n=10):
     for _ in range(n):
         cursor.execute(
@@ -81,10 +101,14 @@ def insert_review_assignments(cursor, n=10):
     for _ in range(n):
         proposal_id, competition_id = random.choice(proposal_info)
         deadline = (datetime.now() + timedelta(days=random.randint(30, 90))).date()
-        cursor.execute(
-            "INSERT INTO ReviewAssignment (competition_id, reviewer_id, proposal_id, review_deadline, review_submitted) VALUES (?, ?, ?, ?, ?)",
-            (competition_id, random.choice(reviewer_ids), proposal_id, deadline, random.choice([True, False]))
-        )
+        try:
+            cursor.execute(
+                "INSERT INTO ReviewAssignment (competition_id, reviewer_id, proposal_id, review_deadline, review_submitted) VALUES (?, ?, ?, ?, ?)",
+                (competition_id, random.choice(reviewer_ids), proposal_id, deadline, random.choice([True, False]))
+            )
+        except sqlite3.IntegrityError:
+            # A repeated pair, or a proposal or reviewer already at its limit
+            continue
 
 def insert_conflicts_of_interest(cursor, n=10):
     cursor.execute("SELECT reviewer_id FROM Reviewer")
@@ -141,6 +165,251 @@ def fill_database():
     conn.commit()
     conn.close()
 
+def default_counts(n_proposals):
+    """
+    Derives target row counts for every table from the number of proposals.
+
+    Parameters:
+        n_proposals (int): The number of proposals to generate.
+
+    Returns:
+        dict: Row counts keyed by table, plus the per-row fan-out settings.
+    """
+    n_researchers = max(50, n_proposals // 5)
+    return {
+        'organizations': max(10, n_researchers // 50),
+        'researchers': n_researchers,
+        'competitions': max(10, n_proposals // 100),
+        'proposals': n_proposals,
+        'reviewers': max(10, n_researchers // 10),
+        'conflicts_per_reviewer': 2,
+        'meetings': max(10, n_proposals // 10_000),
+        'meeting_participations': max(10, n_proposals // 100),
+    }
+
+def chunk_random(seed, table_name, chunk):
+    # String seeds are hashed with SHA-512, so this is stable across runs and processes
+    return random.Random(f"{seed}:{table_name}:{chunk}")
+
+def chunk_faker(seed, table_name, chunk):
+    fake.seed_instance(f"{seed}:{table_name}:{chunk}")
+    return fake
+
+def random_date(rng, start, days):
+    return (start + timedelta(days=rng.randrange(days))).isoformat()
+
+def generate_organizations(seed, chunk, start, stop, counts):
+    rng = chunk_random(seed, 'Organization', chunk)
+    fake = chunk_faker(seed, 'Organization', chunk)
+    # Faker addresses are slow, so each chunk combines pooled companies, streets and cities
+    companies = [fake.company() for _ in range(NAME_POOL_SIZE)]
+    streets = [fake.street_address() for _ in range(NAME_POOL_SIZE)]
+    cities = [f"{fake.city()}, {fake.state_abbr()} {fake.postcode()}" for _ in range(NAME_POOL_SIZE)]
+    return [(i, rng.choice(companies), f"{rng.choice(streets)}, {rng.choice(cities)}") for i in range(start, stop)]
+
+def generate_researchers(seed, chunk, start, stop, counts):
+    rng = chunk_random(seed, 'Researcher', chunk)
+    fake = chunk_faker(seed, 'Researcher', chunk)
+    # Faker is slow per call, so each chunk draws from a pool of Faker-generated values
+    first_names = [fake.first_name() for _ in range(NAME_POOL_SIZE)]
+    last_names = [fake.last_name() for _ in range(NAME_POOL_SIZE)]
+    domains = [fake.free_email_domain() for _ in range(10)]
+    rows = []
+    for i in range(start, stop):
+        first_name, last_name = rng.choice(first_names), rng.choice(last_names)
+        # The id suffix keeps emails unique without a lookup
+        email = f"{first_name.lower()}.{last_name.lower()}{i}@{rng.choice(domains)}"
+        rows.append((i, first_name, last_name, email, rng.randint(1, counts['organizations'])))
+    return rows
+
+def generate_competitions(seed, chunk, start, stop, counts):
+    rng = chunk_random(seed, 'Competition', chunk)
+    fake = chunk_faker(seed, 'Competition', chunk)
+    return [(i, i, fake.catch_phrase(), fake.paragraph(), rng.choice(AREAS), rng.choice(['Open', 'Closed']),
+             random_date(rng, date(2024, 1, 1), 730)) for i in range(start, stop)]
+
+def generate_proposals(seed, chunk, start, stop, counts):
+    rng = chunk_random(seed, 'Proposal', chunk)
+    rows = []
+    for i in range(start, stop):
+        amount = round(rng.uniform(5000, 50000), 2)
+        draw = rng.random()
+        status = 'Submitted' if draw < 0.4 else 'Awarded' if draw < 0.7 else 'Not Awarded'
+        if status == 'Awarded':
+            awarded_amount, awarded_date = round(amount * rng.uniform(0.5, 1.1), 2), random_date(rng, date(2023, 1, 1), 730)
+        else:
+            awarded_amount, awarded_date = None, None
+        rows.append((i, amount, rng.randint(1, counts['competitions']), rng.randint(1, counts['researchers']),
+                     status, awarded_amount, awarded_date))
+    return rows
+
+def generate_proposal_collaborators(seed, chunk, start, stop, counts):
+    rng = chunk_random(seed, 'ProposalCollaborator', chunk)
+    researchers = range(1, counts['researchers'] + 1)
+    rows = []
+    for proposal_id in range(start, stop):
+        # Most proposals have a handful of collaborators, a few are large (more than ten)
+        n = rng.randint(11, 15) if rng.random() < 0.02 else rng.randint(0, 4)
+        rows.extend((proposal_id, collaborator_id) for collaborator_id in rng.sample(researchers, n))
+    return rows
+
+def generate_reviewers(seed, chunk, start, stop, counts):
+    # Reviewers are spread evenly over the researchers so every chunk can recompute their ids
+    step = counts['researchers'] // counts['reviewers']
+    return [((i - 1) * step + 1,) for i in range(start, stop)]
+
+def generate_review_assignments(seed, chunk, start, stop, counts):
+    rng = chunk_random(seed, 'ReviewAssignment', chunk)
+    rows = []
+    # Reviewers i, i + groups and i + 2 * groups pick from the same proposals, every groups-th one, so no
+    # proposal can get more than 3 reviewers whichever chunks the reviewers fall in
+    groups = -(-counts['reviewers'] // 3)
+    for i, (reviewer_id,) in enumerate(generate_reviewers(seed, chunk, start, stop, counts), start):
+        proposals = range((i - 1) % groups + 1, counts['proposals'] + 1, groups)
+        # competition_id is filled in from Proposal once everything is loaded
+        for proposal_id in rng.sample(proposals, min(len(proposals), rng.randint(0, 3))):
+            rows.append((None, reviewer_id, proposal_id, random_date(rng, date(2024, 1, 1), 365), rng.choice([True, False])))
+    return rows
+
+def generate_conflicts_of_interest(seed, chunk, start, stop, counts):
+    rng = chunk_random(seed, 'ConflictOfInterest', chunk)
+    return [(reviewer_id, rng.randint(1, counts['researchers']))
+            for (reviewer_id,) in generate_reviewers(seed, chunk, start, stop, counts)
+            for _ in range(counts['conflicts_per_reviewer'])]
+
+def generate_meetings(seed, chunk, start, stop, counts):
+    rng = chunk_random(seed, 'Meeting', chunk)
+    return [(i, random_date(rng, date(2024, 1, 1), 730)) for i in range(start, stop)]
+
+def generate_meeting_participations(seed, chunk, start, stop, counts):
+    rng = chunk_random(seed, 'MeetingParticipation', chunk)
+    step = counts['researchers'] // counts['reviewers']
+    return [(rng.randint(1, counts['meetings']), rng.randint(1, counts['competitions']),
+             rng.randrange(counts['reviewers']) * step + 1) for _ in range(start, stop)]
+
+# (table, generator, count key, INSERT statement) in foreign key dependency order
+BULK_TABLES = [
+    ('Organization', generate_organizations, 'organizations',
+     "INSERT INTO Organization (organization_id, organization_name, organization_address) VALUES (?, ?, ?)"),
+    ('Researcher', generate_researchers, 'researchers',
+     "INSERT INTO Researcher (researcher_id, first_name, last_name, email, organization_id) VALUES (?, ?, ?, ?, ?)"),
+    ('Competition', generate_competitions, 'competitions',
+     "INSERT INTO Competition (competition_id, competition_number, competition_title, competition_description, competition_area, competition_status, competition_deadline) VALUES (?, ?, ?, ?, ?, ?, ?)"),
+    ('Proposal', generate_proposals, 'proposals',
+     "INSERT INTO Proposal (proposal_id, requested_amount, competition_id, principle_investigator_id, proposal_status, awarded_amount, awarded_date) VALUES (?, ?, ?, ?, ?, ?, ?)"),
+    ('ProposalCollaborator', generate_proposal_collaborators, 'proposals',
+     "INSERT INTO ProposalCollaborator (proposal_id, collaborator_id) VALUES (?, ?)"),
+    ('Reviewer', generate_reviewers, 'reviewers',
+     "INSERT INTO Reviewer (reviewer_id) VALUES (?)"),
+    ('ReviewAssignment', generate_review_assignments, 'reviewers',
+     "INSERT INTO ReviewAssignment (competition_id, reviewer_id, proposal_id, review_deadline, review_submitted) VALUES (?, ?, ?, ?, ?)"),
+    ('ConflictOfInterest', generate_conflicts_of_interest, 'reviewers',
+     "INSERT INTO ConflictOfInterest (reviewer_id, conflicted_researcher_id) VALUES (?, ?)"),
+    ('Meeting', generate_meetings, 'meetings',
+     "INSERT INTO Meeting (meeting_id, meeting_date) VALUES (?, ?)"),
+    ('MeetingParticipation', generate_meeting_participations, 'meeting_participations',
+     "INSERT OR IGNORE INTO MeetingParticipation (meeting_id, competition_id, reviewer_id) VALUES (?, ?, ?)"),
+]
+
+def generate_chunks(executor, generator, seed, n, counts, window):
+    """
+    Yields the generated chunks of one table in order, keeping at most `window` chunks in flight.
+    """
+    tasks = [(seed, chunk, start, min(start + CHUNK_SIZE, n + 1), counts)
+             for chunk, start in enumerate(range(1, n + 1, CHUNK_SIZE))]
+    if executor is None:
+        for task in tasks:
+            yield generator(*task)
+        return
+    pending = deque()
+    for task in tasks:
+        pending.append(executor.submit(generator, *task))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+def bulk_fill_database(db_name='council.db', counts=None, seed=0, workers=None):
+    """
+    Fills a fresh database with deterministic synthetic data at production scale.
+
+    Rows are generated in independently seeded chunks on a process pool and inserted with
+    executemany inside large transactions, with secondary indexes built after the load.
+
+    Parameters:
+        db_name (str): The database to create and fill.
+        counts (dict): Target row counts, see default_counts(). Defaults to 10,000 proposals.
+        seed (int): The same seed always produces the same database.
+        workers (int): Number of generator processes; 0 generates in-process.
+
+    Returns:
+        dict: The number of rows inserted per table.
+    """
+    counts = counts or default_counts(10_000)
+    create_database(db_name)
+    conn = sqlite3.connect(db_name)
+    cursor = conn.cursor()
+
+    cursor.execute("PRAGMA journal_mode = OFF")
+    cursor.execute("PRAGMA synchronous = OFF")
+    cursor.execute("PRAGMA locking_mode = EXCLUSIVE")
+    cursor.execute("PRAGMA temp_store = MEMORY")
+    cursor.execute("PRAGMA cache_size = -262144")
+    for index_name, *_ in INDEXES + UNIQUE_INDEXES + PARTIAL_INDEXES:
+        cursor.execute(f"DROP INDEX IF EXISTS {index_name}")
+    # Derived data is rebuilt in one pass after the load instead of by triggers per row. The generated
+    # review assignments are within the assignment limits by construction.
+    drop_derived_triggers(cursor)
+    drop_assignment_limit_triggers(cursor)
+
+    inserted = {}
+    workers = os.cpu_count() if workers is None else workers
+    executor = ProcessPoolExecutor(workers) if workers else None
+    window = 2 * max(workers, 1)
+    try:
+        for table_name, generator, count_key, statement in BULK_TABLES:
+            start_time = time.perf_counter()
+            inserted[table_name] = uncommitted = 0
+            for rows in generate_chunks(executor, generator, seed, counts[count_key], counts, window):
+                cursor.executemany(statement, rows)
+                # Not len(rows): duplicate meeting participations are skipped by INSERT OR IGNORE
+                inserted[table_name] += cursor.rowcount
+                uncommitted += len(rows)
+                if uncommitted >= COMMIT_ROWS:
+                    conn.commit()
+                    uncommitted = 0
+            conn.commit()
+            elapsed = time.perf_counter() - start_time
+            print(f"{table_name}: {inserted[table_name]} rows in {elapsed:.1f}s "
+                  f"({inserted[table_name] / elapsed if elapsed else 0:.0f} rows/s)")
+    finally:
+        if executor:
+            executor.shutdown()
+
+    cursor.execute("""
+        UPDATE ReviewAssignment
+        SET competition_id = (SELECT p.competition_id FROM Proposal p WHERE p.proposal_id = ReviewAssignment.proposal_id)
+    """)
+    rebuild_derived_state(cursor)
+    create_indexes(cursor)
+    create_assignment_limit_triggers(cursor)
+    cursor.execute("ANALYZE")
+    conn.commit()
+    conn.close()
+    return inserted
+
 if __name__ == "__main__":
-    fill_database()
-    print("Database filled with realistic data successfully.")
+    parser = argparse.ArgumentParser(description="Fill a database with synthetic data.")
+    parser.add_argument('--proposals', type=int, help="Bulk mode: number of proposals to generate (other tables scale with it)")
+    parser.add_argument('--seed', type=int, default=0, help="Bulk mode: random seed")
+    parser.add_argument('--workers', type=int, help="Bulk mode: generator processes (default: CPU count, 0 for none)")
+    parser.add_argument('--db', default='council.db', help="Bulk mode: database to fill")
+    args = parser.parse_args()
+
+    if args.proposals:
+        start_time = time.perf_counter()
+        bulk_fill_database(args.db, default_counts(args.proposals), args.seed, args.workers)
+        print(f"Database filled in {time.perf_counter() - start_time:.1f}s.")
+    else:
+        fill_database()
+        print("Database filled with realistic data successfully.")
@@ -0,0 +1,371 @@
+import argparse
+import csv
+import json
+import os
+import sqlite3
+import sys
+import time
+from datetime import date
+from itertools import islice
+
+from create_database import (INDEXES, PARTIAL_INDEXES, UNIQUE_INDEXES, assignment_limit_violations,
+                             create_assignment_limit_triggers, create_database, create_indexes,
+                             drop_assignment_limit_triggers, drop_derived_triggers,
+                             rebuild_derived_state)
+
+# Tables in foreign key dependency order: every table comes after the tables it references
+IMPORT_ORDER = ['Organization', 'Researcher', 'Competition', 'Proposal', 'ProposalCollaborator', 'Reviewer',
+                'ReviewAssignment', 'ConflictOfInterest', 'Meeting', 'MeetingParticipation']
+
+# Columns that are maintained from other tables; values for them in an import file are ignored
+DERIVED_COLUMNS = {'Proposal': {'collaborator_count'}}
+
+BATCH_SIZE = 10_000
+COMMIT_ROWS = 100_000
+MAX_REPORTED_REJECTS = 10
+
+
+def table_columns(cursor, table_name):
+    """
+    Returns (name, declared type, not null, has default) for every column that can be imported into a table.
+
+    Generated columns (hidden in table_xinfo) and derived columns are left out.
+    """
+    return [(name, declared_type.upper(), bool(notnull), default is not None or primary_key)
+            for _, name, declared_type, notnull, default, primary_key, hidden
+            in cursor.execute(f"PRAGMA table_xinfo({table_name})")
+            if not hidden and name not in DERIVED_COLUMNS.get(table_name, ())]
+
+
+def ignored_columns(cursor, table_name):
+    """
+    Returns the columns that exports contain but imports skip: generated and derived columns.
+    """
+    generated = {row[1] for row in cursor.execute(f"PRAGMA table_xinfo({table_name})") if row[6]}
+    return generated | DERIVED_COLUMNS.get(table_name, set())
+
+
+def convert_value(value, declared_type):
+    """
+    Converts a value read from CSV (always a string) or JSON to the Python type stored for a column.
+
+    Raises:
+        ValueError: If the value does not fit the column type.
+    """
+    if value is None or value == '':
+        return None
+    if declared_type.startswith('INT'):
+        return int(value)
+    if declared_type.startswith(('DECIMAL', 'REAL', 'FLOAT', 'NUMERIC')):
+        return float(value)
+    if declared_type == 'BOOLEAN':
+        if isinstance(value, bool):
+            return int(value)
+        text = str(value).lower()
+        if text not in ('0', '1', 'true', 'false'):
+            raise ValueError(f"not a boolean: {value!r}")
+        return int(text in ('1', 'true'))
+    if declared_type == 'DATE':
+        return date.fromisoformat(str(value)).isoformat()
+    return str(value)
+
+
+def convert_record(record, columns):
+    """
+    Validates one record (a dict keyed by column name) and returns its values in column order.
+
+    Raises:
+        ValueError: If a value has the wrong type or a required value is missing.
+    """
+    values = []
+    for name, declared_type, notnull, has_default in columns:
+        try:
+            value = convert_value(record.get(name), declared_type)
+        except ValueError as e:
+            raise ValueError(f"{name}: {e}") from None
+        if value is None and notnull and not has_default:
+            raise ValueError(f"{name}: missing required value")
+        values.append(value)
+    return tuple(values)
+
+
+def read_records(path):
+    """
+    Streams the records of a CSV (with a header row) or JSONL file as dicts.
+    """
+    with open(path, newline='') as f:
+        if path.endswith('.jsonl'):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from csv.DictReader(f)
+
+
+def file_columns(path):
+    """
+    Returns the column names of an import file: the CSV header, or the keys of the first JSONL record.
+    """
+    for record in read_records(path):
+        return list(record)
+    return []
+
+
+def create_progress_table(cursor):
+    """
+    Creates the table recording how many records of each import file have been committed.
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS ImportProgress (
+            table_name TEXT NOT NULL,
+            path TEXT NOT NULL,
+            file_size INTEGER NOT NULL,
+            records_committed INTEGER NOT NULL DEFAULT 0,
+            rows_inserted INTEGER NOT NULL DEFAULT 0,
+            rows_rejected INTEGER NOT NULL DEFAULT 0,
+            completed BOOLEAN NOT NULL DEFAULT 0,
+            PRIMARY KEY (table_name, path)
+        )
+    ''')
+
+
+def load_progress(cursor, table_name, path, restart=False):
+    """
+    Returns the progress of an earlier import of the same file, starting afresh if there is none.
+
+    Raises:
+        ValueError: If the file changed size since the earlier import, unless restart is set.
+    """
+    file_size = os.path.getsize(path)
+    row = cursor.execute(
+        "SELECT file_size, records_committed, rows_inserted, rows_rejected, completed FROM ImportProgress "
+        "WHERE table_name = ? AND path = ?", (table_name, path)).fetchone()
+    if row and not restart:
+        if row[0] != file_size:
+            raise ValueError(f"{path} changed since it was partly imported; pass --restart to import it again")
+        return {'records': row[1], 'inserted': row[2], 'rejected': row[3], 'completed': bool(row[4])}
+    cursor.execute("INSERT OR REPLACE INTO ImportProgress (table_name, path, file_size) VALUES (?, ?, ?)",
+                   (table_name, path, file_size))
+    return {'records': 0, 'inserted': 0, 'rejected': 0, 'completed': False}
+
+
+class Rejects:
+    """
+    The records an import rejected. Only the first few are kept with their reasons, so a file of mostly
+    bad records does not fill memory; the rest are just counted.
+    """
+
+    def __init__(self, limit=MAX_REPORTED_REJECTS):
+        self.limit = limit
+        self.count = 0
+        self.first = []
+
+    def add(self, record_number, reason):
+        self.count += 1
+        if len(self.first) < self.limit:
+            self.first.append((record_number, reason))
+
+
+def insert_batch(cursor, statement, batch, rejects):
+    """
+    Inserts a batch of (record number, values) with executemany. If the database rejects a row (a
+    constraint violation), the batch is retried row by row so that only the offending rows are skipped.
+
+    Returns:
+        int: The number of rows inserted.
+    """
+    cursor.execute("SAVEPOINT import_batch")
+    try:
+        cursor.executemany(statement, [values for _, values in batch])
+        cursor.execute("RELEASE import_batch")
+        return len(batch)
+    except sqlite3.IntegrityError:
+        cursor.execute("ROLLBACK TO import_batch")
+        cursor.execute("RELEASE import_batch")
+    inserted = 0
+    for record_number, values in batch:
+        try:
+            cursor.execute(statement, values)
+            inserted += 1
+        except sqlite3.IntegrityError as e:
+            rejects.add(record_number, str(e))
+    return inserted
+
+
+def import_file(conn, table_name, path, restart=False, commit_rows=COMMIT_ROWS):
+    """
+    Streams one CSV or JSONL file into a table in chunked transactions, resuming after the last chunk
+    committed by an earlier run.
+
+    Every chunk is committed together with the number of records it consumed, so a load that fails or
+    is interrupted can be rerun and continues exactly where it stopped.
+
+    Parameters:
+        conn (sqlite3.Connection): A connection to the database.
+        table_name (str): The table to load.
+        path (str): A .csv file with a header row or a .jsonl file with one object per line.
+        restart (bool): Ignore earlier progress on this file and import it from the start.
+        commit_rows (int): Records per transaction.
+
+    Returns:
+        dict: Records read, rows inserted and rejected, the first MAX_REPORTED_REJECTS records rejected in
+            this run as (record number, reason), and how many more were rejected in this run.
+
+    Raises:
+        ValueError: If the file has columns the table does not.
+    """
+    cursor = conn.cursor()
+    columns = table_columns(cursor, table_name)
+    unknown = set(file_columns(path)) - {name for name, *_ in columns} - ignored_columns(cursor, table_name)
+    if unknown:
+        raise ValueError(f"{path}: unknown columns for {table_name}: {', '.join(sorted(unknown))}")
+    names = [name for name, *_ in columns]
+    statement = f"INSERT INTO {table_name} ({', '.join(names)}) VALUES ({', '.join('?' * len(names))})"
+
+    progress = load_progress(cursor, table_name, path, restart)
+    conn.commit()
+    rejects = Rejects()
+    if progress['completed']:
+        print(f"{table_name}: {path} already imported, skipping")
+        return dict(progress, rejects=[], more_rejects=0)
+    if progress['records']:
+        print(f"{table_name}: resuming {path} after record {progress['records']}")
+
+    start_time = time.perf_counter()
+    rejected_before = progress['rejected']
+    records = enumerate(islice(read_records(path), progress['records'], None), start=progress['records'] + 1)
+    inserted_this_run = 0
+    while True:
+        chunk = list(islice(records, commit_rows))
+        if not chunk:
+            break
+        # An explicit transaction, so releasing the per-batch savepoints does not commit
+        cursor.execute("BEGIN")
+        for start in range(0, len(chunk), BATCH_SIZE):
+            batch = []
+            for record_number, record in chunk[start:start + BATCH_SIZE]:
+                try:
+                    batch.append((record_number, convert_record(record, columns)))
+                except ValueError as e:
+                    rejects.add(record_number, str(e))
+            inserted = insert_batch(cursor, statement, batch, rejects)
+            progress['inserted'] += inserted
+            inserted_this_run += inserted
+        progress['records'] = chunk[-1][0]
+        progress['rejected'] = rejected_before + rejects.count
+        cursor.execute(
+            "UPDATE ImportProgress SET records_committed = ?, rows_inserted = ?, rows_rejected = ? "
+            "WHERE table_name = ? AND path = ?",
+            (progress['records'], progress['inserted'], progress['rejected'], table_name, path))
+        conn.commit()
+        elapsed = time.perf_counter() - start_time
+        print(f"{table_name}: {progress['records']} records, {progress['inserted']} rows inserted, "
+              f"{progress['rejected']} rejected ({inserted_this_run / elapsed if elapsed else 0:.0f} rows/s)")
+
+    cursor.execute("UPDATE ImportProgress SET completed = 1 WHERE table_name = ? AND path = ?", (table_name, path))
+    conn.commit()
+    progress['completed'] = True
+    return dict(progress, rejects=rejects.first, more_rejects=rejects.count - len(rejects.first))
+
+
+def find_import_files(directory):
+    """
+    Finds <Table>.csv or <Table>.jsonl files in a directory, in IMPORT_ORDER.
+
+    Returns:
+        list: (table name, path) tuples.
+    """
+    files = []
+    for table_name in IMPORT_ORDER:
+        for extension in ('.csv', '.jsonl'):
+            path = os.path.join(directory, table_name + extension)
+            if os.path.exists(path):
+                files.append((table_name, path))
+    return files
+
+
+def import_files(db_name, files, drop_indexes=False, restart=False):
+    """
+    Imports several files into the database in foreign key dependency order.
+
+    Parameters:
+        db_name (str): The database to load into; it is created if it does not exist.
+        files (list): (table name, path) tuples.
+        drop_indexes (bool): Drop the secondary indexes and the derived-data and assignment limit
+            triggers for the load and rebuild them once at the end, which is much faster for large loads.
+            Repeated review assignments are then deleted at the end, and assignments over the limits
+            are reported rather than rejected.
+        restart (bool): Ignore the progress of earlier, interrupted imports.
+
+    Returns:
+        dict: The import result of each file, keyed by (table name, path).
+    """
+    create_database(db_name)
+    conn = sqlite3.connect(db_name)
+    cursor = conn.cursor()
+    cursor.execute("PRAGMA cache_size = -262144")
+    cursor.execute("PRAGMA temp_store = MEMORY")
+    create_progress_table(cursor)
+    if drop_indexes:
+        for index_name, *_ in INDEXES + UNIQUE_INDEXES + PARTIAL_INDEXES:
+            cursor.execute(f"DROP INDEX IF EXISTS {index_name}")
+        drop_derived_triggers(cursor)
+        drop_assignment_limit_triggers(cursor)
+    conn.commit()
+
+    results = {}
+    files = sorted(files, key=lambda file: IMPORT_ORDER.index(file[0]))
+    try:
+        for table_name, path in files:
+            results[table_name, path] = import_file(conn, table_name, path, restart)
+    finally:
+        # Discard a partly loaded chunk, which was not recorded as committed, then leave the database
+        # usable even if a file failed; rerunning the import resumes it
+        conn.rollback()
+        if drop_indexes:
+            start_time = time.perf_counter()
+            rebuild_derived_state(cursor)
+            create_indexes(cursor)
+            violations = assignment_limit_violations(cursor)
+            if any(violations.values()):
+                print(f"Warning: review assignments over the limits: {violations}")
+            create_assignment_limit_triggers(cursor)
+            cursor.execute("ANALYZE")
+            conn.commit()
+            print(f"Indexes and derived data rebuilt in {time.perf_counter() - start_time:.1f}s")
+        conn.close()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stream CSV/JSONL files into the council database.")
+    parser.add_argument('paths', nargs='+',
+                        help="Directories holding <Table>.csv/.jsonl files, or TABLE=PATH for a single file")
+    parser.add_argument('--db', default='council.db')
+    parser.add_argument('--drop-indexes', action='store_true',
+                        help="Drop secondary indexes and derived-data triggers during the load and rebuild them after")
+    parser.add_argument('--restart', action='store_true', help="Ignore the progress of earlier interrupted imports")
+    args = parser.parse_args()
+
+    files = []
+    for path in args.paths:
+        if os.path.isdir(path):
+            files.extend(find_import_files(path))
+        elif '=' in path and path.split('=', 1)[0] in IMPORT_ORDER:
+            files.append(tuple(path.split('=', 1)))
+        else:
+            parser.error(f"{path} is neither a directory nor TABLE=PATH")
+
+    start_time = time.perf_counter()
+    try:
+        results = import_files(args.db, files, args.drop_indexes, args.restart)
+    except (ValueError, OSError, sqlite3.Error) as e:
+        print("Import failed:", e)
+        print("Rerun the same command to resume from the last committed chunk.")
+        sys.exit(1)
+    for (table_name, path), result in results.items():
+        for record_number, reason in result['rejects']:
+            print(f"{path}: record {record_number} rejected: {reason}")
+        if result['more_rejects']:
+            print(f"{path}: {result['more_rejects']} more records rejected")
+    print(f"Import finished in {time.perf_counter() - start_time:.1f}s.")
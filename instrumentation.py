@@ -0,0 +1,377 @@
+import argparse
+import bisect
+import functools
+import inspect
+import io
+import json
+import os
+import random
+import signal
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import traceback
+from contextlib import contextmanager, nullcontext, redirect_stdout
+from datetime import datetime
+
+import connections
+import db_app
+from connections import read_connection
+from snapshot import take_snapshot
+
+DEFAULT_SLOW_MS = 100
+SLOW_LOG = 'slow_queries.jsonl'
+HISTOGRAM_FILE = 'query_histograms.json'
+# Upper bounds of the latency histogram buckets, in milliseconds; the last bucket is unbounded
+LATENCY_BUCKETS_MS = [0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000]
+# The progress handler runs every this many virtual machine instructions
+PROGRESS_STEPS = 10_000
+OVERHEAD_ROUNDS = 5
+CHECK_MENU_DB = 'menu_check.db'
+
+# The db_app.py functions that are instrumented: they only run SELECTs and print nothing, so a slow call
+# can be run again with tracing. Exports, writes and functions that print are left out.
+QUERY_FUNCTIONS = ['find_open_competitions', 'find_largest_amount_proposal', 'find_largest_awarded_proposals',
+                   'average_discrepancy', 'area_report', 'monthly_open_competitions', 'due_reviews',
+                   'check_reviewer_limit', 'eligible_reviewers', 'find_proposals_to_review',
+                   'find_reviewers_by_prefix', 'search_reviewers', 'search_competitions', 'search_organizations',
+                   'fetch_table_page']
+
+
+def query_functions():
+    """
+    Returns the functions in QUERY_FUNCTIONS, keyed by name.
+    """
+    return {name: getattr(db_app, name) for name in QUERY_FUNCTIONS}
+
+
+def result_rows(result):
+    if isinstance(result, (list, dict)):
+        return len(result)
+    return 0 if result is None else 1
+
+
+class Profiler:
+    """
+    Records wall time, rows returned and arguments of every call to the wrapped query functions.
+
+    Calls slower than slow_ms are appended to a JSONL slow-query log with the EXPLAIN QUERY PLAN of
+    every statement they ran. Once a function has been slow, its calls run with a trace callback
+    collecting the SQL they execute (with the parameters bound) and a progress handler counting the work
+    the VM did. Its first slow call ran without them, so it is run once more, traced, for the log entry,
+    which is why only SELECT-only functions (QUERY_FUNCTIONS) should be wrapped. Tracing costs about as much as
+    a simple indexed query, so functions that have never been slow only pay for the timer. Per-function
+    latency histograms can be read with snapshot() or written with dump() at any time.
+    """
+
+    def __init__(self, slow_ms=DEFAULT_SLOW_MS, slow_log=SLOW_LOG):
+        self.slow_ms = slow_ms
+        self.slow_log = slow_log
+        self.lock = threading.Lock()
+        self.functions = {}
+        self.traced = set()
+        self.local = threading.local()
+        self.originals = {}
+
+    def record(self, name, elapsed_ms, rows, failed):
+        with self.lock:
+            stats = self.functions.get(name)
+            if stats is None:
+                stats = self.functions[name] = {'calls': 0, 'errors': 0, 'slow': 0, 'rows': 0, 'total_ms': 0.0,
+                                                'max_ms': 0.0, 'buckets': [0] * (len(LATENCY_BUCKETS_MS) + 1)}
+            stats['calls'] += 1
+            stats['errors'] += failed
+            stats['slow'] += elapsed_ms >= self.slow_ms
+            stats['rows'] += rows
+            stats['total_ms'] += elapsed_ms
+            stats['max_ms'] = max(stats['max_ms'], elapsed_ms)
+            stats['buckets'][bisect.bisect_left(LATENCY_BUCKETS_MS, elapsed_ms)] += 1
+
+    @contextmanager
+    def tracing(self, conn):
+        """Collects the SQL a connection executes, with the parameters bound, and the VM steps it takes."""
+        trace = {'statements': [], 'progress': 0}
+
+        def count():
+            trace['progress'] += 1
+
+        conn.set_trace_callback(trace['statements'].append)
+        conn.set_progress_handler(count, PROGRESS_STEPS)
+        try:
+            yield trace
+        finally:
+            conn.set_trace_callback(None)
+            conn.set_progress_handler(None, 0)
+
+    def repeat_traced(self, function, args, kwargs, conn):
+        """
+        Runs a slow call that was not traced again with tracing, for its statements and plans.
+
+        Returns:
+            dict: The trace, or None if the repeated call failed.
+        """
+        try:
+            with self.tracing(conn) as trace:
+                function(*args, conn=conn, **kwargs)
+        except sqlite3.Error:
+            return None
+        trace['repeated'] = True
+        return trace
+
+    def log_slow_call(self, conn, name, args, kwargs, elapsed_ms, rows, trace):
+        plans = None if trace is None else []
+        for sql in trace['statements'] if trace is not None else []:
+            if not sql.lstrip().upper().startswith(('SELECT', 'WITH')):
+                continue
+            try:
+                plan = [detail for _, _, _, detail in conn.execute(f"EXPLAIN QUERY PLAN {sql}")]
+            except sqlite3.Error as e:
+                plan = [f"could not explain: {e}"]
+            plans.append({'sql': ' '.join(sql.split()), 'plan': plan})
+        entry = {
+            'timestamp': datetime.now().isoformat(timespec='milliseconds'),
+            'function': name,
+            'args': [repr(arg) for arg in args],
+            'kwargs': {key: repr(value) for key, value in kwargs.items()},
+            'elapsed_ms': round(elapsed_ms, 3),
+            'rows': rows,
+            'vm_steps': None if trace is None else trace['progress'] * PROGRESS_STEPS,
+            'statements': plans,
+            # The statements and VM steps come from running the call again, traced
+            'repeated': trace is not None and trace.get('repeated', False),
+        }
+        with self.lock, open(self.slow_log, 'a') as f:
+            f.write(json.dumps(entry) + '\n')
+
+    def call(self, function, args, kwargs, conn):
+        name = function.__name__
+        self.local.active = True
+        result = None
+        trace = None
+        failed = True
+        start = time.perf_counter()
+        try:
+            with (self.tracing(conn) if name in self.traced else nullcontext()) as trace:
+                result = function(*args, conn=conn, **kwargs)
+            failed = False
+            return result
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            try:
+                rows = result_rows(result)
+                self.record(name, elapsed_ms, rows, failed)
+                if elapsed_ms >= self.slow_ms:
+                    if trace is None and not failed:
+                        trace = self.repeat_traced(function, args, kwargs, conn)
+                    self.traced.add(name)
+                    self.log_slow_call(conn, name, args, kwargs, elapsed_ms, rows, trace)
+            finally:
+                self.local.active = False
+
+    def wrap(self, function):
+        """
+        Returns an instrumented version of a query function that takes a conn=None argument.
+        """
+        if hasattr(function, 'profiler'):
+            return function
+        # db_app's own calls pass conn by position as well as by keyword
+        conn_position = list(inspect.signature(function).parameters).index('conn')
+
+        @functools.wraps(function)
+        def wrapper(*args, conn=None, **kwargs):
+            if len(args) > conn_position:
+                args, conn = args[:conn_position], args[conn_position]
+            # Calls made from inside another instrumented call are counted as part of it
+            if getattr(self.local, 'active', False):
+                return function(*args, conn=conn, **kwargs)
+            if conn is None:
+                with read_connection() as conn:
+                    return self.call(function, args, kwargs, conn)
+            return self.call(function, args, kwargs, conn)
+
+        wrapper.profiler = self
+        return wrapper
+
+    def instrument(self):
+        """
+        Replaces the QUERY_FUNCTIONS in db_app.py with their instrumented versions, so the menu and any code
+        calling them through the module is measured.
+        """
+        for name, function in query_functions().items():
+            self.originals[name] = function
+            setattr(db_app, name, self.wrap(function))
+        return self
+
+    def uninstrument(self):
+        for name, function in self.originals.items():
+            setattr(db_app, name, function)
+        self.originals.clear()
+
+    def snapshot(self):
+        """
+        Returns the aggregate statistics of every function, with its histogram keyed by bucket bound.
+        """
+        labels = [f"<={bound}ms" for bound in LATENCY_BUCKETS_MS] + [f">{LATENCY_BUCKETS_MS[-1]}ms"]
+        with self.lock:
+            return {name: dict(stats, mean_ms=stats['total_ms'] / stats['calls'],
+                               buckets={label: count for label, count in zip(labels, stats['buckets']) if count})
+                    for name, stats in sorted(self.functions.items())}
+
+    def dump(self, path=HISTOGRAM_FILE):
+        """Writes snapshot() to a JSON file."""
+        with open(path, 'w') as f:
+            json.dump({'timestamp': datetime.now().isoformat(timespec='seconds'), 'slow_ms': self.slow_ms,
+                       'functions': self.snapshot()}, f, indent=2)
+
+    def dump_on_signal(self, path=HISTOGRAM_FILE, signum=getattr(signal, 'SIGUSR1', None)):
+        """Writes the histograms to path whenever the process receives SIGUSR1 (where available)."""
+        if signum is not None:
+            signal.signal(signum, lambda *_: self.dump(path))
+
+
+def measure_overhead(db_name, repeat, seed):
+    """
+    Times the benchmark queries without instrumentation, instrumented, and instrumented with tracing
+    (as after a slow call) on the same database. The modes are interleaved over several rounds and the
+    best mean of each is kept, so the comparison is not skewed by caches warming up or by noise.
+
+    Returns:
+        list: One dict per query with the mean latency in each mode.
+    """
+    # benchmark needs Faker (through fill_database), which the query service does not
+    from benchmark import sample_arguments, time_query
+
+    conn = sqlite3.connect(db_name)
+    arguments = sample_arguments(conn.cursor(), random.Random(seed), repeat)
+    # Nothing is logged as slow: the measurement is of the cost paid by every call
+    profiler = Profiler(slow_ms=float('inf'))
+    tracing_profiler = Profiler(slow_ms=float('inf'))
+    tracing_profiler.traced.update(arguments)
+    results = []
+    for name, args in arguments.items():
+        function = getattr(db_app, name)
+        modes = {'plain_ms': function, 'instrumented_ms': profiler.wrap(function),
+                 'traced_ms': tracing_profiler.wrap(function)}
+        result = {'query': name}
+        for _ in range(OVERHEAD_ROUNDS):
+            for mode, wrapped in modes.items():
+                result[mode] = min(result.get(mode, float('inf')), time_query(wrapped, args, conn)['mean_ms'])
+        results.append(result)
+    conn.close()
+    return results
+
+
+def menu_scripts(conn, directory):
+    """
+    Returns the inputs that take the db_app.py menu down each of its paths once, keyed by a description,
+    with values (an area, a reviewer, a proposal needing reviewers) read from the database.
+    """
+    area = conn.execute("SELECT competition_area FROM Competition LIMIT 1").fetchone()[0]
+    name = conn.execute("SELECT first_name FROM Researcher JOIN Reviewer ON reviewer_id = researcher_id LIMIT 1").fetchone()[0]
+    proposal_id = conn.execute("""
+        SELECT proposal_id FROM Proposal
+        WHERE (SELECT COUNT(*) FROM ReviewAssignment ra WHERE ra.proposal_id = Proposal.proposal_id) < 3
+        LIMIT 1
+    """).fetchone()[0]
+    reviewer = conn.execute(db_app.ELIGIBLE_REVIEWERS_QUERY, {**db_app.LIMIT_PARAMS, 'proposal_id': proposal_id}).fetchone()
+    word = area.split()[0]
+    return {
+        '1 open competitions': ['1', '03'],
+        '2 largest request': ['2', area],
+        '3 largest award': ['3', '2024-06-01'],
+        '4 average discrepancy': ['4', area],
+        '5 assign reviewers': ['5', str(proposal_id), str(reviewer[0]) if reviewer else 'done', 'done'],
+        '6 proposals to review': ['6', name],
+        '6 reviewer suggestions': ['6', name[:-1] + 'x'],
+        '7 view table': ['7', 'Proposal', 'q'],
+        '7 unknown table': ['7', 'ChangeLog'],
+        '8 assign all': ['8', ''],
+        '9 export table': ['9', 'Reviewer', os.path.join(directory, 'Reviewer.csv')],
+        '9 export query': ['9', 'open_competitions', os.path.join(directory, 'open_competitions.jsonl'), '03'],
+        '10 dashboard': ['10'],
+        '11 competition search': ['11', 'c', word, 'q'],
+        '11 organization search': ['11', 'o', 'university', 'q'],
+        '12 award report': ['12'],
+        '13 schedule meetings': ['13', '2030-01-07 2030-01-08 2030-01-09'],
+        '14 due reviews': ['14', ''],
+    }
+
+
+def check_menu(db_name, work_db=CHECK_MENU_DB):
+    """
+    Runs every menu path once, instrumented, on a copy of the database. Every call is logged as slow, so
+    the traced and repeated calls run too. The export files, slow log and histograms go to a temporary directory.
+
+    Returns:
+        dict: The traceback of every path that raised, keyed by its description.
+    """
+    take_snapshot(db_name, work_db)
+    connections.configure(work_db)
+    failures = {}
+    with tempfile.TemporaryDirectory() as directory:
+        with read_connection() as conn:
+            scripts = menu_scripts(conn, directory)
+        profiler = Profiler(0, os.path.join(directory, SLOW_LOG)).instrument()
+        try:
+            for description, inputs in scripts.items():
+                answers = iter(inputs + ['0'])
+
+                def scripted_input(prompt=''):
+                    # Pagers are stopped and the menu exited once the script runs out
+                    return next(answers, 'q' if prompt.startswith('Press Enter') else '0')
+
+                # A module global named input shadows the builtin for the menu's calls
+                db_app.input = scripted_input
+                with redirect_stdout(io.StringIO()):
+                    try:
+                        db_app.main_menu()
+                    except Exception:
+                        failures[description] = traceback.format_exc()
+                    finally:
+                        del db_app.input
+                print(f"{description:<28} {'FAIL' if description in failures else 'ok'}")
+            profiler.dump(os.path.join(directory, HISTOGRAM_FILE))
+        finally:
+            profiler.uninstrument()
+            connections.close_pool()
+    os.remove(work_db)
+    return failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the db_app.py menu with query instrumentation, or measure its overhead.")
+    parser.add_argument('--db', default=connections.DB_NAME)
+    parser.add_argument('--slow-ms', type=float, default=DEFAULT_SLOW_MS, help="Log calls at least this slow")
+    parser.add_argument('--slow-log', default=SLOW_LOG)
+    parser.add_argument('--histograms', default=HISTOGRAM_FILE, help="Written on exit and on SIGUSR1")
+    parser.add_argument('--measure-overhead', action='store_true', help="Benchmark the queries with and without instrumentation")
+    parser.add_argument('--check-menu', action='store_true',
+                        help="Run every menu path instrumented on a copy of the database, reporting any that fail")
+    parser.add_argument('--work-db', default=CHECK_MENU_DB, help="The copy --check-menu runs on")
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    if args.measure_overhead:
+        print(f"{'query':<32} {'plain':>11} {'instrumented':>20} {'traced':>20}")
+        for result in measure_overhead(args.db, args.repeat, args.seed):
+            plain = result['plain_ms']
+            print(f"{result['query']:<32} {plain:9.3f}ms" + ''.join(
+                f" {result[mode]:9.3f}ms ({(result[mode] - plain) * 1000:+5.1f}us)" for mode in ('instrumented_ms', 'traced_ms')))
+    elif args.check_menu:
+        failures = check_menu(args.db, args.work_db)
+        for description, failure in failures.items():
+            print(f"\n{description}:\n{failure}")
+        sys.exit(1 if failures else 0)
+    else:
+        connections.configure(args.db)
+        profiler = Profiler(args.slow_ms, args.slow_log).instrument()
+        profiler.dump_on_signal(args.histograms)
+        try:
+            db_app.main_menu()
+        finally:
+            profiler.dump(args.histograms)
+            connections.close_pool()
+            print(f"Query histograms written to {args.histograms}")
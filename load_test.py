@@ -0,0 +1,106 @@
+import argparse
+import json
+import random
+import sqlite3
+import threading
+import time
+from urllib.error import HTTPError
+from urllib.parse import urlencode
+from urllib.request import urlopen
+
+from benchmark import percentile, sample_arguments
+
+# Benchmark query name -> (endpoint, parameter name)
+ENDPOINT_PARAMS = {
+    'find_open_competitions': ('/open-competitions', 'month'),
+    'find_largest_amount_proposal': ('/largest-request', 'area'),
+    'find_largest_awarded_proposals': ('/largest-award', 'before'),
+    'average_discrepancy': ('/average-discrepancy', 'area'),
+    'fetch_eligible_reviewers': ('/eligible-reviewers', 'proposal_id'),
+    'find_proposals_to_review': ('/proposals-to-review', 'name'),
+    'find_reviewers_by_prefix': ('/reviewers', 'prefix'),
+    'search_reviewers': ('/reviewer-search', 'q'),
+}
+
+
+def build_request_paths(db_name, n_requests, seed):
+    """
+    Builds a shuffled mix of request paths over all endpoints, with arguments sampled from the database.
+    """
+    conn = sqlite3.connect(db_name)
+    arguments = sample_arguments(conn.cursor(), random.Random(seed), n_requests // len(ENDPOINT_PARAMS) + 1)
+    conn.close()
+    paths = [f"{endpoint}?{urlencode({param: args[0]})}"
+             for name, (endpoint, param) in ENDPOINT_PARAMS.items() for args in arguments[name]]
+    random.Random(seed).shuffle(paths)
+    return paths[:n_requests]
+
+
+def run_level(base_url, paths, clients):
+    """
+    Sends all paths to the server from the given number of concurrent clients.
+
+    Returns:
+        dict: Throughput, latency percentiles and error count for this concurrency level.
+    """
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    next_path = iter(paths)
+
+    def client():
+        while True:
+            with lock:
+                path = next(next_path, None)
+            if path is None:
+                return
+            start = time.perf_counter()
+            try:
+                with urlopen(base_url + path) as response:
+                    response.read()
+                ok = True
+            except (HTTPError, OSError):
+                ok = False
+            elapsed = time.perf_counter() - start
+            with lock:
+                (latencies if ok else errors).append(elapsed)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    total = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        'clients': clients,
+        'requests': len(latencies) + len(errors),
+        'errors': len(errors),
+        'requests_per_sec': (len(latencies) + len(errors)) / total if total else 0.0,
+        'p50_ms': percentile(latencies, 0.50) * 1000 if latencies else None,
+        'p99_ms': percentile(latencies, 0.99) * 1000 if latencies else None,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure query_server.py throughput at several concurrency levels.")
+    parser.add_argument('--url', default='http://127.0.0.1:8080')
+    parser.add_argument('--db', default='council.db', help="Database to sample request arguments from")
+    parser.add_argument('--requests', type=int, default=2000, help="Requests per concurrency level")
+    parser.add_argument('--clients', type=int, nargs='+', default=[1, 8, 64])
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    paths = build_request_paths(args.db, args.requests, args.seed)
+    results = []
+    for clients in args.clients:
+        result = run_level(args.url, paths, clients)
+        results.append(result)
+        print(f"{clients:>4} clients: {result['requests_per_sec']:8.1f} req/s  "
+              f"p50 {result['p50_ms'] or 0:8.2f}ms  p99 {result['p99_ms'] or 0:8.2f}ms  errors {result['errors']}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
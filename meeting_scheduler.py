@@ -0,0 +1,574 @@
+import argparse
+import heapq
+import os
+import random
+import sqlite3
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+
+from connections import begin_immediate
+from create_database import create_database, create_derived_triggers, drop_assignment_limit_triggers, drop_derived_triggers
+
+# Seconds the tabu search may spend removing meetings after DSatur
+IMPROVEMENT_SECONDS = 10
+# Schedules computed before giving up when the assignments or meetings change during each computation
+SCHEDULE_ATTEMPTS = 3
+
+# The reviewers of every competition, from its review assignments. Assignments without a competition_id
+# take it from their proposal.
+COMPETITION_REVIEWERS_QUERY = """
+    SELECT DISTINCT COALESCE(ra.competition_id, p.competition_id) AS competition_id, ra.reviewer_id
+    FROM ReviewAssignment ra
+    LEFT JOIN Proposal p ON p.proposal_id = ra.proposal_id
+    WHERE COALESCE(ra.competition_id, p.competition_id) IS NOT NULL
+"""
+
+# The dates every reviewer already has a meeting on, for competitions that are not being scheduled
+BOOKINGS_QUERY = """
+    SELECT DISTINCT mp.reviewer_id, mp.competition_id, m.meeting_date
+    FROM MeetingParticipation mp
+    JOIN Meeting m ON m.meeting_id = mp.meeting_id
+    WHERE m.meeting_date IS NOT NULL
+"""
+
+# A reviewer in two competitions of the same meeting, or in two meetings on the same date
+DOUBLE_BOOKINGS_QUERY = """
+    SELECT COUNT(*) FROM (
+        SELECT reviewer_id FROM MeetingParticipation
+        GROUP BY meeting_id, reviewer_id
+        HAVING COUNT(DISTINCT competition_id) > 1
+        UNION ALL
+        SELECT mp.reviewer_id FROM MeetingParticipation mp
+        JOIN Meeting m ON m.meeting_id = mp.meeting_id
+        WHERE m.meeting_date IS NOT NULL
+        GROUP BY mp.reviewer_id, m.meeting_date
+        HAVING COUNT(DISTINCT mp.meeting_id) > 1
+    )
+"""
+
+
+def load_competition_reviewers(cursor, competition_status=None):
+    """
+    Loads the reviewers assigned to each competition.
+
+    Parameters:
+        cursor (sqlite3.Cursor): A cursor on the council database.
+        competition_status (str): Only schedule competitions with this status ('Open' or 'Closed'), if given.
+
+    Returns:
+        dict: Reviewer ID sets keyed by competition ID.
+    """
+    query = COMPETITION_REVIEWERS_QUERY
+    params = ()
+    if competition_status is not None:
+        query += " AND COALESCE(ra.competition_id, p.competition_id) IN (SELECT competition_id FROM Competition WHERE competition_status = ?)"
+        params = (competition_status,)
+    competition_reviewers = defaultdict(set)
+    for competition_id, reviewer_id in cursor.execute(query, params):
+        competition_reviewers[competition_id].add(reviewer_id)
+    return dict(competition_reviewers)
+
+
+def load_blocked_dates(cursor, competition_reviewers, dates):
+    """
+    Finds the meeting dates each competition cannot use because one of its reviewers already meets on that
+    date for a competition that is not being scheduled.
+
+    Parameters:
+        dates (list): The available meeting dates, in slot order.
+
+    Returns:
+        dict: Sets of date indexes keyed by competition ID, for the competitions with any.
+    """
+    date_index = {meeting_date: index for index, meeting_date in enumerate(dates)}
+    busy = defaultdict(set)
+    for reviewer_id, competition_id, meeting_date in cursor.execute(BOOKINGS_QUERY):
+        if competition_id not in competition_reviewers and meeting_date in date_index:
+            busy[reviewer_id].add(date_index[meeting_date])
+    blocked = {}
+    for competition_id, reviewers in competition_reviewers.items():
+        slots = set().union(*(busy[reviewer_id] for reviewer_id in reviewers if reviewer_id in busy))
+        if slots:
+            blocked[competition_id] = slots
+    return blocked
+
+
+def load_schedule_inputs(cursor, competition_status, dates):
+    """
+    Loads everything a schedule is computed from.
+
+    Returns:
+        tuple: (competition_reviewers, blocked) from load_competition_reviewers() and load_blocked_dates().
+    """
+    competition_reviewers = load_competition_reviewers(cursor, competition_status)
+    return competition_reviewers, load_blocked_dates(cursor, competition_reviewers, dates)
+
+
+def build_conflict_graph(competition_reviewers):
+    """
+    Builds the conflict graph: two competitions are adjacent if they share a reviewer, so they cannot
+    meet on the same date.
+
+    Returns:
+        tuple: (graph, lower_bound) where graph maps each competition ID to the set of adjacent
+        competitions, and lower_bound is the largest number of competitions of one reviewer. A reviewer's
+        competitions are pairwise adjacent, so no schedule has fewer meetings than that.
+    """
+    reviewer_competitions = defaultdict(list)
+    for competition_id, reviewers in competition_reviewers.items():
+        for reviewer_id in reviewers:
+            reviewer_competitions[reviewer_id].append(competition_id)
+    graph = {competition_id: set() for competition_id in competition_reviewers}
+    for competitions in reviewer_competitions.values():
+        if len(competitions) > 1:
+            for competition_id in competitions:
+                graph[competition_id].update(competitions)
+    for competition_id, neighbors in graph.items():
+        neighbors.discard(competition_id)
+    lower_bound = max((len(competitions) for competitions in reviewer_competitions.values()), default=0)
+    return graph, lower_bound
+
+
+def first_free_slot(taken, blocked, sizes, max_competitions):
+    """
+    Returns the earliest slot not used by a neighbor, not blocked, and not already holding max_competitions.
+    """
+    slot = 0
+    while slot in taken or slot in blocked or (max_competitions and slot < len(sizes) and sizes[slot] >= max_competitions):
+        slot += 1
+    return slot
+
+
+def add_to_slot(sizes, slot):
+    if slot >= len(sizes):
+        sizes.extend([0] * (slot + 1 - len(sizes)))
+    sizes[slot] += 1
+
+
+def color_dsatur(graph, blocked=None, max_competitions=None):
+    """
+    Colors the conflict graph with the DSatur heuristic: the next competition to place is always the
+    one whose neighbors already use the most different slots (ties broken by degree), and it goes to the
+    earliest slot it can use. A heap with lazy deletion keeps each step O(log n), so the whole coloring
+    runs in O((competitions + conflicts) log competitions).
+
+    Parameters:
+        graph (dict): The conflict graph from build_conflict_graph().
+        blocked (dict): Slots each competition cannot use, from load_blocked_dates().
+        max_competitions (int): The most competitions one meeting can hold, or None for no limit.
+
+    Returns:
+        dict: The slot (meeting date index) of every competition.
+    """
+    blocked = blocked or {}
+    slots = {}
+    sizes = []
+    saturation = {competition_id: set() for competition_id in graph}
+    heap = [(0, -len(neighbors), competition_id) for competition_id, neighbors in graph.items()]
+    heapq.heapify(heap)
+    while heap:
+        negative_saturation, negative_degree, competition_id = heapq.heappop(heap)
+        # Entries are not removed when a competition's saturation grows; skip the outdated ones
+        if competition_id in slots or -negative_saturation != len(saturation[competition_id]):
+            continue
+        slot = first_free_slot(saturation[competition_id], blocked.get(competition_id, ()), sizes, max_competitions)
+        slots[competition_id] = slot
+        add_to_slot(sizes, slot)
+        for neighbor in graph[competition_id]:
+            if neighbor not in slots and slot not in saturation[neighbor]:
+                saturation[neighbor].add(slot)
+                heapq.heappush(heap, (-len(saturation[neighbor]), -len(graph[neighbor]), neighbor))
+    return slots
+
+
+def schedule_cost(slots):
+    """Meetings used, then the last slot used, so fewer and earlier meetings are preferred."""
+    return (len(set(slots.values())), max(slots.values(), default=-1))
+
+
+def tabu_search(graph, slots, k, blocked, max_competitions, deadline, rng):
+    """
+    Looks for a schedule using only slots 0 to k - 1 with the Tabucol local search. The competitions in
+    later slots are moved to random earlier ones, then the search repeatedly makes the move of one
+    conflicting competition to another slot that removes the most conflicts (or adds the fewest). Moving
+    a competition back to a slot it just left is forbidden for a while, unless it gives the fewest
+    conflicts seen so far, so the search does not cycle.
+
+    Parameters:
+        deadline (float): time.perf_counter() value at which to give up.
+        rng (random.Random): Source of the random choices.
+
+    Returns:
+        dict: A conflict-free schedule in k slots, or None if none was found before the deadline.
+    """
+    allowed = {competition_id: [slot for slot in range(k) if slot not in blocked.get(competition_id, ())]
+               for competition_id in graph}
+    sizes = [0] * k
+    colors = {competition_id: slot for competition_id, slot in slots.items() if slot < k}
+    for slot in colors.values():
+        sizes[slot] += 1
+    for competition_id in graph:
+        if competition_id not in colors:
+            options = [slot for slot in allowed[competition_id] if not max_competitions or sizes[slot] < max_competitions]
+            if not options:
+                return None
+            colors[competition_id] = rng.choice(options)
+            sizes[colors[competition_id]] += 1
+
+    # conflicts[c][s] is the number of neighbors of competition c in slot s
+    conflicts = {competition_id: [0] * k for competition_id in graph}
+    for competition_id, neighbors in graph.items():
+        counts = conflicts[competition_id]
+        for neighbor in neighbors:
+            counts[colors[neighbor]] += 1
+    conflicting = {competition_id for competition_id in graph if conflicts[competition_id][colors[competition_id]]}
+    total = sum(conflicts[competition_id][colors[competition_id]] for competition_id in conflicting) // 2
+    best_total = total
+    tabu = {}
+    iteration = 0
+    while total:
+        if iteration % 100 == 0 and time.perf_counter() > deadline:
+            return None
+        iteration += 1
+        best_delta, moves = None, []
+        for competition_id in conflicting:
+            counts = conflicts[competition_id]
+            current = counts[colors[competition_id]]
+            for slot in allowed[competition_id]:
+                if slot == colors[competition_id] or (max_competitions and sizes[slot] >= max_competitions):
+                    continue
+                delta = counts[slot] - current
+                if tabu.get((competition_id, slot), 0) > iteration and total + delta >= best_total:
+                    continue
+                if best_delta is None or delta < best_delta:
+                    best_delta, moves = delta, [(competition_id, slot)]
+                elif delta == best_delta:
+                    moves.append((competition_id, slot))
+        if not moves:
+            continue
+        competition_id, slot = rng.choice(moves)
+        old_slot = colors[competition_id]
+        colors[competition_id] = slot
+        sizes[old_slot] -= 1
+        sizes[slot] += 1
+        tabu[(competition_id, old_slot)] = iteration + int(0.6 * len(conflicting)) + rng.randrange(10)
+        total += best_delta
+        best_total = min(best_total, total)
+        for neighbor in graph[competition_id]:
+            counts = conflicts[neighbor]
+            counts[old_slot] -= 1
+            counts[slot] += 1
+            if counts[colors[neighbor]]:
+                conflicting.add(neighbor)
+            else:
+                conflicting.discard(neighbor)
+        if conflicts[competition_id][slot]:
+            conflicting.add(competition_id)
+        else:
+            conflicting.discard(competition_id)
+    return colors
+
+
+def improve_coloring(graph, slots, lower_bound, blocked=None, max_competitions=None, time_limit=IMPROVEMENT_SECONDS, seed=0):
+    """
+    Drops the last meeting date of the schedule for as long as tabu_search() finds a schedule without it,
+    within time_limit seconds in all, or until the number of meetings reaches the lower bound.
+
+    Returns:
+        dict: The best schedule found.
+    """
+    blocked = blocked or {}
+    rng = random.Random(seed)
+    deadline = time.perf_counter() + time_limit
+    best = slots
+    while schedule_cost(best)[1] + 1 > lower_bound:
+        candidate = tabu_search(graph, best, schedule_cost(best)[1], blocked, max_competitions, deadline, rng)
+        if candidate is None:
+            break
+        best = candidate
+    return best
+
+
+def compute_schedule(competition_reviewers, dates, blocked=None, max_competitions=None, time_limit=IMPROVEMENT_SECONDS, seed=0):
+    """
+    Assigns every competition to a meeting date so that no reviewer has two meetings on one date, using
+    as few meetings as the heuristics can find.
+
+    Parameters:
+        competition_reviewers (dict): Reviewer ID sets keyed by competition ID.
+        dates (list): The available meeting dates (YYYY-MM-DD), earliest first.
+        blocked (dict): Date indexes each competition cannot use, from load_blocked_dates().
+        max_competitions (int): The most competitions one meeting can hold, or None for no limit.
+        time_limit (float): Seconds the tabu search may spend removing meetings after DSatur.
+        seed (int): Seed for the random choices of the tabu search.
+
+    Returns:
+        tuple: (meetings, stats) where meetings maps each date used to the sorted list of its competition
+        IDs, and stats holds the graph size, the lower bound, the meetings found by DSatur and after the
+        improvement, and the time of each step in seconds.
+
+    Raises:
+        ValueError: If the competitions need more meeting dates than are available.
+    """
+    stats = {'competitions': len(competition_reviewers),
+             'reviewers': len(set().union(*competition_reviewers.values())) if competition_reviewers else 0}
+    start = time.perf_counter()
+    graph, lower_bound = build_conflict_graph(competition_reviewers)
+    stats['conflicts'] = sum(len(neighbors) for neighbors in graph.values()) // 2
+    stats['lower_bound'] = lower_bound
+    stats['graph_s'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    slots = color_dsatur(graph, blocked, max_competitions)
+    stats['dsatur_meetings'] = schedule_cost(slots)[0]
+    stats['dsatur_s'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    slots = improve_coloring(graph, slots, lower_bound, blocked, max_competitions, time_limit, seed)
+    stats['meetings'], last_slot = schedule_cost(slots)
+    stats['improve_s'] = time.perf_counter() - start
+
+    if last_slot >= len(dates):
+        raise ValueError(f"The competitions need {last_slot + 1} meeting dates but only {len(dates)} are available")
+    meetings = defaultdict(list)
+    for competition_id, slot in slots.items():
+        meetings[dates[slot]].append(competition_id)
+    return {meeting_date: sorted(meetings[meeting_date]) for meeting_date in sorted(meetings)}, stats
+
+
+def meeting_dates(dates):
+    """
+    Checks and sorts a list of YYYY-MM-DD dates, dropping repeats.
+
+    Raises:
+        ValueError: If a date is not in YYYY-MM-DD format.
+    """
+    try:
+        return sorted({date.fromisoformat(meeting_date).isoformat() for meeting_date in dates})
+    except (TypeError, ValueError):
+        raise ValueError("Meeting dates must be in YYYY-MM-DD format") from None
+
+
+def weekdays_from(first_date, count):
+    """Returns count consecutive weekdays starting at first_date, as YYYY-MM-DD strings."""
+    day = date.fromisoformat(first_date)
+    dates = []
+    while len(dates) < count:
+        if day.weekday() < 5:
+            dates.append(day.isoformat())
+        day += timedelta(days=1)
+    return dates
+
+
+def write_schedule(cursor, meetings, competition_reviewers):
+    """
+    Replaces the meetings of the scheduled competitions: their old participations are deleted, along
+    with meetings left without any, then one Meeting per date and its MeetingParticipation rows are
+    inserted in bulk.
+
+    Returns:
+        list: (meeting_id, meeting_date, competition IDs) for every new meeting.
+    """
+    cursor.execute("CREATE TEMP TABLE IF NOT EXISTS ScheduledCompetition (competition_id INTEGER PRIMARY KEY)")
+    cursor.execute("DELETE FROM temp.ScheduledCompetition")
+    cursor.executemany("INSERT INTO temp.ScheduledCompetition VALUES (?)", ((competition_id,) for competition_id in competition_reviewers))
+    replaced = [row[0] for row in cursor.execute("""
+        SELECT DISTINCT meeting_id FROM MeetingParticipation
+        WHERE competition_id IN (SELECT competition_id FROM temp.ScheduledCompetition)
+    """).fetchall()]
+    cursor.execute("DELETE FROM MeetingParticipation WHERE competition_id IN (SELECT competition_id FROM temp.ScheduledCompetition)")
+    cursor.executemany("""
+        DELETE FROM Meeting
+        WHERE meeting_id = ? AND NOT EXISTS (SELECT 1 FROM MeetingParticipation mp WHERE mp.meeting_id = Meeting.meeting_id)
+    """, ((meeting_id,) for meeting_id in replaced))
+    cursor.execute("DROP TABLE temp.ScheduledCompetition")
+
+    written = []
+    for meeting_date, competitions in meetings.items():
+        cursor.execute("INSERT INTO Meeting (meeting_date) VALUES (?)", (meeting_date,))
+        written.append((cursor.lastrowid, meeting_date, competitions))
+    cursor.executemany(
+        "INSERT INTO MeetingParticipation (meeting_id, competition_id, reviewer_id) VALUES (?, ?, ?)",
+        ((meeting_id, competition_id, reviewer_id)
+         for meeting_id, _, competitions in written
+         for competition_id in competitions
+         for reviewer_id in sorted(competition_reviewers[competition_id]))
+    )
+    return written
+
+
+def schedule_meetings(conn, dates, competition_status=None, max_competitions=None, dry_run=False,
+                      time_limit=IMPROVEMENT_SECONDS, seed=0):
+    """
+    Schedules a meeting for every competition with review assignments and writes the schedule in one transaction.
+
+    A meeting is one date on which the panels of all its competitions sit at the same time, so a reviewer
+    can take part in one competition per meeting and in one meeting per date. Meetings that other
+    competitions already have on the available dates are respected.
+
+    The schedule is computed from a read snapshot, so other writers are not locked out during the search,
+    which can take time_limit seconds. The write transaction is then started with BEGIN IMMEDIATE, and
+    the inputs are loaded again in it. If they changed during the computation, the schedule is discarded
+    and computed again, up to SCHEDULE_ATTEMPTS times.
+
+    Parameters:
+        conn (sqlite3.Connection): A connection to the council database, with no open transaction.
+        dates (list): The available meeting dates in YYYY-MM-DD format.
+        competition_status (str): Only schedule competitions with this status, if given.
+        max_competitions (int): The most competitions one meeting can hold, or None for no limit.
+        dry_run (bool): Compute the schedule without writing it.
+        time_limit (float): Seconds the tabu search may spend removing meetings after DSatur.
+        seed (int): Seed for the tabu search.
+
+    Returns:
+        tuple: (meetings, stats) where meetings is a list of (meeting_id, meeting_date, competition IDs),
+        with meeting_id None in a dry run, and stats is from compute_schedule() plus load_s, write_s (the
+        time the write lock was held, including the check of the inputs) and attempts.
+
+    Raises:
+        ValueError: If a date is malformed, there are not enough dates for the competitions, or the inputs
+            changed during every attempt.
+    """
+    dates = meeting_dates(dates)
+    cursor = conn.cursor()
+    try:
+        for attempt in range(1, SCHEDULE_ATTEMPTS + 1):
+            start = time.perf_counter()
+            conn.execute("BEGIN")
+            inputs = load_schedule_inputs(cursor, competition_status, dates)
+            conn.commit()
+            load_s = time.perf_counter() - start
+            competition_reviewers, blocked = inputs
+            meetings, stats = compute_schedule(competition_reviewers, dates, blocked, max_competitions, time_limit, seed)
+            stats['load_s'] = load_s
+            stats['attempts'] = attempt
+            start = time.perf_counter()
+            if dry_run:
+                written = [(None, meeting_date, competitions) for meeting_date, competitions in meetings.items()]
+                break
+            begin_immediate(conn)
+            if load_schedule_inputs(cursor, competition_status, dates) == inputs:
+                written = write_schedule(cursor, meetings, competition_reviewers)
+                conn.commit()
+                break
+            # Assignments or meetings changed while the schedule was computed
+            conn.rollback()
+        else:
+            raise ValueError(f"The review assignments or meetings changed during each of {SCHEDULE_ATTEMPTS} "
+                             "attempts to schedule them; try again later")
+        stats['write_s'] = time.perf_counter() - start
+    except (sqlite3.Error, ValueError):
+        if conn.in_transaction:
+            conn.rollback()
+        raise
+    return written, stats
+
+
+def double_bookings(cursor):
+    """
+    Counts reviewers who are in two competitions of one meeting or in two meetings on one date.
+    """
+    return cursor.execute(DOUBLE_BOOKINGS_QUERY).fetchone()[0]
+
+
+def build_benchmark_database(db_name, n_competitions, n_reviewers, per_reviewer, areas, seed):
+    """
+    Creates a database holding only synthetic review assignments: every reviewer reviews per_reviewer
+    competitions of one area, the way panels are usually drawn.
+    """
+    create_database(db_name)
+    conn = sqlite3.connect(db_name)
+    cursor = conn.cursor()
+    cursor.execute("PRAGMA journal_mode = WAL")
+    # The synthetic reviewers review more than the per-reviewer limit allows
+    drop_assignment_limit_triggers(cursor)
+    drop_derived_triggers(cursor)
+    for table_name in ('MeetingParticipation', 'Meeting', 'ReviewAssignment'):
+        cursor.execute(f"DELETE FROM {table_name}")
+    rng = random.Random(seed)
+    by_area = [list(range(area + 1, n_competitions + 1, areas)) for area in range(areas)]
+    cursor.executemany(
+        "INSERT INTO ReviewAssignment (competition_id, reviewer_id) VALUES (?, ?)",
+        ((competition_id, reviewer_id)
+         for reviewer_id in range(1, n_reviewers + 1)
+         for competition_id in rng.sample(by_area[reviewer_id % areas], min(per_reviewer, len(by_area[reviewer_id % areas]))))
+    )
+    create_derived_triggers(cursor)
+    conn.commit()
+    conn.close()
+
+
+def run_schedule_benchmark(db_name, n_competitions, n_reviewers, per_reviewer, areas, seed, time_limit=IMPROVEMENT_SECONDS):
+    """
+    Schedules the synthetic benchmark database end to end and checks the result for double bookings.
+
+    Returns:
+        dict: The statistics from schedule_meetings(), the total time and the double bookings found.
+    """
+    build_benchmark_database(db_name, n_competitions, n_reviewers, per_reviewer, areas, seed)
+    conn = sqlite3.connect(db_name)
+    start = time.perf_counter()
+    meetings, stats = schedule_meetings(conn, weekdays_from(date.today().isoformat(), n_competitions), time_limit=time_limit, seed=seed)
+    stats['total_s'] = time.perf_counter() - start
+    stats['participations'] = conn.execute("SELECT COUNT(*) FROM MeetingParticipation").fetchone()[0]
+    stats['double_bookings'] = double_bookings(conn.cursor())
+    conn.close()
+    return stats
+
+
+def print_stats(stats):
+    print(f"{stats['competitions']} competitions, {stats['reviewers']} reviewers, {stats['conflicts']} conflicting pairs")
+    print(f"Meetings: {stats['meetings']} (DSatur {stats['dsatur_meetings']}, lower bound {stats['lower_bound']})")
+    print(f"Load {stats['load_s']:.2f}s, graph {stats['graph_s']:.2f}s, DSatur {stats['dsatur_s']:.2f}s, "
+          f"improvement {stats['improve_s']:.2f}s, write {stats['write_s']:.2f}s"
+          + (f" (attempt {stats['attempts']})" if stats['attempts'] > 1 else ""))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Schedule review meetings so no reviewer is double-booked, or benchmark the scheduler.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    schedule = subparsers.add_parser('schedule', help="Schedule a meeting for every competition with review assignments")
+    schedule.add_argument('--db', default='council.db')
+    schedule.add_argument('--dates', nargs='+', help="Available meeting dates (YYYY-MM-DD)")
+    schedule.add_argument('--first-date', help="Use consecutive weekdays from this date (YYYY-MM-DD) instead of --dates")
+    schedule.add_argument('--status', choices=['Open', 'Closed'], help="Only schedule competitions with this status")
+    schedule.add_argument('--max-competitions', type=int, help="Most competitions one meeting can hold")
+    schedule.add_argument('--time-limit', type=float, default=IMPROVEMENT_SECONDS, help="Seconds to spend removing meetings after DSatur")
+    schedule.add_argument('--dry-run', action='store_true', help="Compute the schedule without writing it")
+    bench = subparsers.add_parser('benchmark', help="Schedule a synthetic database and time every step")
+    bench.add_argument('--work-db', default='meeting_benchmark.db')
+    bench.add_argument('--competitions', type=int, default=10_000)
+    bench.add_argument('--reviewers', type=int, default=50_000)
+    bench.add_argument('--per-reviewer', type=int, default=3, help="Competitions each reviewer reviews")
+    bench.add_argument('--areas', type=int, default=10, help="Reviewers only review competitions of one area")
+    bench.add_argument('--time-limit', type=float, default=IMPROVEMENT_SECONDS)
+    bench.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    if args.command == 'schedule':
+        if not args.dates and not args.first_date:
+            parser.error("give the available dates with --dates or --first-date")
+        conn = sqlite3.connect(args.db)
+        # Enough weekdays for the worst case of one meeting per competition
+        n_competitions = conn.execute("SELECT COUNT(*) FROM Competition").fetchone()[0]
+        dates = args.dates or weekdays_from(args.first_date, max(n_competitions, 1))
+        try:
+            meetings, stats = schedule_meetings(conn, dates, args.status, args.max_competitions, args.dry_run, args.time_limit)
+        except ValueError as e:
+            raise SystemExit(e)
+        for meeting_id, meeting_date, competitions in meetings:
+            print(f"{meeting_date}: meeting {meeting_id if meeting_id is not None else '-'}, {len(competitions)} competitions")
+        print_stats(stats)
+        if not args.dry_run:
+            print(f"Double-booked reviewers: {double_bookings(conn.cursor())}")
+        conn.close()
+    else:
+        stats = run_schedule_benchmark(args.work_db, args.competitions, args.reviewers, args.per_reviewer, args.areas,
+                                       args.seed, args.time_limit)
+        print_stats(stats)
+        print(f"{stats['participations']} participations written, {stats['double_bookings']} double bookings, "
+              f"{stats['total_s']:.2f}s in total")
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(args.work_db + suffix):
+                os.remove(args.work_db + suffix)
@@ -0,0 +1,133 @@
+import sys
+import threading
+from collections import OrderedDict
+
+from connections import read_connection
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+# Cacheable query functions and the tables their results depend on. fetch_eligible_reviewers()
+# is left out because it prints its result for the interactive menu, and due_reviews() because its
+# result also depends on today's date, which the table versions do not track.
+QUERY_TABLES = {
+    'find_open_competitions': ('Competition', 'Proposal'),
+    'find_largest_amount_proposal': ('Competition', 'Proposal'),
+    'find_largest_awarded_proposals': ('Proposal',),
+    'average_discrepancy': ('Competition', 'Proposal'),
+    'find_proposals_to_review': ('Competition', 'Proposal', 'ReviewAssignment', 'Reviewer', 'Researcher'),
+    'area_report': ('Competition', 'Proposal'),
+    'monthly_open_competitions': ('Competition', 'Proposal'),
+    'find_reviewers_by_prefix': ('Researcher', 'Reviewer'),
+    'search_reviewers': ('Researcher', 'Reviewer'),
+    'search_competitions': ('Competition',),
+    'search_organizations': ('Organization',),
+}
+
+
+def result_size(result):
+    """
+    Estimates the memory held by a query result (a list of row tuples or a scalar).
+    """
+    if not isinstance(result, list):
+        return sys.getsizeof(result)
+    return sys.getsizeof(result) + sum(sys.getsizeof(row) + sum(sys.getsizeof(value) for value in row) for row in result)
+
+
+class QueryCache:
+    """
+    LRU cache of query results keyed by function and arguments, bounded by an estimate of their memory use.
+
+    Every entry remembers the versions of the tables it was computed from (see TableVersion in
+    create_database.py). A lookup reads the current versions first and discards the entry if any of
+    its tables changed since, so a result is never served after a write to a table it depends on.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    def remove(self, key):
+        _, _, size = self.entries.pop(key)
+        self.bytes -= size
+
+    def call(self, function, *args, conn=None, **kwargs):
+        """
+        Returns the result of function(*args, **kwargs), from the cache if it is still current.
+
+        Results read inside an open transaction are neither cached nor served from the cache: they may
+        include uncommitted writes, whose version bumps a rollback would undo.
+
+        Parameters:
+            function (callable): One of the query functions listed in QUERY_TABLES.
+            args, kwargs: The arguments of the query.
+            conn (sqlite3.Connection): The connection to run the query on; a pooled reader if None.
+        """
+        tables = QUERY_TABLES[function.__name__]
+        key = (function.__name__, args, tuple(sorted(kwargs.items())))
+        with read_connection(conn) as conn:
+            if conn.in_transaction:
+                return function(*args, conn=conn, **kwargs)
+            current = dict(conn.execute("SELECT table_name, version FROM TableVersion").fetchall())
+            versions = tuple(current.get(table_name) for table_name in tables)
+            with self.lock:
+                entry = self.entries.get(key)
+                if entry is not None:
+                    if entry[0] == versions:
+                        self.entries.move_to_end(key)
+                        self.hits += 1
+                        return entry[1]
+                    self.remove(key)
+                    self.invalidations += 1
+                self.misses += 1
+            # The versions were read before the query runs, so a concurrent write can only make the
+            # stored versions too old (an extra miss later), never the result
+            result = function(*args, conn=conn, **kwargs)
+
+        size = result_size(result)
+        with self.lock:
+            if size > self.max_bytes:
+                return result
+            if key in self.entries:
+                self.remove(key)
+            self.entries[key] = (versions, result, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                self.remove(next(iter(self.entries)))
+                self.evictions += 1
+        return result
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        """
+        Returns hit/miss/eviction/invalidation counts and the current size of the cache.
+        """
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'entries': len(self.entries),
+                'bytes': self.bytes,
+                'max_bytes': self.max_bytes,
+            }
+
+
+def cached(cache, function):
+    """
+    Wraps a db_app query function so calls go through the cache.
+    """
+    def wrapper(*args, conn=None, **kwargs):
+        return cache.call(function, *args, conn=conn, **kwargs)
+    wrapper.__name__ = function.__name__
+    wrapper.__doc__ = function.__doc__
+    return wrapper
@@ -0,0 +1,234 @@
+import argparse
+import json
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import connections
+import db_app
+from eligibility_index import EligibilityIndex
+from instrumentation import SLOW_LOG, Profiler
+from query_cache import QUERY_TABLES, QueryCache
+from snapshot import ReadReplica
+
+DEFAULT_WORKERS = 16
+
+
+# path -> the db_app command served there, whose parameters, converters and result format the endpoint uses
+ENDPOINT_COMMANDS = {
+    '/open-competitions': 'open-competitions',
+    '/largest-request': 'largest-request',
+    '/largest-award': 'largest-award',
+    '/average-discrepancy': 'average-discrepancy',
+    '/eligible-reviewers': 'eligible-reviewers',
+    '/proposals-to-review': 'proposals-to-review',
+    '/reviewers': 'reviewers',
+    '/reviewer-search': 'reviewer-search',
+    '/search-competitions': 'search-competitions',
+    '/search-organizations': 'search-organizations',
+    '/area-report': 'area-report',
+    '/open-competitions-by-month': 'monthly-open-competitions',
+    '/due-reviews': 'due-reviews',
+}
+POST_ENDPOINT_COMMANDS = {
+    '/assign-reviewers': 'assign-all',
+}
+
+# path -> (function, [(parameter, converter[, default])], result formatter)
+ENDPOINTS = {path: db_app.COMMANDS[name][:3] for path, name in ENDPOINT_COMMANDS.items()}
+
+
+class RequestStats:
+    """
+    Thread-safe per-endpoint request counts and timings.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.endpoints = {}
+
+    def record(self, path, status, seconds):
+        with self.lock:
+            stats = self.endpoints.setdefault(path, {'requests': 0, 'errors': 0, 'total_ms': 0.0, 'max_ms': 0.0})
+            stats['requests'] += 1
+            stats['errors'] += status >= 400
+            stats['total_ms'] += seconds * 1000
+            stats['max_ms'] = max(stats['max_ms'], seconds * 1000)
+
+    def snapshot(self):
+        with self.lock:
+            return {path: dict(stats, mean_ms=stats['total_ms'] / stats['requests'])
+                    for path, stats in self.endpoints.items()}
+
+
+class QueryRequestHandler(BaseHTTPRequestHandler):
+    # HTTP/1.0 closes the connection after each response, so idle keep-alive
+    # clients never hold on to a worker
+    protocol_version = 'HTTP/1.0'
+
+    def send_json(self, status, body, started):
+        payload = json.dumps(body).encode()
+        elapsed = time.perf_counter() - started
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.send_header('Server-Timing', f"query;dur={elapsed * 1000:.3f}")
+        self.end_headers()
+        self.wfile.write(payload)
+        self.server.stats.record(urlparse(self.path).path, status, elapsed)
+
+    @contextmanager
+    def read_connection(self):
+        # Queries use the in-memory replica when there is one, otherwise a pooled reader
+        if self.server.replica is not None:
+            with self.server.replica.reader() as conn:
+                yield conn
+        else:
+            with connections.read_connection() as conn:
+                yield conn
+
+    def do_GET(self):
+        started = time.perf_counter()
+        url = urlparse(self.path)
+        if url.path == '/stats':
+            stats = {'endpoints': self.server.stats.snapshot()}
+            if self.server.cache is not None:
+                stats['cache'] = self.server.cache.stats()
+            if self.server.replica is not None:
+                stats['replica'] = self.server.replica.stats()
+            if self.server.profiler is not None:
+                stats['queries'] = self.server.profiler.snapshot()
+            self.send_json(200, stats, started)
+            return
+        if url.path not in ENDPOINTS:
+            self.send_json(404, {'error': f"Unknown endpoint {url.path}", 'endpoints': sorted(ENDPOINTS)}, started)
+            return
+
+        function, params, formatter = ENDPOINTS[url.path]
+        try:
+            args = db_app.convert_args(params, {name: values[0] for name, values in parse_qs(url.query).items()})
+        except ValueError as e:
+            self.send_json(400, {'error': str(e)}, started)
+            return
+
+        try:
+            with self.read_connection() as conn:
+                if self.server.cache is not None and function.__name__ in QUERY_TABLES:
+                    result = self.server.cache.call(function, *args, conn=conn)
+                else:
+                    result = function(*args, conn=conn)
+            self.send_json(200, {'results': formatter(result)}, started)
+        except (ValueError, OverflowError) as e:
+            # Arguments only the query itself can reject, such as a date range past the year 9999
+            self.send_json(400, {'error': str(e)}, started)
+        except sqlite3.Error as e:
+            self.send_json(500, {'error': str(e)}, started)
+
+    def do_POST(self):
+        started = time.perf_counter()
+        url = urlparse(self.path)
+        if url.path not in POST_ENDPOINT_COMMANDS:
+            self.send_json(404, {'error': f"Unknown endpoint {url.path}"}, started)
+            return
+        function, params, formatter, _ = db_app.COMMANDS[POST_ENDPOINT_COMMANDS[url.path]]
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            body = json.loads(self.rfile.read(length) or b'{}')
+            if not isinstance(body, dict):
+                raise ValueError("body must be a JSON object")
+            args = db_app.convert_args(params, body)
+        except ValueError as e:
+            self.send_json(400, {'error': str(e)}, started)
+            return
+
+        try:
+            # Runs on the shared writer, which commits
+            self.send_json(200, formatter(function(*args)), started)
+        except sqlite3.Error as e:
+            self.send_json(500, {'error': str(e)}, started)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class PooledHTTPServer(HTTPServer):
+    """
+    HTTP server that handles each connection on a fixed-size worker pool instead of the accept loop,
+    so a slow query only occupies one worker.
+    """
+
+    request_queue_size = 128
+
+    def __init__(self, address, workers=DEFAULT_WORKERS, verbose=False, cache=None, replica=None, profiler=None):
+        super().__init__(address, QueryRequestHandler)
+        self.executor = ThreadPoolExecutor(workers)
+        self.stats = RequestStats()
+        self.cache = cache
+        self.replica = replica
+        self.profiler = profiler
+        self.verbose = verbose
+
+    def process_request(self, request, client_address):
+        self.executor.submit(self.process_request_worker, request, client_address)
+
+    def process_request_worker(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.executor.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the db_app.py queries as JSON over HTTP.")
+    parser.add_argument('--db', default='council.db')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help="Worker threads (and read connections)")
+    parser.add_argument('--verbose', action='store_true', help="Log every request")
+    parser.add_argument('--cache-mb', type=int, default=64, help="Result cache size in MiB, 0 to disable")
+    parser.add_argument('--replica-interval', type=float, default=0,
+                        help="Serve GET queries from an in-memory copy refreshed every this many seconds, 0 to disable")
+    parser.add_argument('--slow-ms', type=float,
+                        help="Instrument the queries, logging calls at least this slow and reporting histograms in /stats")
+    parser.add_argument('--slow-log', default=SLOW_LOG)
+    parser.add_argument('--eligibility-index', action='store_true',
+                        help="Answer /eligible-reviewers from an in-memory index kept current from the change log")
+    args = parser.parse_args()
+
+    profiler = None
+    if args.slow_ms is not None:
+        profiler = Profiler(args.slow_ms, args.slow_log)
+        for path, (function, params, formatter) in ENDPOINTS.items():
+            ENDPOINTS[path] = (profiler.wrap(function), params, formatter)
+
+    connections.configure(args.db, readers=args.workers)
+    if args.eligibility_index:
+        with connections.read_connection() as conn:
+            db_app.use_eligibility_index(EligibilityIndex.load_from(conn))
+    cache = QueryCache(args.cache_mb * 1024 * 1024) if args.cache_mb else None
+    replica = ReadReplica(args.db, args.replica_interval).start() if args.replica_interval else None
+    server = PooledHTTPServer((args.host, args.port), args.workers, args.verbose, cache, replica, profiler)
+    print(f"Serving {args.db} on http://{args.host}:{args.port} with {args.workers} workers")
+    if replica is not None:
+        print(f"Reads served from an in-memory replica ({replica.last_snapshot['pages']} pages, "
+              f"copied in {replica.last_snapshot['duration_s']:.3f}s), refreshed every {args.replica_interval:g}s")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if replica is not None:
+            replica.close()
+        connections.close_pool()
@@ -0,0 +1,389 @@
+import argparse
+import heapq
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+from collections import deque
+from datetime import date, datetime, timedelta
+
+import db_app
+from benchmark import percentile
+from change_log import last_sequence, stream_changes
+from connections import DB_NAME
+from create_database import (PENDING_REVIEW_CONDITION, create_database, create_derived_triggers, create_indexes,
+                             drop_assignment_limit_triggers, drop_derived_triggers)
+
+REMINDER_LEAD_DAYS = 3
+HORIZON_DAYS = 14
+REFRESH_INTERVAL = 60
+REMINDER_LOG = 'review_reminders.jsonl'
+# Refresh latencies kept for the percentiles in stats()
+LATENCY_WINDOW = 1000
+
+# Unsubmitted reviews with a deadline in a date range, read from idx_review_assignment_due alone
+PENDING_REVIEWS_QUERY = f"""
+    SELECT review_assignment_id, review_deadline, reviewer_id, competition_id, proposal_id
+    FROM ReviewAssignment
+    WHERE {PENDING_REVIEW_CONDITION} AND review_deadline >= :start AND review_deadline <= :until
+"""
+
+
+def shift(day, days):
+    """Returns the YYYY-MM-DD date days after (or before) day."""
+    return (date.fromisoformat(day) + timedelta(days=days)).isoformat()
+
+
+class ReminderWorker:
+    """
+    Sends a reminder for every unsubmitted review lead_days before its deadline, and an overdue notice the
+    day after it, from a heap of upcoming reminders kept in memory.
+
+    The worker tracks the pending reviews due from the day it started to horizon_days ahead. They are read
+    once from the pending reviews index. After that, refresh() applies only the ReviewAssignment changes
+    logged in ChangeLog since the previous refresh, and on a new day it reads just the reviews whose
+    deadline entered the horizon. It only falls back to a full load after a bulk load or if the change log
+    was compacted past its position. Heap entries are not removed when a review is submitted, deleted or
+    given a new deadline; they are skipped when they come up (lazy deletion).
+
+    Reviews already overdue when the worker starts are left to the due reviews report, and reminders
+    dated before the start are taken as sent by an earlier run. A restart therefore resends only that
+    day's reminders.
+    """
+
+    def __init__(self, db_name=DB_NAME, lead_days=REMINDER_LEAD_DAYS, horizon_days=HORIZON_DAYS, send=None,
+                 log_path=REMINDER_LOG, today=None):
+        self.conn = sqlite3.connect(f"file:{db_name}?mode=ro", uri=True, check_same_thread=False)
+        self.lead_days = lead_days
+        self.horizon_days = horizon_days
+        self.log = None
+        if send is None:
+            self.log = open(log_path, 'a')
+            send = self.log_reminder
+        self.send = send
+        self.lock = threading.Lock()
+        self.stopping = threading.Event()
+        self.thread = None
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.counts = {'refreshes': 0, 'changes': 0, 'full_loads': 0, 'sent': 0}
+        self.last_error = None
+        self.load((today or date.today()).isoformat())
+
+    def track(self, review_assignment_id, review, today, late_reminders=True):
+        """
+        Records a pending review (deadline, reviewer_id, competition_id, proposal_id) and queues its
+        reminders if its deadline is new. Reminders dated before today are sent today, or, without
+        late_reminders, taken as already sent.
+        """
+        old = self.pending.get(review_assignment_id)
+        self.pending[review_assignment_id] = review
+        deadline = review[0]
+        if old is not None and old[0] == deadline:
+            return
+        for kind, remind_on in (('due', shift(deadline, -self.lead_days)), ('overdue', shift(deadline, 1))):
+            if remind_on < today and not late_reminders:
+                self.sent.add((review_assignment_id, kind, deadline))
+            heapq.heappush(self.heap, (max(remind_on, today), review_assignment_id, kind, deadline))
+
+    def load_range(self, start, until, today, late_reminders=True):
+        for review_assignment_id, *review in self.conn.execute(PENDING_REVIEWS_QUERY, {'start': start, 'until': until}):
+            self.track(review_assignment_id, tuple(review), today, late_reminders)
+
+    def load(self, today):
+        """
+        Reads every pending review due from today to the horizon, replacing everything tracked so far.
+        """
+        self.heap = []
+        self.pending = {}
+        self.sent = set()
+        self.window_start = today
+        self.until = shift(today, self.horizon_days)
+        self.today = today
+        self.conn.execute("BEGIN")
+        try:
+            self.since = last_sequence(self.conn)
+            self.load_range(self.window_start, self.until, today, late_reminders=False)
+        finally:
+            self.conn.execute("COMMIT")
+        self.counts['full_loads'] += 1
+
+    def apply(self, change, today):
+        """
+        Applies one ReviewAssignment change from the change log to the tracked reviews.
+        """
+        review_assignment_id = change['key'][0]
+        row = change['row']
+        if (row is not None and row['review_submitted'] == 0 and row['review_deadline'] is not None
+                and self.window_start <= row['review_deadline'] <= self.until):
+            review = (row['review_deadline'], row['reviewer_id'], row['competition_id'], row['proposal_id'])
+            self.track(review_assignment_id, review, today)
+        else:
+            self.pending.pop(review_assignment_id, None)
+
+    def refresh(self, today=None):
+        """
+        Applies the ReviewAssignment changes logged since the last refresh and, on a new day, loads the
+        reviews that entered the horizon.
+
+        Returns:
+            int: The number of changes applied.
+        """
+        today = (today or date.today()).isoformat()
+        started = time.perf_counter()
+        with self.lock:
+            reload = False
+            changes = 0
+            self.conn.execute("BEGIN")
+            try:
+                until_sequence = last_sequence(self.conn)
+                for change in stream_changes(self.since, tables=['ReviewAssignment'], conn=self.conn):
+                    if change['operation'] == 'reload':
+                        reload = True
+                        break
+                    self.apply(change, today)
+                    changes += 1
+                horizon = shift(today, self.horizon_days)
+                if not reload and horizon > self.until:
+                    self.load_range(shift(self.until, 1), horizon, today)
+                    self.until = horizon
+            except ValueError:
+                # The change log was compacted past self.since
+                reload = True
+            finally:
+                self.conn.execute("COMMIT")
+            if reload:
+                self.load(today)
+            else:
+                self.since = until_sequence
+            if today != self.today:
+                # Reminders can only come up again for deadlines still in the horizon
+                self.sent = {entry for entry in self.sent if entry[2] >= shift(today, -1)}
+                self.today = today
+            self.counts['refreshes'] += 1
+            self.counts['changes'] += changes
+            self.latencies.append(time.perf_counter() - started)
+        return changes
+
+    def send_due(self, today=None):
+        """
+        Sends every reminder due by today that still matches its review's current deadline.
+
+        Returns:
+            int: The number of reminders sent.
+        """
+        today = (today or date.today()).isoformat()
+        sent = 0
+        with self.lock:
+            while self.heap and self.heap[0][0] <= today:
+                _, review_assignment_id, kind, deadline = heapq.heappop(self.heap)
+                review = self.pending.get(review_assignment_id)
+                if review is None or review[0] != deadline or (review_assignment_id, kind, deadline) in self.sent:
+                    continue
+                self.sent.add((review_assignment_id, kind, deadline))
+                self.send(kind, review_assignment_id, review)
+                sent += 1
+                if kind == 'overdue':
+                    del self.pending[review_assignment_id]
+            self.counts['sent'] += sent
+        if self.log is not None:
+            self.log.flush()
+        return sent
+
+    def log_reminder(self, kind, review_assignment_id, review):
+        """Appends a reminder to the JSONL reminder log; replace with send= to deliver them some other way."""
+        deadline, reviewer_id, competition_id, proposal_id = review
+        self.log.write(json.dumps({
+            'sent_at': datetime.now().isoformat(timespec='seconds'), 'kind': kind,
+            'review_assignment_id': review_assignment_id, 'reviewer_id': reviewer_id,
+            'competition_id': competition_id, 'proposal_id': proposal_id, 'review_deadline': deadline,
+        }) + '\n')
+
+    def run_loop(self, interval):
+        while not self.stopping.wait(interval):
+            try:
+                self.refresh()
+                self.send_due()
+                self.last_error = None
+            except sqlite3.Error as e:
+                # Keep the reminders queued so far; the next refresh catches up
+                self.last_error = str(e)
+
+    def start(self, interval=REFRESH_INTERVAL):
+        """Sends the reminders due now, then refreshes and sends every interval seconds on a background thread."""
+        self.send_due()
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run_loop, args=(interval,), name='review-reminders', daemon=True)
+            self.thread.start()
+        return self
+
+    def stats(self):
+        with self.lock:
+            latencies = sorted(self.latencies)
+            return dict(self.counts, pending=len(self.pending), heap=len(self.heap), sequence=self.since,
+                        horizon=self.until, last_error=self.last_error,
+                        refresh_p50_ms=percentile(latencies, 0.50) * 1000 if latencies else None,
+                        refresh_p99_ms=percentile(latencies, 0.99) * 1000 if latencies else None)
+
+    def close(self):
+        self.stopping.set()
+        if self.thread is not None:
+            self.thread.join()
+        self.conn.close()
+        if self.log is not None:
+            self.log.close()
+
+
+def build_benchmark_database(db_name, n_assignments, today, seed):
+    """
+    Creates a database holding only synthetic review assignments, three per proposal, with deadlines
+    spread over the year before and after today. Most reviews past their deadline are submitted.
+    """
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(db_name + suffix):
+            os.remove(db_name + suffix)
+    create_database(db_name)
+    conn = sqlite3.connect(db_name)
+    cursor = conn.cursor()
+    cursor.execute("PRAGMA journal_mode = WAL")
+    # Loaded like a bulk import: without the per-row triggers
+    drop_assignment_limit_triggers(cursor)
+    drop_derived_triggers(cursor)
+    rng = random.Random(seed)
+    start = date.fromisoformat(today)
+
+    def rows():
+        for i in range(n_assignments):
+            deadline = start + timedelta(days=rng.randint(-365, 365))
+            submitted = rng.random() < (0.9 if deadline < start else 0.2)
+            yield (i // 3 + 1, i // 3 // 100 + 1, rng.randint(1, max(1, n_assignments // 3)), deadline.isoformat(), int(submitted))
+
+    cursor.executemany("INSERT OR IGNORE INTO ReviewAssignment (proposal_id, competition_id, reviewer_id, review_deadline, "
+                       "review_submitted) VALUES (?, ?, ?, ?, ?)", rows())
+    create_indexes(cursor)
+    create_derived_triggers(cursor)
+    cursor.execute("ANALYZE")
+    conn.commit()
+    conn.close()
+
+
+def make_changes(conn, rng, n, today, horizon_days):
+    """
+    Makes n random changes to review assignments due within the horizon, each committed on its own:
+    submitting a review, moving a deadline, or assigning a new review.
+    """
+    until = shift(today, horizon_days)
+    ids = [row[0] for row in conn.execute(f"SELECT review_assignment_id FROM ReviewAssignment WHERE {PENDING_REVIEW_CONDITION} "
+                                          "AND review_deadline BETWEEN ? AND ?", (today, until))]
+    for _ in range(n):
+        action = rng.random()
+        if action < 0.5 and ids:
+            conn.execute("UPDATE ReviewAssignment SET review_submitted = 1 WHERE review_assignment_id = ?", (rng.choice(ids),))
+        elif action < 0.8 and ids:
+            conn.execute("UPDATE ReviewAssignment SET review_deadline = ? WHERE review_assignment_id = ?",
+                         (shift(today, rng.randint(0, horizon_days * 2)), rng.choice(ids)))
+        else:
+            conn.execute("INSERT INTO ReviewAssignment (competition_id, reviewer_id, review_deadline, review_submitted) "
+                         "VALUES (?, ?, ?, 0)", (rng.randint(1, 1000), rng.randint(1, 1000), shift(today, rng.randint(0, horizon_days))))
+        conn.commit()
+
+
+def run_reminder_benchmark(db_name, n_assignments, rounds, changes_per_round, days, seed):
+    """
+    Times the due reviews report with and without the pending reviews index, and the reminder worker's
+    full load, incremental refreshes and daily reminder runs on a synthetic database. After the refreshes,
+    the reviews the worker tracks are compared with a fresh load.
+
+    Returns:
+        dict: The timings in milliseconds, the worker's sizes and whether its state matched a fresh load.
+    """
+    today = date.today().isoformat()
+    started = time.perf_counter()
+    build_benchmark_database(db_name, n_assignments, today, seed)
+    results = {'assignments': n_assignments, 'build_s': time.perf_counter() - started}
+    rng = random.Random(seed)
+
+    conn = sqlite3.connect(db_name)
+    for group_by in db_app.DUE_REVIEWS_QUERIES:
+        for indexed in (True, False):
+            if not indexed:
+                conn.execute("DROP INDEX idx_review_assignment_due")
+            timings = []
+            for _ in range(5):
+                query_start = time.perf_counter()
+                rows = db_app.due_reviews(group_by, today, conn=conn)
+                timings.append(time.perf_counter() - query_start)
+            results[f"report_by_{group_by}_{'indexed' if indexed else 'scan'}_ms"] = sorted(timings)[2] * 1000
+            results[f"report_by_{group_by}_rows"] = len(rows)
+        create_indexes(conn.cursor())
+        conn.commit()
+
+    reminders = []
+    load_start = time.perf_counter()
+    worker = ReminderWorker(db_name, send=lambda *reminder: reminders.append(reminder), today=date.fromisoformat(today))
+    results['full_load_ms'] = (time.perf_counter() - load_start) * 1000
+    results['tracked'] = len(worker.pending)
+
+    for _ in range(rounds):
+        make_changes(conn, rng, changes_per_round, today, worker.horizon_days)
+        worker.refresh(date.fromisoformat(today))
+    stats = worker.stats()
+    results['refresh_p50_ms'] = stats['refresh_p50_ms']
+    results['refresh_p99_ms'] = stats['refresh_p99_ms']
+    results['changes'] = stats['changes']
+    fresh = ReminderWorker(db_name, send=lambda *reminder: None, today=date.fromisoformat(today))
+    results['matches_full_load'] = fresh.pending == worker.pending
+    fresh.close()
+
+    day_timings = []
+    for day in range(days):
+        day_start = time.perf_counter()
+        worker.refresh(date.fromisoformat(shift(today, day)))
+        worker.send_due(date.fromisoformat(shift(today, day)))
+        day_timings.append(time.perf_counter() - day_start)
+    results['day_p50_ms'] = percentile(sorted(day_timings), 0.50) * 1000
+    results['day_max_ms'] = max(day_timings) * 1000
+    results['reminders_sent'] = len(reminders)
+    results['heap'] = len(worker.heap)
+    worker.close()
+    conn.close()
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(db_name + suffix):
+            os.remove(db_name + suffix)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Send reminders for reviews due soon and overdue reviews, or benchmark the reminder worker.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    run = subparsers.add_parser('run', help="Run the reminder worker until interrupted")
+    run.add_argument('--db', default=DB_NAME)
+    run.add_argument('--interval', type=float, default=REFRESH_INTERVAL, help="Seconds between refreshes")
+    run.add_argument('--lead-days', type=int, default=REMINDER_LEAD_DAYS, help="Remind this many days before the deadline")
+    run.add_argument('--horizon-days', type=int, default=HORIZON_DAYS, help="Track reviews due this many days ahead")
+    run.add_argument('--log', default=REMINDER_LOG, help="JSONL file the reminders are appended to")
+    bench = subparsers.add_parser('benchmark', help="Time the due reviews report and the worker on synthetic assignments")
+    bench.add_argument('--work-db', default='reminders_benchmark.db')
+    bench.add_argument('--assignments', type=int, default=2_000_000)
+    bench.add_argument('--rounds', type=int, default=50, help="Refreshes timed")
+    bench.add_argument('--changes', type=int, default=100, help="Assignment changes made before each refresh")
+    bench.add_argument('--days', type=int, default=30, help="Days of reminders simulated")
+    bench.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        worker = ReminderWorker(args.db, args.lead_days, args.horizon_days, log_path=args.log).start(args.interval)
+        print(f"Tracking {len(worker.pending)} pending reviews due by {worker.until}; reminders go to {args.log}")
+        try:
+            while True:
+                time.sleep(args.interval)
+                print(json.dumps(worker.stats()))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            worker.close()
+    else:
+        results = run_reminder_benchmark(args.work_db, args.assignments, args.rounds, args.changes, args.days, args.seed)
+        for key, value in results.items():
+            print(f"{key:<36} {value:.2f}" if isinstance(value, float) else f"{key:<36} {value}")
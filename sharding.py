@@ -0,0 +1,579 @@
+import argparse
+import contextlib
+import heapq
+import io
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from itertools import repeat
+
+import connections
+import db_app
+from benchmark import git_revision, sample_arguments, time_query
+from create_database import (INDEXES, PARTIAL_INDEXES, TABLES, UNIQUE_INDEXES, bump_table_versions, create_database,
+                             create_derived_triggers, create_indexes, drop_assignment_limit_triggers,
+                             drop_derived_triggers, rebuild_area_summary, rebuild_name_search, rebuild_text_search)
+
+# Tables split between the shards; a proposal's collaborators and review assignments go to the shard of the proposal
+PARTITIONED_TABLES = ['Proposal', 'ProposalCollaborator', 'ReviewAssignment']
+# Every other table is copied whole into every shard, so each shard can answer the menu queries on its own
+REPLICATED_TABLES = [table_name for table_name in TABLES if table_name not in PARTITIONED_TABLES]
+MANIFEST = 'manifest.json'
+SHARD_KEYS = ['competition', 'fiscal_year']
+# Fiscal years start in April and are named after the calendar year they start in
+FISCAL_YEAR_START_MONTH = 4
+FISCAL_YEAR_SQL = f"strftime('%Y', competition_deadline, '-{FISCAL_YEAR_START_MONTH - 1} months')"
+
+# Per shard: the proposals awarded the largest amount before a date, with all ties (db_app's query keeps one)
+LARGEST_AWARDED_TIES_QUERY = """
+    WITH largest AS (SELECT MAX(awarded_amount) AS amount FROM Proposal WHERE awarded_date < :date)
+    SELECT p.proposal_id, p.awarded_amount
+    FROM largest
+    JOIN Proposal p ON p.awarded_amount = largest.amount
+    WHERE p.awarded_date < :date
+    ORDER BY p.proposal_id
+"""
+
+# Per shard: the sum and count behind an area's average discrepancy, which are added up across shards
+DISCREPANCY_PARTS_QUERY = """
+    SELECT discrepancy_sum, awarded_count
+    FROM AreaSummary
+    WHERE competition_area = :area
+"""
+
+AREA_REPORT_PARTS_QUERY = """
+    SELECT s.competition_area, s.max_requested_amount, m.proposal_id, s.discrepancy_sum, s.awarded_count
+    FROM AreaSummary s
+    LEFT JOIN AreaMaxProposal m ON m.competition_area = s.competition_area
+    WHERE s.proposal_count > 0
+"""
+
+# Per shard: the reviewers eligible for a proposal on every rule but the assignment limit, which depends on
+# the reviewers' assignments in all shards. Only the shard holding the proposal returns rows.
+ELIGIBLE_CANDIDATES_QUERY = """
+    SELECT r.reviewer_id, res.first_name || ' ' || res.last_name AS name
+    FROM Reviewer r
+    JOIN Researcher res ON r.reviewer_id = res.researcher_id
+    WHERE EXISTS (SELECT 1 FROM Proposal WHERE proposal_id = :proposal_id)
+    AND r.reviewer_id NOT IN (
+        SELECT reviewer_id FROM ReviewAssignment WHERE proposal_id = :proposal_id
+    )
+    AND r.reviewer_id NOT IN (
+        SELECT coi.reviewer_id
+        FROM ConflictOfInterest coi
+        WHERE coi.conflicted_researcher_id IN (
+            SELECT principle_investigator_id FROM Proposal WHERE proposal_id = :proposal_id
+            UNION
+            SELECT collaborator_id FROM ProposalCollaborator WHERE proposal_id = :proposal_id
+        )
+    )
+"""
+
+REVIEWER_LOADS_QUERY = """
+    SELECT reviewer_id, COUNT(*) FROM ReviewAssignment GROUP BY reviewer_id
+"""
+
+
+def column_names(cursor, table_name, schema='main'):
+    # table_info leaves out generated columns, which cannot be inserted
+    return [row[1] for row in cursor.execute(f"PRAGMA {schema}.table_info({table_name})")]
+
+
+def copy_rows(cursor, table_name, where=''):
+    columns = ', '.join(column_names(cursor, table_name))
+    cursor.execute(f"INSERT INTO main.{table_name} ({columns}) SELECT {columns} FROM source.{table_name} {where}")
+
+
+def shard_conditions(cursor, n_shards, key):
+    """
+    Returns, for every shard, the condition on Competition selecting the competitions whose proposals it holds.
+
+    With the competition key, competitions are spread round-robin by ID. With the fiscal_year key, each shard
+    holds a contiguous range of fiscal years, chosen so the shards get about the same number of proposals;
+    competitions without a deadline go to the first shard.
+
+    Returns:
+        tuple: (conditions, fiscal_years) where fiscal_years maps each fiscal year to its shard, or is None.
+    """
+    if key == 'competition':
+        return [f"competition_id % {n_shards} = {shard}" for shard in range(n_shards)], None
+    years = cursor.execute(f"""
+        SELECT {FISCAL_YEAR_SQL} AS fiscal_year, COUNT(p.proposal_id)
+        FROM source.Competition c
+        LEFT JOIN source.Proposal p ON p.competition_id = c.competition_id
+        WHERE competition_deadline IS NOT NULL
+        GROUP BY fiscal_year
+        ORDER BY fiscal_year
+    """).fetchall()
+    total = max(sum(count for _, count in years), 1)
+    fiscal_years = {}
+    shard = seen = 0
+    for index, (year, count) in enumerate(years):
+        # A year goes to the shard its middle proposal falls in, in proportion to the proposals so far, but
+        # never to an earlier shard than the year before, and late enough that every shard gets a year if it can
+        proportional = min(n_shards - 1, int((seen + count / 2) * n_shards / total))
+        shard = max(shard, proportional, n_shards - (len(years) - index))
+        fiscal_years[year] = shard
+        seen += count
+    conditions = []
+    for shard in range(n_shards):
+        shard_years = ', '.join(f"'{year}'" for year, owner in fiscal_years.items() if owner == shard)
+        condition = f"{FISCAL_YEAR_SQL} IN ({shard_years})"
+        conditions.append(f"({condition} OR competition_deadline IS NULL)" if shard == 0 else condition)
+    return conditions, fiscal_years
+
+
+def build_shards(db_name, output_dir, n_shards, key='competition'):
+    """
+    Splits a database into n_shards SQLite files plus a manifest.
+
+    Proposal, ProposalCollaborator and ReviewAssignment are partitioned by the competition of the proposal;
+    all other tables are copied into every shard. Every shard has the full schema, with its derived data
+    (collaborator counts, area summaries, search indexes) computed from the rows it holds. Proposals
+    without a known competition go to the first shard.
+
+    Parameters:
+        db_name (str): The database to split. It is only read.
+        output_dir (str): Directory for the shard files and manifest.json; existing shards are replaced.
+        n_shards (int): Number of shards.
+        key (str): 'competition' or 'fiscal_year', see shard_conditions().
+
+    Returns:
+        dict: The manifest, also written to output_dir/manifest.json.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    template = os.path.join(output_dir, 'template.db.tmp')
+    if os.path.exists(template):
+        os.remove(template)
+
+    # The replicated tables are loaded, and their search indexes built, once; every shard starts as a copy
+    create_database(template)
+    # URI filenames let the source be attached read-only
+    conn = sqlite3.connect(f"file:{template}", uri=True)
+    cursor = conn.cursor()
+    cursor.execute("PRAGMA journal_mode = OFF")
+    cursor.execute("PRAGMA synchronous = OFF")
+    cursor.execute("PRAGMA cache_size = -262144")
+    cursor.execute("ATTACH DATABASE ? AS source", (f"file:{db_name}?mode=ro",))
+    drop_derived_triggers(cursor)
+    # The assignment limits count a reviewer's assignments in all shards, so no shard can enforce them
+    drop_assignment_limit_triggers(cursor)
+    conditions, fiscal_years = shard_conditions(cursor, n_shards, key)
+    for table_name in REPLICATED_TABLES:
+        copy_rows(cursor, table_name)
+    rebuild_name_search(cursor)
+    rebuild_text_search(cursor)
+    create_indexes(cursor)
+    conn.commit()
+    conn.close()
+
+    partitioned_indexes = [index_name for index_name, table_name, *_ in INDEXES + UNIQUE_INDEXES + PARTIAL_INDEXES
+                           if table_name in PARTITIONED_TABLES]
+    shards = []
+    for shard, condition in enumerate(conditions):
+        shard_name = f"shard_{shard}.db"
+        start_time = time.perf_counter()
+        path = os.path.join(output_dir, shard_name)
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+        shutil.copyfile(template, path)
+        conn = sqlite3.connect(f"file:{path}", uri=True)
+        cursor = conn.cursor()
+        cursor.execute("PRAGMA synchronous = OFF")
+        cursor.execute("PRAGMA cache_size = -262144")
+        cursor.execute("ATTACH DATABASE ? AS source", (f"file:{db_name}?mode=ro",))
+        for index_name in partitioned_indexes:
+            cursor.execute(f"DROP INDEX IF EXISTS {index_name}")
+        cursor.execute("CREATE TEMP TABLE ShardCompetition (competition_id INTEGER PRIMARY KEY)")
+        cursor.execute(f"INSERT INTO temp.ShardCompetition SELECT competition_id FROM source.Competition WHERE {condition}")
+        where = "WHERE competition_id IN (SELECT competition_id FROM temp.ShardCompetition)"
+        if shard == 0:
+            where += " OR competition_id IS NULL OR competition_id NOT IN (SELECT competition_id FROM source.Competition)"
+        copy_rows(cursor, 'Proposal', where)
+        for table_name in PARTITIONED_TABLES[1:]:
+            copy_rows(cursor, table_name, "WHERE proposal_id IN (SELECT proposal_id FROM main.Proposal)")
+        rebuild_area_summary(cursor)
+        create_derived_triggers(cursor)
+        bump_table_versions(cursor)
+        create_indexes(cursor)
+        proposals = cursor.execute("SELECT COUNT(*) FROM Proposal").fetchone()[0]
+        cursor.execute("ANALYZE main")
+        conn.commit()
+        conn.close()
+        shards.append({'file': shard_name, 'proposals': proposals})
+        print(f"{shard_name}: {proposals} proposals in {time.perf_counter() - start_time:.1f}s")
+    os.remove(template)
+
+    manifest = {
+        'source': os.path.abspath(db_name),
+        'key': key,
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'shards': shards,
+        'fiscal_years': fiscal_years,
+    }
+    with open(os.path.join(output_dir, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def largest_awarded_ties(date, conn=None):
+    return conn.execute(LARGEST_AWARDED_TIES_QUERY, {'date': date}).fetchall()
+
+
+def discrepancy_parts(area, conn=None):
+    return conn.execute(DISCREPANCY_PARTS_QUERY, {'area': area}).fetchone()
+
+
+def area_report_parts(conn=None):
+    return conn.execute(AREA_REPORT_PARTS_QUERY).fetchall()
+
+
+def eligibility_parts(proposal_id, conn=None):
+    candidates = conn.execute(ELIGIBLE_CANDIDATES_QUERY, {'proposal_id': proposal_id}).fetchall()
+    return candidates, conn.execute(REVIEWER_LOADS_QUERY).fetchall()
+
+
+def table_page_parts(table_name, after_key, page_size, conn=None):
+    """
+    Returns one page of a shard's rows as (key, row) pairs, so pages from several shards can be merged in key order.
+    """
+    rows, _ = db_app.fetch_table_page(table_name, after_key, page_size, conn)
+    columns = [row[1] for row in conn.execute(f"PRAGMA table_info({table_name})")]
+    positions = [columns.index(column) for column in db_app.primary_key_columns(table_name, conn)]
+    return [(tuple(row[position] for position in positions), row) for row in rows]
+
+
+# The per-shard half of every fanned-out query: name -> function(*args, conn)
+PARTIAL_QUERIES = {
+    'find_open_competitions': db_app.find_open_competitions,
+    'find_largest_amount_proposal': db_app.find_largest_amount_proposal,
+    'largest_awarded_ties': largest_awarded_ties,
+    'discrepancy_parts': discrepancy_parts,
+    'area_report_parts': area_report_parts,
+    'monthly_open_competitions': db_app.monthly_open_competitions,
+    'eligibility_parts': eligibility_parts,
+    'find_proposals_to_review': db_app.find_proposals_to_review,
+    'table_page_parts': table_page_parts,
+    'due_reviews': db_app.due_reviews,
+}
+
+# Read-only connections of a worker process, opened on first use, keyed by shard path
+shard_connections = {}
+
+
+def shard_connection(path):
+    conn = shard_connections.get(path)
+    if conn is None:
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        conn.execute(f"PRAGMA cache_size = -{connections.CACHE_SIZE_KIB}")
+        shard_connections[path] = conn
+    return conn
+
+
+def run_partial(path, name, args):
+    return PARTIAL_QUERIES[name](*args, conn=shard_connection(path))
+
+
+def max_with_ties(rows, value=1):
+    """
+    Returns the rows whose value column equals the largest value among them, in order of their first column.
+    """
+    rows = [row for row in rows if row[value] is not None]
+    if not rows:
+        return []
+    largest = max(row[value] for row in rows)
+    return sorted(row for row in rows if row[value] == largest)
+
+
+class ShardedDatabase:
+    """
+    The db_app.py query functions over a sharded layout built by build_shards().
+
+    Queries on the partitioned tables run on every shard in parallel, on a pool of worker processes that
+    each keep read-only connections to the shards, and the partial results are merged: maxima keep the
+    ties from every shard, averages are recomputed from the summed totals and sets are unioned in key order.
+    Queries that only read replicated tables (name and full-text search) run on the first shard in this process.
+
+    The shards are a read-only copy: writes go to the source database and reach the shards when they are rebuilt.
+    """
+
+    def __init__(self, manifest_path, workers=None):
+        with open(manifest_path) as f:
+            self.manifest = json.load(f)
+        shard_dir = os.path.dirname(os.path.abspath(manifest_path))
+        self.paths = [os.path.join(shard_dir, shard['file']) for shard in self.manifest['shards']]
+        self.workers = len(self.paths) if workers is None else workers
+        self.executor = ProcessPoolExecutor(self.workers) if self.workers else None
+        self.conn = sqlite3.connect(f"file:{self.paths[0]}?mode=ro", uri=True, check_same_thread=False)
+        self.originals = {}
+
+    def fan_out(self, name, *args):
+        """Runs PARTIAL_QUERIES[name] on every shard and returns the results in shard order."""
+        if self.executor is None:
+            return [run_partial(path, name, args) for path in self.paths]
+        return list(self.executor.map(run_partial, self.paths, repeat(name), repeat(args)))
+
+    def find_open_competitions(self, month, conn=None):
+        return sorted({row for rows in self.fan_out('find_open_competitions', month) for row in rows})
+
+    def find_largest_amount_proposal(self, area, conn=None):
+        return max_with_ties([row for rows in self.fan_out('find_largest_amount_proposal', area) for row in rows])
+
+    def find_largest_awarded_proposals(self, date, conn=None):
+        """
+        Returns every proposal awarded the largest amount before the date, or [(None, None)] if there are none.
+        """
+        return max_with_ties([row for rows in self.fan_out('largest_awarded_ties', date) for row in rows]) or [(None, None)]
+
+    def average_discrepancy(self, area, conn=None):
+        parts = [part for part in self.fan_out('discrepancy_parts', area) if part is not None]
+        awarded_count = sum(count for _, count in parts)
+        return sum(total for total, _ in parts) / awarded_count if awarded_count else None
+
+    def area_report(self, conn=None):
+        areas = {}
+        for shard, rows in enumerate(self.fan_out('area_report_parts')):
+            for area, max_requested_amount, proposal_id, discrepancy_sum, awarded_count in rows:
+                entry = areas.setdefault(area, {'largest': [], 'totals': {}})
+                if proposal_id is not None:
+                    entry['largest'].append((proposal_id, max_requested_amount))
+                # A shard returns an area once per proposal tied for its largest request
+                entry['totals'][shard] = (max_requested_amount, discrepancy_sum, awarded_count)
+        report = {}
+        for area in sorted(areas):
+            totals = areas[area]['totals'].values()
+            awarded_count = sum(count for _, _, count in totals)
+            largest = max_with_ties(areas[area]['largest'])
+            report[area] = {
+                'max_requested_amount': max(amount for amount, _, _ in totals),
+                'largest_request_proposals': [proposal_id for proposal_id, _ in largest],
+                'average_discrepancy': sum(total for _, total, _ in totals) / awarded_count if awarded_count else None,
+            }
+        return report
+
+    def monthly_open_competitions(self, conn=None):
+        report = {f"{month:02d}": set() for month in range(1, 13)}
+        for partial in self.fan_out('monthly_open_competitions'):
+            for month, rows in partial.items():
+                report[month].update(rows)
+        return {month: sorted(rows) for month, rows in report.items()}
+
+    def eligible_reviewers(self, proposal_id, conn=None):
+        """
+        Returns the (reviewer_id, name) of every reviewer eligible for the proposal, counting each
+        reviewer's assignments in all shards against MAX_ASSIGNMENTS_PER_REVIEWER.
+        """
+        candidates = []
+        loads = {}
+        for shard_candidates, shard_loads in self.fan_out('eligibility_parts', proposal_id):
+            candidates.extend(shard_candidates)
+            for reviewer_id, count in shard_loads:
+                loads[reviewer_id] = loads.get(reviewer_id, 0) + count
+        return [(reviewer_id, name) for reviewer_id, name in candidates if loads.get(reviewer_id, 0) < db_app.MAX_ASSIGNMENTS_PER_REVIEWER]
+
+    def fetch_eligible_reviewers(self, proposal_id, conn=None):
+        results = self.eligible_reviewers(proposal_id)
+        for result in results:
+            print(f"ID: {result[0]}, Name: {result[1]}")
+        return [result[0] for result in results]
+
+    def find_proposals_to_review(self, name, conn=None):
+        return sorted(row for rows in self.fan_out('find_proposals_to_review', name) for row in rows)
+
+    def due_reviews(self, group_by='reviewer', as_of=None, days=db_app.DUE_SOON_DAYS, conn=None):
+        """
+        Adds up each reviewer's or competition's overdue and upcoming reviews from every shard. The date is
+        fixed here, so every shard counts from the same day.
+        """
+        as_of = as_of or datetime.now().strftime('%Y-%m-%d')
+        merged = {}
+        for rows in self.fan_out('due_reviews', group_by, as_of, days):
+            for key, name, overdue, upcoming, earliest_deadline in rows:
+                entry = merged.get(key)
+                if entry is None:
+                    merged[key] = [key, name, overdue, upcoming, earliest_deadline]
+                else:
+                    entry[2] += overdue
+                    entry[3] += upcoming
+                    entry[4] = min(entry[4], earliest_deadline)
+        return sorted((tuple(entry) for entry in merged.values()), key=lambda row: (row[4], row[0]))
+
+    def fetch_table_page(self, table_name, after_key=None, page_size=db_app.PAGE_SIZE, conn=None):
+        if table_name not in PARTITIONED_TABLES:
+            return db_app.fetch_table_page(table_name, after_key, page_size, self.conn)
+        pages = self.fan_out('table_page_parts', table_name, after_key, page_size)
+        merged = list(heapq.merge(*pages, key=lambda entry: entry[0]))[:page_size]
+        if not merged:
+            return [], after_key
+        return [row for _, row in merged], merged[-1][0]
+
+    def on_first_shard(self, function):
+        def query(*args, conn=None, **kwargs):
+            return function(*args, conn=self.conn, **kwargs)
+        query.__name__ = function.__name__
+        return query
+
+    def query_functions(self):
+        """
+        Returns the sharded version of every db_app.py query function, keyed by name.
+        """
+        functions = {name: getattr(self, name) for name in [
+            'find_open_competitions', 'find_largest_amount_proposal', 'find_largest_awarded_proposals',
+            'average_discrepancy', 'area_report', 'monthly_open_competitions', 'eligible_reviewers',
+            'fetch_eligible_reviewers', 'find_proposals_to_review', 'fetch_table_page', 'due_reviews']}
+        for name in ['table_names', 'find_reviewers_by_prefix', 'search_reviewers', 'search_competitions',
+                     'search_organizations']:
+            functions[name] = self.on_first_shard(getattr(db_app, name))
+        return functions
+
+    def install(self):
+        """
+        Replaces the query functions in db_app.py with their sharded versions, so the menu reads from the shards.
+        """
+        for name, function in self.query_functions().items():
+            self.originals[name] = getattr(db_app, name)
+            setattr(db_app, name, function)
+        return self
+
+    def uninstall(self):
+        for name, function in self.originals.items():
+            setattr(db_app, name, function)
+        self.originals.clear()
+
+    def close(self):
+        self.uninstall()
+        if self.executor:
+            self.executor.shutdown()
+        self.conn.close()
+
+
+def same_result(name, expected, actual):
+    """
+    Whether a sharded result matches the single-database one, ignoring row order and float rounding. The
+    single-database query for the largest award keeps only one of several tied proposals.
+    """
+    if name == 'find_largest_awarded_proposals':
+        return expected[0][1] == actual[0][1] and expected[0] in actual
+    if name == 'area_report':
+        return expected.keys() == actual.keys() and all(
+            expected[area]['max_requested_amount'] == actual[area]['max_requested_amount']
+            and sorted(expected[area]['largest_request_proposals']) == actual[area]['largest_request_proposals']
+            and same_result('average_discrepancy', expected[area]['average_discrepancy'], actual[area]['average_discrepancy'])
+            for area in expected)
+    if isinstance(expected, float) or isinstance(actual, float):
+        return expected is not None and actual is not None and math.isclose(expected, actual, rel_tol=1e-9)
+    if isinstance(expected, dict):
+        return expected.keys() == actual.keys() and all(sorted(expected[key]) == sorted(actual[key]) for key in expected)
+    if isinstance(expected, list):
+        return sorted(expected) == sorted(actual)
+    return expected == actual
+
+
+def run_shard_benchmark(db_name, shard_counts, repeat, seed, data_dir, key='competition', workers=None, rebuild=False):
+    """
+    Times the menu queries on the database itself and on sharded copies of it with each number of shards,
+    and checks every sharded result against the single-database one.
+
+    Returns:
+        list: One result dict per (query, number of shards); 0 shards is the unsharded database.
+    """
+    conn = sqlite3.connect(db_name)
+    arguments = sample_arguments(conn.cursor(), random.Random(seed), repeat)
+    with contextlib.redirect_stdout(io.StringIO()):
+        expected = {name: [getattr(db_app, name)(*args, conn=conn) for args in argument_list]
+                    for name, argument_list in arguments.items()}
+    results = []
+    for name, argument_list in arguments.items():
+        stats = time_query(getattr(db_app, name), argument_list, conn)
+        stats.update({'query': name, 'shards': 0, 'mismatches': 0})
+        results.append(stats)
+    conn.close()
+
+    base_name = os.path.splitext(os.path.basename(db_name))[0]
+    for n_shards in shard_counts:
+        shard_dir = os.path.join(data_dir, f"{base_name}_{key}_{n_shards}")
+        manifest_path = os.path.join(shard_dir, MANIFEST)
+        if rebuild or not os.path.exists(manifest_path):
+            print(f"Building {n_shards} shards in {shard_dir}...")
+            build_shards(db_name, shard_dir, n_shards, key)
+        sharded = ShardedDatabase(manifest_path, workers)
+        functions = sharded.query_functions()
+        # Let the workers open their shard connections before anything is timed
+        for _ in range(max(sharded.workers, 1)):
+            sharded.fan_out('find_open_competitions', '01')
+        for name, argument_list in arguments.items():
+            stats = time_query(functions[name], argument_list, None)
+            with contextlib.redirect_stdout(io.StringIO()):
+                actual = [functions[name](*args) for args in argument_list]
+            stats.update({'query': name, 'shards': n_shards,
+                          'mismatches': sum(not same_result(name, want, got) for want, got in zip(expected[name], actual))})
+            results.append(stats)
+        sharded.close()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Split the database into shards, query them, or benchmark sharded queries.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    build = subparsers.add_parser('build', help="Split a database into shards")
+    build.add_argument('--db', default=connections.DB_NAME)
+    build.add_argument('--shards', type=int, default=4)
+    build.add_argument('--key', choices=SHARD_KEYS, default='competition', help="How proposals are assigned to shards")
+    build.add_argument('--output-dir', default='shards')
+    menu = subparsers.add_parser('menu', help="Run the db_app.py menu with its queries fanned out over the shards")
+    menu.add_argument('--manifest', default=os.path.join('shards', MANIFEST))
+    menu.add_argument('--workers', type=int, help="Worker processes (default: one per shard, 0 runs the shards in turn)")
+    bench = subparsers.add_parser('benchmark', help="Time the menu queries with 1 to N shards")
+    bench.add_argument('--db', default=connections.DB_NAME)
+    bench.add_argument('--shards', type=int, nargs='+', default=[1, 2, 4, 8])
+    bench.add_argument('--key', choices=SHARD_KEYS, default='competition')
+    bench.add_argument('--workers', type=int, help="Worker processes (default: one per shard, 0 runs the shards in turn)")
+    bench.add_argument('--repeat', type=int, default=50, help="Calls per query")
+    bench.add_argument('--seed', type=int, default=0)
+    bench.add_argument('--data-dir', default='bench_data', help="Where the shards are kept between runs")
+    bench.add_argument('--rebuild', action='store_true', help="Rebuild the shards even if they exist")
+    bench.add_argument('--output', default='benchmark_results_shards.json', help="Machine-readable results file")
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        start_time = time.perf_counter()
+        manifest = build_shards(args.db, args.output_dir, args.shards, args.key)
+        print(f"{len(manifest['shards'])} shards written to {args.output_dir} in {time.perf_counter() - start_time:.1f}s.")
+    elif args.command == 'menu':
+        with open(args.manifest) as f:
+            source = json.load(f)['source']
+        # Writes (reviewer assignments) still go to the source database
+        connections.configure(source)
+        sharded = ShardedDatabase(args.manifest, args.workers).install()
+        try:
+            db_app.main_menu()
+        finally:
+            sharded.close()
+    else:
+        results = run_shard_benchmark(args.db, args.shards, args.repeat, args.seed, args.data_dir, args.key,
+                                      args.workers, args.rebuild)
+        print(f"{'query':<32} {'shards':>6} {'p50':>10} {'p95':>10} {'qps':>9} {'mismatches':>10}")
+        for result in sorted(results, key=lambda result: (result['query'], result['shards'])):
+            print(f"{result['query']:<32} {result['shards'] or 'none':>6} {result['p50_ms']:8.3f}ms {result['p95_ms']:8.3f}ms "
+                  f"{result['queries_per_sec']:9.1f} {result['mismatches']:>10}")
+        with open(args.output, 'w') as f:
+            json.dump({
+                'revision': git_revision(),
+                'timestamp': datetime.now().isoformat(timespec='seconds'),
+                'sqlite_version': sqlite3.sqlite_version,
+                'python_version': platform.python_version(),
+                'cpu_count': os.cpu_count(),
+                'seed': args.seed,
+                'repeat': args.repeat,
+                'key': args.key,
+                'results': results,
+            }, f, indent=2)
+        print(f"Results written to {args.output}")
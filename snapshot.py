@@ -0,0 +1,166 @@
+import argparse
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from connections import DB_NAME
+
+SNAPSHOT_STEP_PAGES = 1024
+# Pause between steps when the source is not in WAL mode, so writers can take the lock in between
+SNAPSHOT_STEP_SLEEP = 0.005
+REFRESH_INTERVAL = 300
+
+
+def take_snapshot(db_name, target, step_pages=SNAPSHOT_STEP_PAGES, step_sleep=SNAPSHOT_STEP_SLEEP):
+    """
+    Copies a database with the sqlite3 backup API, step_pages pages at a time.
+
+    In WAL mode the copy runs inside one read transaction on the source, so it is a consistent
+    point-in-time image and writers are never blocked; they keep appending to the WAL while the copy
+    runs. In rollback journal mode the source is only locked during each step, and the copy starts
+    over if a writer commits in between.
+
+    Parameters:
+        db_name (str): Path of the source database.
+        target (str or sqlite3.Connection): Path of the copy, or an open connection (e.g. to
+            ':memory:') to copy into. A file is written next to the target and renamed over it when
+            the copy is complete, so readers of the target never see a partial copy.
+        step_pages (int): Pages copied per step.
+        step_sleep (float): Seconds to wait between steps when the source is not in WAL mode.
+
+    Returns:
+        dict: snapshot_at (the time the copied state was read, as a Unix timestamp), duration_s, pages
+        and steps.
+    """
+    source = sqlite3.connect(f"file:{db_name}?mode=ro", uri=True)
+    dest = sqlite3.connect(f"{target}.tmp") if isinstance(target, str) else target
+    steps = 0
+
+    def progress(status, remaining, total):
+        nonlocal steps
+        steps += 1
+        if not wal and remaining:
+            time.sleep(step_sleep)
+
+    try:
+        wal = source.execute("PRAGMA journal_mode").fetchone()[0] == 'wal'
+        started = time.perf_counter()
+        snapshot_at = time.time()
+        if wal:
+            # Reading the schema starts the read transaction the whole copy is taken from
+            source.execute("BEGIN")
+            source.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+        source.backup(dest, pages=step_pages, progress=progress)
+        duration = time.perf_counter() - started
+        pages = dest.execute("PRAGMA page_count").fetchone()[0]
+    finally:
+        source.close()
+        if isinstance(target, str):
+            dest.close()
+    if isinstance(target, str):
+        os.replace(f"{target}.tmp", target)
+    return {'snapshot_at': snapshot_at, 'duration_s': duration, 'pages': pages, 'steps': steps}
+
+
+class ReadReplica:
+    """
+    An in-memory copy of the database for read-only queries, refreshed from the file with take_snapshot().
+
+    Reports run against the replica never touch council.db, so they cannot slow down the writer, at the
+    cost of seeing data up to one refresh interval old. Queries on the replica run one at a time; a
+    refresh builds the new copy on the side and swaps it in between two queries.
+    """
+
+    def __init__(self, db_name=DB_NAME, interval=REFRESH_INTERVAL, step_pages=SNAPSHOT_STEP_PAGES):
+        self.db_name = db_name
+        self.interval = interval
+        self.step_pages = step_pages
+        self.lock = threading.Lock()
+        self.conn = None
+        self.last_snapshot = None
+        self.refreshes = 0
+        self.last_error = None
+        self.stopping = threading.Event()
+        self.thread = None
+        self.refresh()
+
+    def refresh(self):
+        """
+        Takes a new snapshot of the database and makes it the replica.
+
+        Returns:
+            dict: The snapshot statistics from take_snapshot().
+        """
+        conn = sqlite3.connect(':memory:', check_same_thread=False)
+        try:
+            snapshot = take_snapshot(self.db_name, conn, self.step_pages)
+        except BaseException:
+            conn.close()
+            raise
+        with self.lock:
+            old, self.conn = self.conn, conn
+            self.last_snapshot = snapshot
+            self.refreshes += 1
+        if old is not None:
+            old.close()
+        return snapshot
+
+    def refresh_loop(self):
+        while not self.stopping.wait(self.interval):
+            try:
+                self.refresh()
+                self.last_error = None
+            except sqlite3.Error as e:
+                # Keep serving the previous copy; its staleness shows in stats()
+                self.last_error = str(e)
+
+    def start(self):
+        """Refreshes the replica every interval seconds on a background thread."""
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.refresh_loop, name='replica-refresh', daemon=True)
+            self.thread.start()
+        return self
+
+    @contextmanager
+    def reader(self):
+        """Holds the replica connection for one query."""
+        with self.lock:
+            yield self.conn
+
+    def staleness(self):
+        """Returns how many seconds old the data in the replica is."""
+        return time.time() - self.last_snapshot['snapshot_at']
+
+    def stats(self):
+        with self.lock:
+            snapshot = dict(self.last_snapshot)
+        return {
+            'snapshot_at': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(snapshot['snapshot_at'])),
+            'staleness_s': round(time.time() - snapshot['snapshot_at'], 3),
+            'snapshot_duration_s': round(snapshot['duration_s'], 3),
+            'pages': snapshot['pages'],
+            'refreshes': self.refreshes,
+            'interval_s': self.interval,
+            'last_error': self.last_error,
+        }
+
+    def close(self):
+        self.stopping.set()
+        if self.thread is not None:
+            self.thread.join()
+        with self.lock:
+            self.conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Copy the database to a consistent snapshot file without stopping writers.")
+    parser.add_argument('--db', default=DB_NAME)
+    parser.add_argument('--output', default='council-snapshot.db')
+    parser.add_argument('--step-pages', type=int, default=SNAPSHOT_STEP_PAGES, help="Pages copied per backup step")
+    args = parser.parse_args()
+
+    snapshot = take_snapshot(args.db, args.output, args.step_pages)
+    print(f"Copied {snapshot['pages']} pages of {args.db} to {args.output} in {snapshot['steps']} steps, "
+          f"{snapshot['duration_s']:.3f}s")
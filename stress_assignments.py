@@ -0,0 +1,192 @@
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sqlite3
+import time
+
+import connections
+import db_app
+from benchmark import percentile
+from create_database import (UNIQUE_INDEXES, assignment_limit_violations, create_assignment_limit_triggers,
+                             create_indexes, drop_assignment_limit_triggers)
+from snapshot import take_snapshot
+
+# Assignments that break a conflict of interest, which assign_reviewer() checks inside its transaction
+CONFLICTED_ASSIGNMENTS_QUERY = """
+    SELECT COUNT(*)
+    FROM ReviewAssignment ra
+    JOIN ConflictOfInterest coi ON coi.reviewer_id = ra.reviewer_id
+    WHERE coi.conflicted_researcher_id IN (
+        SELECT principle_investigator_id FROM Proposal WHERE proposal_id = ra.proposal_id
+        UNION
+        SELECT collaborator_id FROM ProposalCollaborator WHERE proposal_id = ra.proposal_id
+    )
+"""
+
+barrier = None
+
+
+def set_barrier(shared_barrier):
+    global barrier
+    barrier = shared_barrier
+
+
+def assign_unguarded(conn, proposal_id, reviewer_id):
+    """
+    Assigns a reviewer the way the menu did before the limits were enforced in the database: the checks
+    run outside the transaction that inserts the row.
+    """
+    if not db_app.check_reviewer_limit(proposal_id, conn=conn):
+        raise ValueError(f"Proposal {proposal_id} already has {db_app.MAX_REVIEWERS_PER_PROPOSAL} reviewers")
+    params = {**db_app.LIMIT_PARAMS, 'proposal_id': proposal_id, 'reviewer_id': reviewer_id, 'review_deadline': None}
+    if conn.execute(db_app.REVIEWER_ELIGIBLE_QUERY, params).fetchone() is None:
+        raise ValueError(f"Reviewer {reviewer_id} is not eligible for proposal {proposal_id}")
+    conn.execute(db_app.ASSIGN_REVIEWER_STATEMENT, params)
+    conn.commit()
+
+
+def run_writer(db_name, pairs, unguarded):
+    """
+    Tries every (proposal_id, reviewer_id) pair in turn, starting together with the other writers.
+
+    Returns:
+        dict: Counts of assigned, refused and failed attempts, the assignment latencies in seconds and
+        when the writer started and finished.
+    """
+    pool = connections.configure(db_name, readers=0)
+    result = {'assigned': 0, 'refused': 0, 'errors': 0, 'latencies': []}
+    barrier.wait()
+    result['started'] = time.time()
+    for proposal_id, reviewer_id in pairs:
+        start = time.perf_counter()
+        try:
+            if unguarded:
+                with pool.writer_lock:
+                    assign_unguarded(pool.writer, proposal_id, reviewer_id)
+            else:
+                db_app.assign_reviewer(proposal_id, reviewer_id)
+            result['assigned'] += 1
+        except ValueError:
+            result['refused'] += 1
+        except sqlite3.Error:
+            result['errors'] += 1
+        result['latencies'].append(time.perf_counter() - start)
+    result['finished'] = time.time()
+    connections.close_pool()
+    return result
+
+
+def prepare_database(source, db_name, unguarded):
+    """
+    Copies the source database and deletes every review assignment, so each run starts from the same state.
+    Unguarded runs get the schema from before the limits were enforced: the unique index and the
+    assignment limit triggers are replaced by a plain index on proposal_id.
+    """
+    take_snapshot(source, db_name)
+    conn = sqlite3.connect(db_name)
+    cursor = conn.cursor()
+    cursor.execute("PRAGMA journal_mode = WAL")
+    cursor.execute("DELETE FROM ReviewAssignment")
+    if unguarded:
+        drop_assignment_limit_triggers(cursor)
+        for index_name, *_ in UNIQUE_INDEXES:
+            cursor.execute(f"DROP INDEX IF EXISTS {index_name}")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_review_assignment_proposal ON ReviewAssignment (proposal_id)")
+    else:
+        cursor.execute("DROP INDEX IF EXISTS idx_review_assignment_proposal")
+        create_indexes(cursor)
+        create_assignment_limit_triggers(cursor)
+    conn.commit()
+    conn.close()
+
+
+def sample_pairs(source, n_proposals, n_reviewers, attempts, seed):
+    """
+    Picks a small set of submitted proposals and reviewers and returns attempts random pairs of them, so
+    the writers compete for the same proposals and reviewers.
+    """
+    conn = sqlite3.connect(source)
+    rng = random.Random(seed)
+    proposals = [row[0] for row in conn.execute("SELECT proposal_id FROM Proposal WHERE proposal_status = 'Submitted'")]
+    reviewers = [row[0] for row in conn.execute("SELECT reviewer_id FROM Reviewer")]
+    conn.close()
+    proposals = rng.sample(proposals, min(n_proposals, len(proposals)))
+    reviewers = rng.sample(reviewers, min(n_reviewers, len(reviewers)))
+    return [(rng.choice(proposals), rng.choice(reviewers)) for _ in range(attempts)]
+
+
+def run_level(source, db_name, pairs, writers, unguarded=False):
+    """
+    Runs the given number of writer processes over a fresh copy of the database, splitting the pairs
+    between them, then checks the assignments they made.
+
+    Returns:
+        dict: Throughput, latency percentiles, outcome counts and invariant violations for this number of writers.
+    """
+    prepare_database(source, db_name, unguarded)
+    context = multiprocessing.get_context()
+    shared_barrier = context.Barrier(writers)
+    with context.Pool(writers, initializer=set_barrier, initargs=(shared_barrier,)) as pool:
+        results = pool.starmap(run_writer, [(db_name, pairs[i::writers], unguarded) for i in range(writers)])
+    elapsed = max(result['finished'] for result in results) - min(result['started'] for result in results)
+
+    conn = sqlite3.connect(db_name)
+    violations = assignment_limit_violations(conn.cursor())
+    violations['conflicted'] = conn.execute(CONFLICTED_ASSIGNMENTS_QUERY).fetchone()[0]
+    conn.close()
+
+    latencies = sorted(latency for result in results for latency in result['latencies'])
+    assigned = sum(result['assigned'] for result in results)
+    return {
+        'writers': writers,
+        'unguarded': unguarded,
+        'attempts': len(latencies),
+        'assigned': assigned,
+        'refused': sum(result['refused'] for result in results),
+        'errors': sum(result['errors'] for result in results),
+        'attempts_per_sec': len(latencies) / elapsed if elapsed else 0.0,
+        'assignments_per_sec': assigned / elapsed if elapsed else 0.0,
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'violations': violations,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Assign reviewers from several processes at once and check that no "
+                                                 "assignment limit or uniqueness rule was broken.")
+    parser.add_argument('--db', default=connections.DB_NAME, help="Database to copy for every run")
+    parser.add_argument('--work-db', default='stress_assignments.db', help="The copy the writers assign on")
+    parser.add_argument('--writers', type=int, nargs='+', default=[1, 2, 4, 8], help="Writer process counts to run")
+    parser.add_argument('--attempts', type=int, default=4000, help="Assignment attempts per run, split between the writers")
+    parser.add_argument('--proposals', type=int, default=500, help="Proposals the writers compete for")
+    parser.add_argument('--reviewers', type=int, default=500, help="Reviewers the writers compete for")
+    parser.add_argument('--unguarded', action='store_true',
+                        help="Also run without the database-enforced limits, checking outside the write transaction")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    pairs = sample_pairs(args.db, args.proposals, args.reviewers, args.attempts, args.seed)
+    results = []
+    failed = False
+    for unguarded in ([False, True] if args.unguarded else [False]):
+        for writers in args.writers:
+            result = run_level(args.db, args.work_db, pairs, writers, unguarded)
+            results.append(result)
+            broken = sum(result['violations'].values())
+            failed |= broken > 0 and not unguarded
+            print(f"{'unguarded' if unguarded else 'guarded':<9} {writers:>3} writers: "
+                  f"{result['attempts_per_sec']:8.1f} attempts/s {result['assignments_per_sec']:8.1f} assignments/s  "
+                  f"p50 {result['p50_ms']:7.2f}ms  p99 {result['p99_ms']:7.2f}ms  assigned {result['assigned']}  "
+                  f"refused {result['refused']}  errors {result['errors']}  violations {broken or 'none'}")
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(args.work_db + suffix):
+            os.remove(args.work_db + suffix)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    if failed:
+        raise SystemExit("Assignment invariants were violated")
@@ -0,0 +1,110 @@
+import argparse
+import math
+import sqlite3
+import sys
+from collections import defaultdict
+
+from create_database import rebuild_area_summary
+
+SUMMARY_COLUMNS = ['proposal_count', 'max_requested_amount', 'discrepancy_sum', 'awarded_count', 'awarded_total']
+
+# Incrementally maintained sums accumulate floating point error, so amounts are compared with a tolerance
+RELATIVE_TOLERANCE = 1e-9
+ABSOLUTE_TOLERANCE = 1e-6
+
+
+def expected_summary(cursor):
+    """
+    Recomputes the per-area summary and maximum-request proposals from Proposal and Competition.
+
+    Returns:
+        tuple: (summary, max_proposals) keyed by area.
+    """
+    # One scan: window aggregates give every proposal its area totals, and RANK() marks the proposals
+    # tied for the area's largest request
+    summary = {}
+    max_proposals = defaultdict(set)
+    for area, proposal_id, amount_rank, *totals in cursor.execute('''
+        SELECT c.competition_area, p.proposal_id,
+               RANK() OVER (PARTITION BY c.competition_area ORDER BY p.requested_amount DESC),
+               COUNT(*) OVER area, MAX(p.requested_amount) OVER area,
+               TOTAL(ABS(p.requested_amount - p.awarded_amount)) OVER area,
+               COUNT(p.awarded_amount) OVER area, TOTAL(p.awarded_amount) OVER area
+        FROM Proposal p
+        JOIN Competition c ON p.competition_id = c.competition_id
+        WHERE c.competition_area IS NOT NULL
+        WINDOW area AS (PARTITION BY c.competition_area)
+    '''):
+        summary[area] = tuple(totals)
+        if amount_rank == 1:
+            max_proposals[area].add(proposal_id)
+    return summary, max_proposals
+
+
+def maintained_summary(cursor):
+    """
+    Reads the per-area summary and maximum-request proposals maintained by the triggers.
+    """
+    # Areas whose proposals were all removed keep a zero row; they are equivalent to a missing one
+    summary = {row[0]: row[1:] for row in cursor.execute(
+        f"SELECT competition_area, {', '.join(SUMMARY_COLUMNS)} FROM AreaSummary WHERE proposal_count > 0")}
+    max_proposals = defaultdict(set)
+    for area, proposal_id in cursor.execute("SELECT competition_area, proposal_id FROM AreaMaxProposal"):
+        max_proposals[area].add(proposal_id)
+    return summary, max_proposals
+
+
+def values_match(expected, actual):
+    if expected is None or actual is None:
+        return expected is actual
+    return math.isclose(expected, actual, rel_tol=RELATIVE_TOLERANCE, abs_tol=ABSOLUTE_TOLERANCE)
+
+
+def verify_area_summary(cursor):
+    """
+    Diffs the maintained area summary against a recomputation from scratch.
+
+    Parameters:
+        cursor (sqlite3.Cursor): A cursor on the database.
+
+    Returns:
+        list: One human-readable line per difference; empty if the summary is correct.
+    """
+    expected, expected_max = expected_summary(cursor)
+    actual, actual_max = maintained_summary(cursor)
+    differences = []
+    for area in sorted(set(expected) | set(actual)):
+        if area not in actual:
+            differences.append(f"{area}: missing from AreaSummary")
+            continue
+        if area not in expected:
+            differences.append(f"{area}: in AreaSummary but has no proposals")
+            continue
+        for column, expected_value, actual_value in zip(SUMMARY_COLUMNS, expected[area], actual[area]):
+            if not values_match(expected_value, actual_value):
+                differences.append(f"{area}: {column} is {actual_value}, expected {expected_value}")
+    for area in sorted(set(expected_max) | set(actual_max)):
+        if expected_max[area] != actual_max[area]:
+            differences.append(f"{area}: largest request proposals are {sorted(actual_max[area])}, "
+                               f"expected {sorted(expected_max[area])}")
+    return differences
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check the maintained per-area summary against a full recomputation.")
+    parser.add_argument('--db', default='council.db')
+    parser.add_argument('--rebuild', action='store_true', help="Rebuild the summary if it differs")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    differences = verify_area_summary(conn.cursor())
+    for line in differences:
+        print(line)
+    if differences and args.rebuild:
+        rebuild_area_summary(conn.cursor())
+        conn.commit()
+        print("Area summary rebuilt.")
+    elif not differences:
+        print("Area summary is consistent.")
+    conn.close()
+    sys.exit(1 if differences and not args.rebuild else 0)